@@ -0,0 +1,178 @@
+"""Benchmarks for the simulate / insights / replan engine across plan sizes.
+
+    python benchmarks/bench_engine.py --output bench.json
+    python benchmarks/bench_engine.py --sizes 10 1000 --compare bench.json
+
+Runs the same functions the dashboard calls (``simulate_execution`` for
+"Run Today's Simulation", with and without an ``OutcomeModel``, the model's
+``update`` with the day, ``build_insights`` and ``build_replan`` for the
+insights and replan steps, ``note_themes`` on per-doctor variants of the
+notes, ``get_rx_count`` per objective) on synthetic plans whose roster
+extends the demo doctors. No browser or Streamlit server is needed.
+Each result records the best and mean wall time over ``--repeat`` runs (after
+a warm-up run) and the peak traced memory of one extra run. Plans above 100k
+visits are timed once; the 10^6 replan alone takes minutes.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fieldforce import (  # noqa: E402
+    DOCTOR_OUTCOMES,
+    OutcomeModel,
+    build_insights,
+    build_replan,
+    extract_rx_units,
+    get_rx_count,
+    note_themes,
+    simulate_execution,
+    typed_plan,
+)
+
+DEFAULT_SIZES = [10, 1_000, 100_000, 1_000_000]
+
+# Slowdown over the baseline's best time that --compare reports as a regression;
+# differences below MIN_REGRESSION_SECONDS are timer noise and ignored.
+REGRESSION_RATIO = 1.25
+MIN_REGRESSION_SECONDS = 0.005
+
+_OBJECTIVES = ["Target 5 Rx", "Achieve 3 Rx", "Secure 4 Rx", "New Product Sampling", "Stock Replenishment"]
+_BRANDS = ["A", "B", "C"]
+
+
+def synthetic_plan(size, seed=0, visits_per_doctor=20):
+    """
+    A typed plan of ``size`` visits between 09:00 AM and 05:30 PM. The roster is
+    the demo doctors from ``DOCTOR_OUTCOMES`` plus "Dr. Synthetic N" names, about
+    one doctor per ``visits_per_doctor`` visits.
+    """
+    rng = np.random.default_rng(seed)
+    roster = [name for name in DOCTOR_OUTCOMES if name != "default"]
+    roster += [f"Dr. Synthetic {i}" for i in range(max(0, size // visits_per_doctor - len(roster)))]
+    return typed_plan(pd.DataFrame({
+        "Time Slot": rng.integers(108, 211, size) * 5,
+        "Doctor": pd.Categorical.from_codes(rng.integers(0, len(roster), size), categories=roster),
+        "Objective": np.array(_OBJECTIVES, dtype=object)[rng.integers(0, len(_OBJECTIVES), size)],
+        "Brand": pd.Categorical.from_codes(rng.integers(0, len(_BRANDS), size), categories=_BRANDS),
+    }))
+
+
+def _benchmarks(plan, seed):
+    """Benchmark name -> zero-argument callable, with inputs prepared up front."""
+    execution = simulate_execution(plan, rng=np.random.default_rng(seed))
+    objectives = plan["Objective"]
+    model = OutcomeModel().update(execution)
+    # Near-duplicate notes: each demo note tagged with the visited doctor.
+    notes = execution["Notes"].astype(str) + " Seen by " + execution["Doctor"].astype(str) + "."
+    return {
+        "simulate_execution": lambda: simulate_execution(plan, rng=np.random.default_rng(seed)),
+        "simulate_with_model": lambda: simulate_execution(plan, rng=np.random.default_rng(seed), model=model),
+        "outcome_model_update": lambda: OutcomeModel().update(execution),
+        "build_insights": lambda: build_insights(execution, len(plan), "2025-01-01"),
+        "note_themes": lambda: note_themes(notes),
+        "build_replan": lambda: build_replan(execution, random_state=seed),
+        "get_rx_count": lambda: objectives.map(get_rx_count),
+        "extract_rx_units": lambda: extract_rx_units(objectives),
+    }
+
+
+def _measure(run, repeat):
+    if repeat > 1:
+        run()  # warm-up: first-call imports and caches are not part of the timing
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "best_seconds": round(min(times), 6),
+        "mean_seconds": round(sum(times) / len(times), 6),
+        "repeat": repeat,
+        "peak_mib": round(peak / 2**20, 3),
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, seed=0, only=None, log=print):
+    results = []
+    for size in sizes:
+        plan = synthetic_plan(size, seed=seed)
+        for name, run in _benchmarks(plan, seed).items():
+            if only and name not in only:
+                continue
+            # Large inputs are timed once; a repeat would only add minutes.
+            result = {"benchmark": name, "size": size, **_measure(run, repeat if size <= 100_000 else 1)}
+            log(f"{name:>20} n={size:>9,}  best {result['best_seconds']:.4f}s  peak {result['peak_mib']:.1f} MiB")
+            results.append(result)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    """Returns the results whose best time is more than ``ratio`` times the baseline's."""
+    previous = {(r["benchmark"], r["size"]): r["best_seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["benchmark"], result["size"]))
+        if before and result["best_seconds"] > before * ratio and result["best_seconds"] - before > MIN_REGRESSION_SECONDS:
+            regressions.append({**result, "baseline_seconds": before, "ratio": round(result["best_seconds"] / before, 2)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="plan sizes (visits)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark up to 100k visits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON; exit 1 if a benchmark got slower than --ratio")
+    parser.add_argument("--ratio", type=float, default=REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, repeat=args.repeat, seed=args.seed, only=args.only)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), ratio=args.ratio)
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']} n={r['size']:,}: {r['baseline_seconds']:.4f}s -> "
+                  f"{r['best_seconds']:.4f}s ({r['ratio']}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Headless engine behind the Pharma Field Force AI Assistant dashboard.
+
+Names are resolved on first use, so ``import fieldforce`` (and the CLI) starts
+without loading pandas or numpy.
+"""
+import importlib
+
+# Public name -> defining module.
+_EXPORTS = {
+    "cache_stats": "fieldforce.cache",
+    "cached_build_insights": "fieldforce.cache",
+    "cached_build_replan": "fieldforce.cache",
+    "frame_fingerprint": "fieldforce.cache",
+    "CRMClient": "fieldforce.crm",
+    "CRMError": "fieldforce.crm",
+    "sync_crm": "fieldforce.crm",
+    "MockCRMServer": "fieldforce.crm_server",
+    "HistoryStore": "fieldforce.history",
+    "IMPORT_KINDS": "fieldforce.importer",
+    "import_frame": "fieldforce.importer",
+    "import_to_history": "fieldforce.importer",
+    "build_insights": "fieldforce.insights",
+    "session_memory": "fieldforce.memory",
+    "note_themes": "fieldforce.notes",
+    "JobCancelled": "fieldforce.jobs",
+    "JobRunner": "fieldforce.jobs",
+    "simulate_day": "fieldforce.jobs",
+    "BATCH_KEY_COLUMNS": "fieldforce.montecarlo",
+    "run_monte_carlo": "fieldforce.montecarlo",
+    "simulate_rep_days": "fieldforce.montecarlo",
+    "OutcomeModel": "fieldforce.outcomes",
+    "PlanStore": "fieldforce.planstore",
+    "RerunProfiler": "fieldforce.profiling",
+    "profiled": "fieldforce.profiling",
+    "load_reference_data": "fieldforce.reference",
+    "build_replan": "fieldforce.replan",
+    "rollup_window": "fieldforce.rollups",
+    "DOCTOR_LOCATIONS": "fieldforce.roster",
+    "locate_doctors": "fieldforce.roster",
+    "route_plans": "fieldforce.routing",
+    "route_visits": "fieldforce.routing",
+    "candidate_plans": "fieldforce.scenarios",
+    "compare_scenarios": "fieldforce.scenarios",
+    "PRIORITY_RANKS": "fieldforce.scheduler",
+    "historical_durations": "fieldforce.scheduler",
+    "schedule_visits": "fieldforce.scheduler",
+    "split_next_day_plan": "fieldforce.scheduler",
+    "EXECUTION_COLUMNS": "fieldforce.schema",
+    "NEXT_DAY_PLAN_COLUMNS": "fieldforce.schema",
+    "PLAN_COLUMNS": "fieldforce.schema",
+    "PRIORITIES": "fieldforce.schema",
+    "STATUSES": "fieldforce.schema",
+    "extract_rx_units": "fieldforce.schema",
+    "get_rx_count": "fieldforce.schema",
+    "to_display": "fieldforce.schema",
+    "typed_execution": "fieldforce.schema",
+    "typed_next_day_plan": "fieldforce.schema",
+    "typed_plan": "fieldforce.schema",
+    "DOCTOR_OUTCOMES": "fieldforce.simulation",
+    "default_plan": "fieldforce.simulation",
+    "simulate_execution": "fieldforce.simulation",
+    "execution_page": "fieldforce.views",
+    "filter_executions": "fieldforce.views",
+}
+
+
+__all__ = [
+    "BATCH_KEY_COLUMNS",
+    "CRMClient",
+    "CRMError",
+    "DOCTOR_LOCATIONS",
+    "DOCTOR_OUTCOMES",
+    "EXECUTION_COLUMNS",
+    "HistoryStore",
+    "IMPORT_KINDS",
+    "JobCancelled",
+    "JobRunner",
+    "MockCRMServer",
+    "NEXT_DAY_PLAN_COLUMNS",
+    "OutcomeModel",
+    "PLAN_COLUMNS",
+    "PRIORITIES",
+    "PlanStore",
+    "PRIORITY_RANKS",
+    "RerunProfiler",
+    "STATUSES",
+    "build_insights",
+    "build_replan",
+    "cache_stats",
+    "cached_build_insights",
+    "cached_build_replan",
+    "candidate_plans",
+    "compare_scenarios",
+    "default_plan",
+    "execution_page",
+    "extract_rx_units",
+    "filter_executions",
+    "frame_fingerprint",
+    "get_rx_count",
+    "historical_durations",
+    "import_frame",
+    "import_to_history",
+    "load_reference_data",
+    "locate_doctors",
+    "note_themes",
+    "profiled",
+    "rollup_window",
+    "route_plans",
+    "route_visits",
+    "run_monte_carlo",
+    "schedule_visits",
+    "session_memory",
+    "simulate_day",
+    "simulate_execution",
+    "simulate_rep_days",
+    "split_next_day_plan",
+    "sync_crm",
+    "to_display",
+    "typed_execution",
+    "typed_next_day_plan",
+    "typed_plan",
+]
+
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_EXPORTS])
@@ -0,0 +1,6 @@
+"""``python -m fieldforce``: see ``fieldforce.cli``."""
+import sys
+
+from fieldforce.cli import main
+
+sys.exit(main())
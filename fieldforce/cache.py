@@ -0,0 +1,98 @@
+"""Content-hash memoization for insights and replan generation."""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.insights import build_insights
+from fieldforce.replan import build_replan
+from fieldforce.roster import DOCTOR_LOCATIONS
+
+
+def frame_fingerprint(frame):
+    """
+    Cheap content hash of a DataFrame: per-row hashes from pandas folded into one
+    digest together with the column names and dtypes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(column, str(dtype)) for column, dtype in frame.dtypes.items()]).encode())
+    if not frame.empty:
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+
+insights_cache = LRUCache(maxsize=256)
+replan_cache = LRUCache(maxsize=256)
+
+
+def cached_build_insights(execution_df, planned_visits, current_date):
+    """``build_insights`` memoized on the execution frame's content hash."""
+    key = (frame_fingerprint(execution_df), planned_visits, current_date)
+    return insights_cache.get_or_compute(key, lambda: build_insights(execution_df, planned_visits, current_date))
+
+
+def cached_build_replan(execution_df, random_state=None, history=None, backlog=None, locations=DOCTOR_LOCATIONS):
+    """
+    ``build_replan`` memoized on the content hashes of the execution frame and of
+    the optional ``history`` and ``backlog`` frames, and on the doctor ``locations``.
+
+    A ``numpy.random.Generator`` random state is consumed by every call, so such
+    calls bypass the cache. The returned plan is a copy and safe to modify.
+    """
+    if isinstance(random_state, (np.random.Generator, np.random.RandomState)):
+        return build_replan(execution_df, random_state=random_state, history=history, backlog=backlog,
+                            locations=locations)
+    key = (
+        frame_fingerprint(execution_df),
+        random_state,
+        None if history is None else frame_fingerprint(history),
+        None if backlog is None else frame_fingerprint(backlog),
+        None if locations is DOCTOR_LOCATIONS else tuple(sorted(locations.items())),
+    )
+    replan_text, next_day_plan = replan_cache.get_or_compute(
+        key, lambda: build_replan(execution_df, random_state=random_state, history=history, backlog=backlog,
+                             locations=locations)
+    )
+    return replan_text, next_day_plan.copy()
+
+
+def cache_stats():
+    """Hit/miss counters of the insights and replan caches."""
+    return {"insights": insights_cache.stats(), "replan": replan_cache.stats()}
@@ -0,0 +1,227 @@
+"""Command line for nightly batch runs: simulate, insights and replan over files.
+
+    python -m fieldforce simulate plan.csv -o execution.csv --seed 7
+    python -m fieldforce insights execution.csv --date 2025-01-31
+    python -m fieldforce replan execution.csv -o next_day_plan.csv
+    python -m fieldforce day plan.csv --out-dir out/ --history-db field_history.sqlite3
+    python -m fieldforce crm-sync http://crm:8080 --reps-file reps.txt --history-db field_history.sqlite3
+    python -m fieldforce crm-server --port 8080
+
+Inputs and outputs are CSV or JSON Lines, chosen by file suffix; "-" writes CSV
+to stdout. The engine modules are imported only once a command runs, so
+``--help`` and argument errors return immediately.
+"""
+import argparse
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+_JSON_LINES_SUFFIXES = {".jsonl", ".ndjson", ".json"}
+
+
+def _read(path, kind):
+    from fieldforce.importer import import_frame
+
+    frame, report = import_frame(path, kind)
+    if report["rejected"]:
+        print(f"{path}: skipped {report['rejected']} invalid rows", file=sys.stderr)
+    return frame
+
+
+def _write(frame, path):
+    from fieldforce.schema import to_display
+
+    display = to_display(frame)
+    if path == "-":
+        display.to_csv(sys.stdout, index=False)
+    elif Path(path.lower().removesuffix(".gz")).suffix in _JSON_LINES_SUFFIXES:
+        display.to_json(path, orient="records", lines=True)
+    else:
+        display.to_csv(path, index=False)
+
+
+def _write_text(text, path, stream=None):
+    if path is None or path == "-":
+        print(text, file=stream or sys.stdout)
+    else:
+        Path(path).write_text(text)
+
+
+def _rng(seed):
+    if seed is None:
+        return None
+    import numpy as np
+
+    return np.random.default_rng(seed)
+
+
+def _simulate(args):
+    from fieldforce.simulation import simulate_execution
+
+    _write(simulate_execution(_read(args.plan, "plan"), rng=_rng(args.seed), cancel_rate=args.cancel_rate), args.output)
+
+
+def _insights(args):
+    from fieldforce.insights import build_insights
+
+    execution = _read(args.execution, "execution_data")
+    planned = len(execution) if args.planned is None else args.planned
+    _write_text(build_insights(execution, planned, args.date), args.output)
+
+
+def _replan(args):
+    from fieldforce.replan import build_replan
+
+    execution = _read(args.execution, "execution_data")
+    history = _read(args.history, "execution_data") if args.history else None
+    backlog = None
+    if args.backlog:
+        import pandas as pd
+
+        from fieldforce.importer import read_chunks
+        from fieldforce.schema import typed_next_day_plan
+
+        backlog = typed_next_day_plan(pd.concat(read_chunks(args.backlog), ignore_index=True))
+    replan_text, next_day_plan = build_replan(execution, random_state=args.seed, history=history, backlog=backlog)
+    _write(next_day_plan, args.output)
+    # Keep stdout clean when the plan itself is written there.
+    _write_text(replan_text, args.text_output, stream=sys.stderr if args.output == "-" else None)
+
+
+def _day(args):
+    from fieldforce.insights import build_insights
+    from fieldforce.replan import build_replan
+    from fieldforce.roster import DOCTOR_LOCATIONS
+    from fieldforce.simulation import simulate_execution
+
+    plan = _read(args.plan, "plan")
+    rng = _rng(args.seed)
+    execution = simulate_execution(plan, rng=rng, cancel_rate=args.cancel_rate)
+    insights_text = build_insights(execution, len(plan), args.date)
+
+    store = history = None
+    locations = DOCTOR_LOCATIONS
+    if args.history_db:
+        from fieldforce.history import HistoryStore
+
+        store = HistoryStore(args.history_db)
+        history = store.recent_executions(args.date, args.rep)
+        locations = store.roster_locations()
+    replan_text, next_day_plan = build_replan(execution, random_state=rng, history=history, locations=locations)
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _write(execution, str(out_dir / "execution.csv"))
+    _write(next_day_plan, str(out_dir / "next_day_plan.csv"))
+    (out_dir / "insights.md").write_text(insights_text)
+    (out_dir / "replan.md").write_text(replan_text)
+    if store is not None:
+        store.save_day(args.date, args.rep, plan, execution, next_day_plan,
+                       insights_text=insights_text, replan_text=replan_text, day_completed=True, simulated=True)
+        store.close()
+
+
+def _crm_sync(args):
+    from fieldforce.crm import CRMError, ResponseCache, sync_crm
+
+    reps = list(args.rep)
+    if args.reps_file:
+        reps += [line.strip() for line in Path(args.reps_file).read_text().splitlines() if line.strip()]
+    if not reps:
+        raise ValueError("no reps to sync; pass --rep or --reps-file")
+    store = None
+    if args.history_db:
+        from fieldforce.history import HistoryStore
+
+        store = HistoryStore(args.history_db)
+    try:
+        with ResponseCache(args.cache) as cache:
+            report = sync_crm(args.url, reps, args.date, store=store, cache=cache,
+                              pool_size=args.pool_size, batch_size=args.batch_size, retries=args.retries)
+    except CRMError as error:
+        raise ValueError(str(error)) from error
+    finally:
+        if store is not None:
+            store.close()
+    print(json.dumps(report))
+
+
+def _crm_server(args):
+    from fieldforce.crm_server import MockCRMServer
+
+    server = MockCRMServer(args.host, args.port, latency=args.latency, fail_rate=args.fail_rate)
+    print(f"Mock CRM listening on {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m fieldforce", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    today = date.today().strftime("%Y-%m-%d")
+
+    simulate = commands.add_parser("simulate", help="simulate a day's execution of a plan")
+    simulate.add_argument("plan", help="plan file (Time Slot, Doctor, Objective, Brand)")
+    simulate.add_argument("-o", "--output", default="-", help="execution output file (default: stdout)")
+    simulate.add_argument("--seed", type=int, help="sample delays and cancellations from this seed")
+    simulate.add_argument("--cancel-rate", type=float, default=0.1, help="cancellation rate when seeded")
+    simulate.set_defaults(run=_simulate)
+
+    insights = commands.add_parser("insights", help="daily performance summary of an execution log")
+    insights.add_argument("execution", help="execution file")
+    insights.add_argument("--date", default=today, help="report date (default: today)")
+    insights.add_argument("--planned", type=int, help="visits planned (default: rows in the execution file)")
+    insights.add_argument("-o", "--output", help="markdown output file (default: stdout)")
+    insights.set_defaults(run=_insights)
+
+    replan = commands.add_parser("replan", help="next-day plan from an execution log")
+    replan.add_argument("execution", help="execution file")
+    replan.add_argument("-o", "--output", default="-", help="next-day plan output file (default: stdout)")
+    replan.add_argument("--history", help="earlier executions, for visit lengths")
+    replan.add_argument("--backlog", help="next-day plan rows carried over from earlier days")
+    replan.add_argument("--seed", type=int, help="seed for choosing successful visits to reinforce")
+    replan.add_argument("--text-output", help="replan summary output file (default: stdout, or stderr if the plan goes to stdout)")
+    replan.set_defaults(run=_replan)
+
+    day = commands.add_parser("day", help="simulate, summarise and replan one day")
+    day.add_argument("plan", help="plan file")
+    day.add_argument("--out-dir", required=True, help="directory for execution, next-day plan and reports")
+    day.add_argument("--date", default=today, help="simulated date (default: today)")
+    day.add_argument("--seed", type=int, help="sample outcomes from this seed")
+    day.add_argument("--cancel-rate", type=float, default=0.1, help="cancellation rate when seeded")
+    day.add_argument("--history-db", help="history store to read visit lengths from and save the day to")
+    day.add_argument("--rep", default="MR Ravi", help="rep the day is saved for (default: MR Ravi)")
+    day.set_defaults(run=_day)
+
+    crm_sync = commands.add_parser("crm-sync", help="pull the roster, plans and outcomes from a CRM and push approved plans")
+    crm_sync.add_argument("url", help="CRM base URL, e.g. http://localhost:8080")
+    crm_sync.add_argument("--rep", action="append", default=[], help="rep to sync (repeatable)")
+    crm_sync.add_argument("--reps-file", help="file with one rep per line")
+    crm_sync.add_argument("--date", default=today, help="day to sync (default: today)")
+    crm_sync.add_argument("--history-db", help="history store to save the day to and read approved plans from")
+    crm_sync.add_argument("--cache", default=":memory:", help="SQLite file that caches CRM responses between runs")
+    crm_sync.add_argument("--pool-size", type=int, default=8, help="concurrent connections (default: 8)")
+    crm_sync.add_argument("--batch-size", type=int, default=200, help="reps per request (default: 200)")
+    crm_sync.add_argument("--retries", type=int, default=3, help="retries per failed request (default: 3)")
+    crm_sync.set_defaults(run=_crm_sync)
+
+    crm_server = commands.add_parser("crm-server", help="serve a local stand-in CRM for offline runs")
+    crm_server.add_argument("--host", default="127.0.0.1")
+    crm_server.add_argument("--port", type=int, default=8080)
+    crm_server.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    crm_server.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 503")
+    crm_server.set_defaults(run=_crm_server)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.run(args)
+    except (FileNotFoundError, ValueError) as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+    return 0
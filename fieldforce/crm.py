@@ -0,0 +1,314 @@
+"""Asyncio CRM connector: pooled, batched and cached pulls of plans and outcomes, and plan pushes."""
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from fieldforce.schema import (
+    EXECUTION_COLUMNS,
+    NEXT_DAY_PLAN_COLUMNS,
+    PLAN_COLUMNS,
+    to_display,
+    typed_execution,
+    typed_plan,
+)
+
+# Open keep-alive connections per client; requests beyond this wait for one.
+DEFAULT_POOL_SIZE = 8
+# Reps per batched request.
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_RETRIES = 3
+# First retry waits about this long; each further retry doubles it, with jitter.
+BACKOFF_SECONDS = 0.2
+REQUEST_TIMEOUT_SECONDS = 30
+# Cached per-rep responses older than this are fetched again.
+DEFAULT_CACHE_TTL_SECONDS = 12 * 3600
+
+# Statuses worth retrying: the CRM is overloaded or restarting, not rejecting the request.
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Batched read -> (endpoint, response key, columns, typed converter).
+CRM_FRAMES = {
+    "plan": ("/plans/batch", "plans", PLAN_COLUMNS, typed_plan),
+    "execution_data": ("/outcomes/batch", "executions", EXECUTION_COLUMNS, typed_execution),
+}
+
+
+class CRMError(Exception):
+    """A CRM request failed for good: rejected, or still failing after every retry."""
+
+
+def _records(frame):
+    """JSON-ready display rows of a typed frame, with missing values as None."""
+    display = to_display(frame).astype(object)
+    return display.where(display.notna(), None).to_dict("records")
+
+
+class ResponseCache:
+    """
+    Local cache of per-rep CRM responses in SQLite (``":memory:"`` by default),
+    so a nightly sync that is re-run, or resumed after a failure, only fetches
+    what it does not have yet. Entries expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, path=":memory:", ttl=DEFAULT_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, body TEXT NOT NULL)"
+            )
+
+    def get_many(self, keys):
+        """Cached values of the fresh ``keys``, as a dict."""
+        found = {}
+        oldest = time.time() - self.ttl
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT key, body FROM responses WHERE stored_at >= ? AND key IN ({', '.join('?' * len(chunk))})",
+                (oldest, *chunk),
+            )
+            found.update((key, json.loads(body)) for key, body in rows)
+        return found
+
+    def put_many(self, values):
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, stored_at, body) VALUES (?, ?, ?)",
+                ((key, now, json.dumps(value)) for key, value in values.items()),
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _ConnectionPool:
+    """At most ``size`` HTTP/1.1 keep-alive connections to one host, reused across requests."""
+
+    def __init__(self, host, port, size, timeout):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+        self.opened = 0
+
+    async def acquire(self):
+        await self._slots.acquire()
+        try:
+            if self._idle:
+                return self._idle.pop()
+            connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            self.opened += 1
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, reusable):
+        if reusable:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+        self._slots.release()
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+class CRMClient:
+    """
+    Async client for the CRM's JSON API (see ``fieldforce.crm_server`` for the
+    endpoints). Use it as ``async with CRMClient(url) as crm: ...``.
+
+    Requests share a bounded pool of keep-alive connections, so thousands of
+    reps are synced with ``pool_size`` requests in flight rather than one
+    round-trip at a time. Reads are batched ``batch_size`` reps per request and
+    cached per (rep, date) in a ``ResponseCache``. Failed requests (connection
+    errors, timeouts, 429 and 5xx) are retried up to ``retries`` times with
+    exponential backoff; other errors raise ``CRMError`` at once. ``stats``
+    counts requests, retries, cache hits and connections opened.
+
+    Only what the CRM needs is implemented on top of ``asyncio`` streams: JSON
+    bodies framed by Content-Length, no chunked encoding or TLS.
+    """
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 retries=DEFAULT_RETRIES, backoff=BACKOFF_SECONDS, timeout=REQUEST_TIMEOUT_SECONDS, cache=None):
+        url = urlsplit(base_url)
+        if url.scheme != "http" or not url.hostname:
+            raise ValueError(f"unsupported CRM URL {base_url!r}; expected http://host:port")
+        self.host, self.port, self.prefix = url.hostname, url.port or 80, url.path.rstrip("/")
+        self.pool_size, self.batch_size = pool_size, batch_size
+        self.retries, self.backoff, self.timeout = retries, backoff, timeout
+        # A cache made here is closed with the client; a given one belongs to the caller.
+        self._owns_cache = cache is None
+        self.cache = cache if cache is not None else ResponseCache()
+        self.stats = {"requests": 0, "retries": 0, "cache_hits": 0, "connections": 0}
+        self._pool = None
+
+    async def __aenter__(self):
+        self._pool = _ConnectionPool(self.host, self.port, self.pool_size, self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._pool.close()
+        if self._owns_cache:
+            self.cache.close()
+
+    async def _exchange(self, connection, method, path, body):
+        reader, writer = connection
+        head = (
+            f"{method} {self.prefix}{path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by the CRM")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", ""):
+            raise CRMError("chunked responses are not supported")
+        payload = await reader.readexactly(int(headers.get("content-length", 0)))
+        return status, payload, headers.get("connection", "").lower() != "close"
+
+    async def request(self, method, path, payload=None):
+        """Sends one JSON request through the pool, with retries, and returns the decoded response."""
+        body = b"" if payload is None else json.dumps(payload).encode()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+            self.stats["requests"] += 1
+            connection, reusable = None, False
+            try:
+                connection = await self._pool.acquire()
+                self.stats["connections"] = self._pool.opened
+                status, response, reusable = await asyncio.wait_for(
+                    self._exchange(connection, method, path, body), self.timeout
+                )
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as error:
+                failure = f"{type(error).__name__}: {error}"
+                continue
+            finally:
+                if connection is not None:
+                    self._pool.release(connection, reusable)
+            if status < 300:
+                return json.loads(response) if response else None
+            failure = f"HTTP {status}: {response[:200].decode(errors='replace')}"
+            if status not in _RETRY_STATUSES:
+                raise CRMError(f"{method} {path} failed with {failure}")
+        raise CRMError(f"{method} {path} failed after {self.retries + 1} attempts ({failure})")
+
+    async def fetch_roster(self):
+        """The CRM's doctors and pharmacies, as a frame with "Doctor", "Latitude" and "Longitude"."""
+        return pd.DataFrame((await self.request("GET", "/roster"))["doctors"])
+
+    async def fetch(self, name, reps, date):
+        """
+        One stored frame ("plan" or "execution_data") of every rep in ``reps`` on
+        ``date``, as typed rows with leading "Date" and "Rep" columns, like
+        ``HistoryStore.read_range``. Cached reps are not requested again; the rest
+        are fetched in concurrent batches of ``batch_size`` reps.
+        """
+        endpoint, key, columns, to_typed = CRM_FRAMES[name]
+        reps = list(dict.fromkeys(reps))
+        cache_keys = {rep: f"{name}/{date}/{rep}" for rep in reps}
+        cached = self.cache.get_many(list(cache_keys.values()))
+        rows = {rep: cached[cache_key] for rep, cache_key in cache_keys.items() if cache_key in cached}
+        self.stats["cache_hits"] += len(rows)
+        missing = [rep for rep in reps if rep not in rows]
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        responses = await asyncio.gather(*(
+            self.request("POST", endpoint, {"date": date, "reps": batch}) for batch in batches
+        ))
+        for batch, response in zip(batches, responses):
+            fetched = {rep: response[key].get(rep, []) for rep in batch}
+            self.cache.put_many({cache_keys[rep]: value for rep, value in fetched.items()})
+            rows.update(fetched)
+
+        records = [{**row, "Date": date, "Rep": rep} for rep in reps for row in rows.get(rep, [])]
+        frame = pd.DataFrame(records, columns=["Date", "Rep", *columns])
+        return pd.concat([frame[["Date", "Rep"]], to_typed(frame[columns])], axis=1)
+
+    async def push_next_day_plans(self, date, plans):
+        """
+        Sends approved next-day plans (typed rows with a "Rep" column) made on
+        ``date``, in batches of ``batch_size`` reps. Every batch carries an id
+        derived from its content, so the CRM can ignore a batch it already got
+        from an earlier attempt. Returns the number of rows the CRM accepted.
+        """
+        if plans.empty:
+            return 0
+        by_rep = {rep: _records(frame[NEXT_DAY_PLAN_COLUMNS]) for rep, frame in plans.groupby("Rep", sort=False)}
+        reps = list(by_rep)
+        payloads = []
+        for start in range(0, len(reps), self.batch_size):
+            batch = {rep: by_rep[rep] for rep in reps[start:start + self.batch_size]}
+            batch_id = hashlib.sha1(json.dumps([date, batch], sort_keys=True).encode()).hexdigest()
+            payloads.append({"date": date, "batch_id": batch_id, "plans": batch})
+        responses = await asyncio.gather(*(self.request("POST", "/next-day-plans", payload) for payload in payloads))
+        return sum(response["accepted"] for response in responses)
+
+
+async def sync_day(client, reps, date, store=None):
+    """
+    The nightly sync for ``date``: pulls the roster and every rep's plan and
+    visit outcomes and, with a ``HistoryStore``, saves them there and pushes
+    the next-day plans approved that day back to the CRM. Returns a report dict.
+    """
+    started = time.perf_counter()
+    roster, plans, executions = await asyncio.gather(
+        client.fetch_roster(), client.fetch("plan", reps, date), client.fetch("execution_data", reps, date)
+    )
+    pushed = 0
+    if store is not None:
+        store.save_roster(roster, date)
+        for name, frame in (("plan", plans), ("execution_data", executions)):
+            store.import_rows(name, frame, write_ids={})
+        approved = [
+            plan.assign(Rep=rep) for rep in dict.fromkeys(reps)
+            if (plan := store.approved_next_day_plan(date, rep)) is not None and not plan.empty
+        ]
+        if approved:
+            pushed = await client.push_next_day_plans(date, pd.concat(approved, ignore_index=True))
+    return {
+        "reps": len(set(reps)),
+        "roster_doctors": len(roster),
+        "plan_rows": len(plans),
+        "execution_rows": len(executions),
+        "pushed_rows": pushed,
+        **client.stats,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def sync_crm(base_url, reps, date, store=None, **client_options):
+    """Runs ``sync_day`` against the CRM at ``base_url`` in a new event loop; see ``CRMClient`` for options."""
+    async def run():
+        async with CRMClient(base_url, **client_options) as client:
+            return await sync_day(client, reps, date, store=store)
+
+    return asyncio.run(run())
@@ -0,0 +1,156 @@
+"""Local stand-in for the CRM's HTTP API, for developing and testing the connector offline.
+
+    GET  /roster            -> {"doctors": [{"Doctor", "Latitude", "Longitude"}, ...]}
+    POST /plans/batch       {"date", "reps": [...]} -> {"plans": {rep: [plan rows]}}
+    POST /outcomes/batch    {"date", "reps": [...]} -> {"executions": {rep: [execution rows]}}
+    POST /next-day-plans    {"date", "batch_id", "plans": {rep: [rows]}} -> {"accepted": n}
+
+Rows are in display form ("9:00 AM", "28 mins"), like the history store's.
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.roster import DOCTOR_LOCATIONS
+from fieldforce.schema import PLAN_COLUMNS, to_display
+from fieldforce.simulation import default_plan, simulate_execution
+
+
+def _rows_by_rep(frame, reps, rows_per_rep):
+    display = to_display(frame).astype(object)
+    records = display.where(display.notna(), None).to_dict("records")
+    return {rep: records[i * rows_per_rep:(i + 1) * rows_per_rep] for i, rep in enumerate(reps)}
+
+
+class MockCRMServer:
+    """
+    Serves every rep the default plan and seeded, simulated outcomes for it, on
+    a background thread with HTTP/1.1 keep-alive. A batch's outcomes depend only
+    on the date and the reps in it, so a retried request gets the same answer.
+
+    ``latency`` delays every response, and ``fail_rate`` answers that share of
+    requests with 503, to exercise the client's pool and retries. Pushed plans
+    are kept in ``pushed`` by batch id; a batch id seen before is not counted
+    again.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_rate=0.0, seed=0):
+        self.latency, self.fail_rate = latency, fail_rate
+        self.pushed = {}
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-crm", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def pushed_plans(self):
+        """Every pushed next-day plan row, with "Date" and "Rep" columns."""
+        rows = [{"Date": batch["date"], "Rep": rep, **row}
+                for batch in self.pushed.values() for rep, plan in batch["plans"].items() for row in plan]
+        return pd.DataFrame(rows)
+
+    def roster(self, _payload):
+        return {"doctors": [{"Doctor": name, "Latitude": lat, "Longitude": lon}
+                            for name, (lat, lon) in DOCTOR_LOCATIONS.items()]}
+
+    def plans(self, payload):
+        plan = default_plan()
+        reps = payload["reps"]
+        return {"plans": _rows_by_rep(pd.concat([plan] * len(reps), ignore_index=True), reps, len(plan))}
+
+    def executions(self, payload):
+        plan = default_plan()
+        reps = payload["reps"]
+        day = datetime.strptime(payload["date"], "%Y-%m-%d").toordinal()
+        rng = np.random.default_rng([day, zlib.crc32("\n".join(reps).encode())])
+        execution = simulate_execution(pd.concat([plan[PLAN_COLUMNS]] * len(reps), ignore_index=True), rng=rng)
+        return {"executions": _rows_by_rep(execution, reps, len(plan))}
+
+    def push(self, payload):
+        with self._lock:
+            if payload["batch_id"] in self.pushed:
+                return {"accepted": 0, "duplicate": True}
+            self.pushed[payload["batch_id"]] = payload
+        return {"accepted": sum(len(rows) for rows in payload["plans"].values()), "duplicate": False}
+
+    def _handler(self):
+        server = self
+        routes = {
+            ("GET", "/roster"): server.roster,
+            ("POST", "/plans/batch"): server.plans,
+            ("POST", "/outcomes/batch"): server.executions,
+            ("POST", "/next-day-plans"): server.push,
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _serve(self, method):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length)) if length else None
+                with server._lock:
+                    server.requests += 1
+                    failing = server._random.random() < server.fail_rate
+                if server.latency:
+                    time.sleep(server.latency)
+                route = routes.get((method, self.path))
+                if failing:
+                    self._reply(503, {"error": "temporarily unavailable"})
+                elif route is None:
+                    self._reply(404, {"error": f"no route for {method} {self.path}"})
+                else:
+                    try:
+                        self._reply(200, route(payload))
+                    except (KeyError, TypeError, ValueError) as error:
+                        self._reply(400, {"error": f"{type(error).__name__}: {error}"})
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,389 @@
+"""Append-only SQLite history of each day's plan, execution and next-day plan."""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.rollups import ROLLUP_COLUMNS, ROLLUP_KEYS, ROLLUP_VALUES, daily_rollup
+from fieldforce.roster import DOCTOR_LOCATIONS
+from fieldforce.schema import (
+    EXECUTION_COLUMNS,
+    NEXT_DAY_PLAN_COLUMNS,
+    PLAN_COLUMNS,
+    to_display,
+    typed_execution,
+    typed_next_day_plan,
+    typed_plan,
+)
+
+DEFAULT_HISTORY_PATH = "field_history.sqlite3"
+
+# How far back ``recent_executions`` looks, e.g. for learning visit lengths.
+HISTORY_WINDOW_DAYS = 28
+
+# Stored frame name -> (table, columns, typed converter). Every table also carries
+# write_id, date and rep. Rows are stored in display form and re-typed on read.
+HISTORY_FRAMES = {
+    "plan": ("plan_rows", PLAN_COLUMNS, typed_plan),
+    "execution_data": ("execution_rows", EXECUTION_COLUMNS, typed_execution),
+    "next_day_plan": ("next_day_plan_rows", NEXT_DAY_PLAN_COLUMNS, typed_next_day_plan),
+}
+
+# Daily rollups of the latest execution per (date, rep), kept in step with every write.
+ROLLUP_TABLE = "daily_rollups"
+
+# Latest known location of every doctor and pharmacy, as synced from the CRM.
+ROSTER_TABLE = "roster"
+ROSTER_COLUMNS = ["Doctor", "Latitude", "Longitude", "Synced"]
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class HistoryStore:
+    """
+    Local history of field data keyed by date, rep and doctor.
+
+    Each ``save_day`` call appends one write (a row in ``writes``) plus that day's
+    frames; nothing is updated in place. Reads return the latest write per
+    (date, rep), so re-saving a day supersedes it while the older rows remain.
+    The ``daily_rollups`` table is an exception: it holds visit, Rx and unit
+    totals per (date, rep, doctor, brand, status) of the latest execution only,
+    replaced whenever a day's execution is written, for ``read_rollups``. So is
+    the ``roster`` table, which keeps the latest synced row per doctor.
+    A write saved with ``simulated=True`` holds a simulated execution rather
+    than a recorded one, so it can be left out of what models learn from.
+    The connection is shared across Streamlit sessions and guarded by a lock.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS writes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT NOT NULL,
+                    rep TEXT NOT NULL,
+                    written_at TEXT NOT NULL,
+                    day_completed INTEGER NOT NULL,
+                    next_day_approved INTEGER NOT NULL,
+                    insights_text TEXT,
+                    replan_text TEXT,
+                    simulated INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Writes from before the flag existed count as recorded.
+            if "simulated" not in {row[1] for row in self._conn.execute("PRAGMA table_info(writes)")}:
+                self._conn.execute("ALTER TABLE writes ADD COLUMN simulated INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS writes_date_rep ON writes (date, rep, id)")
+            for table, columns, _ in HISTORY_FRAMES.values():
+                column_defs = ", ".join(f"{_quote(column)} TEXT" for column in columns)
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    f"(write_id INTEGER NOT NULL, date TEXT NOT NULL, rep TEXT NOT NULL, {column_defs})"
+                )
+                # Databases created before a column was added get it as NULLs.
+                existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for column in columns:
+                    if column not in existing:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(column)} TEXT")
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_write ON {table} (write_id)")
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_date_rep_doctor ON {table} (date, rep, "Doctor")')
+            missing_rollups = not self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ROLLUP_TABLE,)
+            ).fetchone()
+            key_defs = ", ".join(f"{_quote(column)} TEXT NOT NULL" for column in ROLLUP_KEYS[2:])
+            value_defs = ", ".join(f"{_quote(column)} INTEGER NOT NULL" for column in ROLLUP_VALUES)
+            keys = ", ".join(["date", "rep", *map(_quote, ROLLUP_KEYS[2:])])
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (date TEXT NOT NULL, rep TEXT NOT NULL, "
+                f"{key_defs}, {value_defs}, PRIMARY KEY ({keys})) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {ROSTER_TABLE} ("Doctor" TEXT PRIMARY KEY, "Latitude" REAL, '
+                '"Longitude" REAL, "Synced" TEXT NOT NULL)'
+            )
+        # Databases written before rollups existed are backfilled once.
+        if missing_rollups:
+            self.rebuild_rollups()
+
+    def close(self):
+        self._conn.close()
+
+    def save_day(self, date, rep, plan, execution_data, next_day_plan,
+                 insights_text=None, replan_text=None, day_completed=False, next_day_approved=False,
+                 simulated=False):
+        """
+        Appends one day's frames for ``rep`` on ``date`` ("%Y-%m-%d") and returns
+        the write id. ``simulated`` marks an execution that was simulated, not recorded.
+        """
+        frames = {"plan": plan, "execution_data": execution_data, "next_day_plan": next_day_plan}
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO writes (date, rep, written_at, day_completed, next_day_approved, insights_text, "
+                "replan_text, simulated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (date, rep, datetime.now().isoformat(timespec="seconds"), int(day_completed),
+                 int(next_day_approved), insights_text, replan_text, int(simulated)),
+            )
+            write_id = cursor.lastrowid
+            for name, frame in frames.items():
+                self._insert_rows(name, frame.assign(write_id=write_id, Date=date, Rep=rep))
+            self._conn.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE date = ? AND rep = ?", (date, rep))
+            self._add_rollups(execution_data.assign(Date=date, Rep=rep))
+        return write_id
+
+    def _insert_rows(self, name, frame):
+        """Inserts typed rows carrying "write_id", "Date" and "Rep" columns; call under the lock."""
+        table, columns, _ = HISTORY_FRAMES[name]
+        if frame.empty:
+            return
+        values = to_display(frame).reindex(columns=["write_id", "Date", "Rep", *columns])
+        values = values.astype(object).where(values.notna(), None)
+        targets = ", ".join(["write_id", "date", "rep", *map(_quote, columns)])
+        placeholders = ", ".join("?" * (len(columns) + 3))
+        self._conn.executemany(
+            f"INSERT INTO {table} ({targets}) VALUES ({placeholders})",
+            ((int(row[0]), *(None if v is None else str(v) for v in row[1:]))
+             for row in values.itertuples(index=False, name=None)),
+        )
+
+    def _add_rollups(self, execution):
+        """
+        Adds the daily rollup of typed execution rows carrying "Date" and "Rep"
+        columns to the stored totals; call under the lock.
+        """
+        if execution.empty:
+            return
+        rollup = daily_rollup(execution)
+        targets = ", ".join(["date", "rep", *map(_quote, ROLLUP_COLUMNS[2:])])
+        keys = ", ".join(["date", "rep", *map(_quote, ROLLUP_KEYS[2:])])
+        totals = ", ".join(f"{_quote(c)} = {_quote(c)} + excluded.{_quote(c)}" for c in ROLLUP_VALUES)
+        self._conn.executemany(
+            f"INSERT INTO {ROLLUP_TABLE} ({targets}) VALUES ({', '.join('?' * len(ROLLUP_COLUMNS))}) "
+            f"ON CONFLICT ({keys}) DO UPDATE SET {totals}",
+            ((*row[:len(ROLLUP_KEYS)], *map(int, row[len(ROLLUP_KEYS):]))
+             for row in rollup[ROLLUP_COLUMNS].itertuples(index=False, name=None)),
+        )
+
+    def rebuild_rollups(self):
+        """Recomputes every daily rollup from the latest stored execution of each (date, rep)."""
+        dates = self.stored_dates()
+        executions = self.read_range("execution_data", dates[0], dates[-1]) if dates else None
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {ROLLUP_TABLE}")
+            if executions is not None:
+                self._add_rollups(executions)
+
+    def _start_import_write(self, date, rep, name):
+        """
+        Appends a write for an import into frame ``name`` on (date, rep) that keeps
+        the other frames of the latest existing write; call under the lock.
+        """
+        previous = self._conn.execute(
+            "SELECT id, day_completed, next_day_approved, simulated FROM writes "
+            "WHERE date = ? AND rep = ? ORDER BY id DESC LIMIT 1",
+            (date, rep),
+        ).fetchone()
+        day_completed = name == "execution_data" or bool(previous and previous[1])
+        next_day_approved = bool(previous and previous[2])
+        # Imported executions are recorded ones; other imports keep the previous execution.
+        simulated = name != "execution_data" and bool(previous and previous[3])
+        # Texts generated from the old rows would be stale, so they are left empty.
+        write_id = self._conn.execute(
+            "INSERT INTO writes (date, rep, written_at, day_completed, next_day_approved, simulated) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (date, rep, datetime.now().isoformat(timespec="seconds"), int(day_completed), int(next_day_approved),
+             int(simulated)),
+        ).lastrowid
+        if name == "execution_data":
+            self._conn.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE date = ? AND rep = ?", (date, rep))
+        if previous is not None:
+            for other, (table, columns, _) in HISTORY_FRAMES.items():
+                if other == name:
+                    continue
+                select = ", ".join(_quote(column) for column in columns)
+                self._conn.execute(
+                    f"INSERT INTO {table} (write_id, date, rep, {select}) "
+                    f"SELECT ?, date, rep, {select} FROM {table} WHERE write_id = ? ORDER BY rowid",
+                    (write_id, previous[0]),
+                )
+        return write_id
+
+    def import_rows(self, name, frame, write_ids):
+        """
+        Appends typed rows with "Date" ("%Y-%m-%d") and "Rep" columns to stored frame
+        ``name``. The first rows of each (date, rep) start a new write that replaces
+        that day's ``name`` frame; ``write_ids`` maps (date, rep) to that write, so
+        the later chunks of one import land in the same write.
+        """
+        if frame.empty:
+            return
+        keys = pd.MultiIndex.from_arrays([frame["Date"].astype(str), frame["Rep"].astype(str)])
+        codes, uniques = pd.factorize(keys)
+        with self._lock, self._conn:
+            for date, rep in uniques:
+                if (date, rep) not in write_ids:
+                    write_ids[(date, rep)] = self._start_import_write(date, rep, name)
+            ids = np.array([write_ids[key] for key in uniques])
+            self._insert_rows(name, frame.assign(write_id=ids[codes]))
+            if name == "execution_data":
+                self._add_rollups(frame)
+
+    def _latest_write(self, date, rep, approved_only=False):
+        query = "SELECT * FROM writes WHERE date = ? AND rep = ?"
+        if approved_only:
+            query += " AND next_day_approved = 1"
+        with self._lock:
+            cursor = self._conn.execute(query + " ORDER BY id DESC LIMIT 1", (date, rep))
+            row = cursor.fetchone()
+            return dict(zip([d[0] for d in cursor.description], row)) if row else None
+
+    def _read_frame(self, name, write_id):
+        table, columns, to_typed = HISTORY_FRAMES[name]
+        select = ", ".join(_quote(column) for column in columns)
+        with self._lock:
+            frame = pd.read_sql_query(
+                f"SELECT {select} FROM {table} WHERE write_id = ? ORDER BY rowid", self._conn, params=(write_id,)
+            )
+        return to_typed(frame)
+
+    def load_day(self, date, rep):
+        """
+        Returns the latest stored state for ``rep`` on ``date`` as a dict with the
+        session-state keys (``plan``, ``execution_data``, ``next_day_plan``,
+        ``insights_text``, ``replan_text``, ``day_completed``,
+        ``execution_simulated``), or None if the day was never saved.
+        """
+        write = self._latest_write(date, rep)
+        if write is None:
+            return None
+        day = {name: self._read_frame(name, write["id"]) for name in HISTORY_FRAMES}
+        day["insights_text"] = write["insights_text"]
+        day["replan_text"] = write["replan_text"]
+        day["day_completed"] = bool(write["day_completed"])
+        day["execution_simulated"] = bool(write["simulated"])
+        return day
+
+    def approved_next_day_plan(self, date, rep):
+        """Returns the latest approved next-day plan saved on ``date``, or None."""
+        write = self._latest_write(date, rep, approved_only=True)
+        return None if write is None else self._read_frame("next_day_plan", write["id"])
+
+    def read_range(self, name, start_date, end_date, rep=None, doctor=None, recorded_only=False):
+        """
+        Reads one stored frame (``plan``, ``execution_data`` or ``next_day_plan``)
+        for every day in ``[start_date, end_date]``, using the latest write per
+        (date, rep). Optionally filtered by rep and doctor, and to days whose
+        latest write is not simulated. Rows are typed and carry leading "Date"
+        and "Rep" columns.
+        """
+        table, columns, to_typed = HISTORY_FRAMES[name]
+        select = ", ".join(f"t.{_quote(column)}" for column in columns)
+        query = (
+            f'SELECT t.date AS "Date", t.rep AS "Rep", {select} FROM {table} t '
+            "JOIN (SELECT max(id) AS id FROM writes WHERE date BETWEEN ? AND ? GROUP BY date, rep) latest "
+            "ON t.write_id = latest.id"
+        )
+        params = [start_date, end_date]
+        conditions = []
+        if recorded_only:
+            query += " JOIN writes w ON w.id = latest.id"
+            conditions.append("w.simulated = 0")
+        if rep is not None:
+            conditions.append("t.rep = ?")
+            params.append(rep)
+        if doctor is not None:
+            conditions.append('t."Doctor" = ?')
+            params.append(doctor)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            frame = pd.read_sql_query(query + " ORDER BY t.date, t.rep, t.rowid", self._conn, params=params)
+        return pd.concat([frame[["Date", "Rep"]], to_typed(frame[columns])], axis=1)
+
+    def read_rollups(self, start_date, end_date, rep=None):
+        """
+        Daily rollup rows (``ROLLUP_COLUMNS``) for ``[start_date, end_date]``,
+        optionally for one rep. Reads pre-aggregated buckets only, never visits;
+        ``fieldforce.rollups.rollup_window`` totals them per week, month or quarter.
+        """
+        select = ", ".join(['date AS "Date"', 'rep AS "Rep"', *map(_quote, ROLLUP_COLUMNS[2:])])
+        query = f"SELECT {select} FROM {ROLLUP_TABLE} WHERE date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+        if rep is not None:
+            query += " AND rep = ?"
+            params.append(rep)
+        with self._lock:
+            return pd.read_sql_query(query + " ORDER BY date, rep", self._conn, params=params)
+
+    def save_roster(self, roster, synced):
+        """
+        Stores a roster frame ("Doctor", "Latitude", "Longitude") synced on
+        ``synced`` ("%Y-%m-%d"). Doctors already stored are updated in place;
+        doctors missing from ``roster`` are kept.
+        """
+        rows = roster[["Doctor", "Latitude", "Longitude"]].astype(object).where(roster.notna(), None)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO {ROSTER_TABLE} ("Doctor", "Latitude", "Longitude", "Synced") '
+                "VALUES (?, ?, ?, ?)",
+                ((*row, synced) for row in rows.itertuples(index=False)),
+            )
+
+    def read_roster(self):
+        """The stored roster (``ROSTER_COLUMNS``), by doctor name."""
+        with self._lock:
+            return pd.read_sql_query(
+                f'SELECT "Doctor", "Latitude", "Longitude", "Synced" FROM {ROSTER_TABLE} ORDER BY "Doctor"', self._conn
+            )
+
+    def roster_locations(self, locations=DOCTOR_LOCATIONS):
+        """
+        ``locations`` (name -> ``(lat, lon)``) updated with every stored doctor
+        that has coordinates, as a read-only mapping for ``locate_doctors``.
+        """
+        stored = self.read_roster().dropna(subset=["Latitude", "Longitude"])
+        return MappingProxyType({
+            **locations,
+            **dict(zip(stored["Doctor"], zip(stored["Latitude"], stored["Longitude"]))),
+        })
+
+    def recent_executions(self, date, rep, days=HISTORY_WINDOW_DAYS, recorded_only=False, include_date=False):
+        """
+        Executions of ``rep`` over the ``days`` days before ``date`` ("%Y-%m-%d"),
+        and on ``date`` itself if ``include_date``, without simulated days if
+        ``recorded_only``.
+        """
+        end = datetime.strptime(date, "%Y-%m-%d")
+        return self.read_range(
+            "execution_data",
+            (end - timedelta(days=days)).strftime("%Y-%m-%d"),
+            (end - timedelta(days=0 if include_date else 1)).strftime("%Y-%m-%d"),
+            rep=rep,
+            recorded_only=recorded_only,
+        )
+
+    def last_write_id(self, rep=None):
+        """
+        Id of the latest write (of ``rep``), or 0. Writes are append-only, so it
+        changes whenever a day is saved, imported or synced, by any process.
+        """
+        query = "SELECT max(id) FROM writes" + (" WHERE rep = ?" if rep is not None else "")
+        with self._lock:
+            return self._conn.execute(query, () if rep is None else (rep,)).fetchone()[0] or 0
+
+    def stored_dates(self, rep=None):
+        """Returns the sorted distinct dates that have at least one write."""
+        query = "SELECT DISTINCT date FROM writes" + (" WHERE rep = ?" if rep is not None else "") + " ORDER BY date"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, () if rep is None else (rep,))]
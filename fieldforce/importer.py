@@ -0,0 +1,140 @@
+"""Chunked CSV/JSONL import of plans and execution logs."""
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.schema import (
+    EXECUTION_COLUMNS,
+    PLAN_COLUMNS,
+    parse_durations,
+    parse_time_slots,
+    recategorize,
+    typed_execution,
+    typed_plan,
+)
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Import kind -> (columns, typed converter, columns a row must have to be kept).
+IMPORT_KINDS = {
+    "plan": (PLAN_COLUMNS, typed_plan, ["Time Slot", "Doctor"]),
+    "execution_data": (EXECUTION_COLUMNS, typed_execution, ["Time Slot", "Doctor", "Actual Status"]),
+}
+
+IMPORT_REPORT_FIELDS = ["rows", "rejected", "chunks", "seconds", "rows_per_second"]
+
+_JSON_LINES_SUFFIXES = {".jsonl", ".ndjson", ".json"}
+
+
+def _file_format(source, file_format):
+    if file_format is not None:
+        return file_format
+    name = str(getattr(source, "name", source)).lower().removesuffix(".gz")
+    return "jsonl" if Path(name).suffix in _JSON_LINES_SUFFIXES else "csv"
+
+
+def read_chunks(source, file_format=None, chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    Yields raw DataFrame chunks of at most ``chunksize`` rows from a CSV or JSON
+    Lines file (a path or a binary file object such as a Streamlit upload). The
+    format follows the file name unless ``file_format`` ("csv" or "jsonl") is given.
+    """
+    if _file_format(source, file_format) == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunksize, dtype=False)
+    else:
+        reader = pd.read_csv(source, chunksize=chunksize, skipinitialspace=True)
+    with reader:
+        yield from reader
+
+
+def _as_clock_minutes(series, parse):
+    """Minutes as floats; out-of-range and unparseable values become NaN."""
+    minutes = pd.to_numeric(series, errors="coerce") if pd.api.types.is_numeric_dtype(series) else parse(series.astype("string"))
+    minutes = minutes.round()
+    return minutes.where(minutes.between(0, 1439))
+
+
+def _as_dates(series):
+    codes, uniques = pd.factorize(series)
+    parsed = pd.to_datetime(pd.Series(uniques), errors="coerce").dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    return pd.Series(np.append(parsed, None)[codes], index=series.index)
+
+
+def coerce_chunk(chunk, kind, keep=()):
+    """
+    Validates and converts one raw chunk to the typed schema of ``kind``.
+
+    Rows missing a required field (an unparseable time slot, no doctor, an unknown
+    status) are dropped. Columns named in ``keep`` are carried through as they are
+    ("Date" is normalised to "%Y-%m-%d" and rows without a valid date dropped).
+    Returns ``(typed_rows, rejected_count)``.
+    """
+    columns, to_typed, required = IMPORT_KINDS[kind]
+    chunk = chunk.rename(columns=lambda column: str(column).strip())
+    raw = chunk.reindex(columns=columns)
+    for column in ["Time Slot", "Actual Time"]:
+        if column in raw:
+            raw[column] = _as_clock_minutes(raw[column], parse_time_slots)
+    if "Duration" in raw:
+        raw["Duration"] = _as_clock_minutes(raw["Duration"], parse_durations)
+    for column in ["Doctor", "Brand"]:
+        text = raw[column].astype("string").str.strip()
+        raw[column] = text.where(text != "").to_numpy(dtype=object, na_value=None)
+
+    typed = to_typed(raw)
+    valid = typed[required].notna().all(axis=1).to_numpy()
+    for column in keep:
+        values = chunk[column] if column in chunk else pd.Series(None, index=chunk.index, dtype=object)
+        typed[column] = _as_dates(values) if column == "Date" else values
+        if column == "Date":
+            valid &= typed["Date"].notna().to_numpy()
+    return typed[valid], int((~valid).sum())
+
+
+def iter_import_chunks(source, kind, report, file_format=None, chunksize=DEFAULT_CHUNK_ROWS, keep=()):
+    """
+    Generator of typed, validated chunks read from ``source``. ``report`` (a dict)
+    is updated after every chunk with ``IMPORT_REPORT_FIELDS``.
+    """
+    report.update(dict.fromkeys(IMPORT_REPORT_FIELDS, 0))
+    started = time.perf_counter()
+    for chunk in read_chunks(source, file_format=file_format, chunksize=chunksize):
+        typed, rejected = coerce_chunk(chunk, kind, keep=keep)
+        report["rows"] += len(typed)
+        report["rejected"] += rejected
+        report["chunks"] += 1
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        report["rows_per_second"] = round((report["rows"] + report["rejected"]) / max(report["seconds"], 1e-9))
+        yield typed
+
+
+def import_frame(source, kind, file_format=None, chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    Reads a whole plan (``kind="plan"``) or execution log (``"execution_data"``)
+    into one typed frame. Only the typed chunks are held while reading. Returns
+    ``(frame, report)``.
+    """
+    columns, to_typed, _ = IMPORT_KINDS[kind]
+    report = {}
+    chunks = list(iter_import_chunks(source, kind, report, file_format=file_format, chunksize=chunksize))
+    if not chunks:
+        return to_typed(pd.DataFrame(columns=columns)), report
+    return to_typed(recategorize(pd.concat(chunks, ignore_index=True))), report
+
+
+def import_to_history(source, kind, store, rep, file_format=None, chunksize=DEFAULT_CHUNK_ROWS):
+    """
+    Streams a plan or execution log with a "Date" column into ``store`` (a
+    ``HistoryStore``), one chunk at a time. Rows without a "Rep" column are stored
+    for ``rep``. Each (date, rep) in the file replaces that day's frame with a new
+    write. Returns the import report with the number of days written.
+    """
+    report, write_ids = {}, {}
+    for typed in iter_import_chunks(source, kind, report, file_format=file_format, chunksize=chunksize,
+                                    keep=("Date", "Rep")):
+        typed["Rep"] = typed["Rep"].astype(object).where(typed["Rep"].notna(), rep)
+        store.import_rows(kind, typed, write_ids)
+    report["days"] = len(write_ids)
+    return report
@@ -0,0 +1,72 @@
+"""AI-like daily insights built from a day's execution data."""
+from fieldforce.notes import DEFAULT_THEMES, note_themes
+from fieldforce.schema import typed_execution
+
+
+def format_note_themes(themes, top_k=DEFAULT_THEMES):
+    """Markdown bullets for the ``top_k`` largest rows of a ``note_themes`` frame."""
+    lines = []
+    for theme, count, variants in themes.head(top_k).itertuples(index=False, name=None):
+        detail = f"{count} visit{'s' if count != 1 else ''}" + (f", {variants} variants" if variants > 1 else "")
+        lines.append(f"- {theme} ({detail})")
+    if len(themes) > top_k:
+        lines.append(f"- _…and {len(themes) - top_k} more themes_")
+    return "\n".join(lines)
+
+
+def build_insights(execution_df, planned_visits, current_date):
+    """
+    Builds the markdown insights summary for one day.
+
+    ``execution_df`` is a typed execution frame (string frames are converted
+    first), ``planned_visits`` the number of rows in the day's plan and
+    ``current_date`` the "%Y-%m-%d" date shown in the heading.
+    """
+    if execution_df.empty:
+        return "No execution data to generate insights. Run the simulation first."
+
+    if "Units" not in execution_df:
+        execution_df = typed_execution(execution_df)
+
+    total_visits = execution_df.shape[0]
+    if total_visits == 0: # Handle case if execution_data somehow becomes empty despite checks
+        return "No visits executed to generate insights."
+
+    status_counts = execution_df["Actual Status"].value_counts()
+    success_visits = int(status_counts.get("Success", 0))
+    partial_visits = int(status_counts.get("Partial", 0))
+    failed_visits = int(status_counts.get("Failed", 0))
+
+    rx_obtained = int(execution_df["Rx"].sum())
+    units_ordered = int(execution_df["Units"].sum())
+
+    is_success = execution_df["Actual Status"] == "Success"
+    brand_performance = is_success.groupby(execution_df["Brand"], observed=True).mean().reset_index()
+    brand_performance.columns = ["Brand", "Success Rate"]
+    brand_performance_str = "\n".join([f"- **{row['Brand']}**: {row['Success Rate']:.1%} success rate" for index, row in brand_performance.iterrows()])
+
+    notes_summary = format_note_themes(note_themes(execution_df["Notes"], top_k=None))
+
+    return f"""
+### Daily Performance Summary for {current_date}:
+
+* **Total Visits Planned:** {planned_visits}
+* **Total Visits Executed:** {total_visits}
+* **Success Rate:** {success_visits / total_visits:.1%} ({success_visits} successful visits)
+* **Partial Success:** {partial_visits} visits
+* **Failed Visits:** {failed_visits} visits
+* **Total Rx Obtained (Estimated):** {rx_obtained} units across all brands
+* **Pharmacy Orders:** {units_ordered} units
+
+#### Brand Performance Overview:
+{brand_performance_str if brand_performance_str else "- No specific brand performance data."}
+
+#### Key Takeaways from Doctor Interactions:
+{notes_summary if notes_summary else "- No specific notes recorded."}
+
+#### Recommendations:
+* **Focus on Dr. Verma:** High priority to reschedule due to emergency OPD. Understand their availability better for future planning.
+* **Address Price Objections:** For accounts like Dr. Mehta, prepare stronger value propositions or discuss flexible pricing models for Brand A.
+* **Leverage Successes:** Identify common factors in successful visits (e.g., Dr. Joshi, Dr. Kumar) and replicate strategies.
+* **Proactive Stock Management:** Continue strong engagement with pharmacies like Sai Pharma for Brand B.
+"""
@@ -0,0 +1,161 @@
+"""Background jobs on a thread pool, with progress reporting and cancellation."""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from fieldforce.cache import cached_build_insights, cached_build_replan
+from fieldforce.roster import DOCTOR_LOCATIONS
+from fieldforce.schema import recategorize
+from fieldforce.simulation import simulate_execution
+
+DEFAULT_WORKERS = 2
+# Finished jobs nobody fetched are dropped this long after they end.
+FINISHED_JOB_TTL_SECONDS = 3600
+# Visits simulated between two progress reports.
+DAY_CHUNK_ROWS = 50_000
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by its progress callback once the job has been cancelled."""
+
+
+class JobRunner:
+    """
+    Runs functions on a shared thread pool behind a small job API.
+
+    ``submit`` returns a job id. The function is called with a ``progress``
+    keyword argument, ``progress(fraction, message=None)``, which records how far
+    the job got and raises ``JobCancelled`` once ``cancel`` was called, so long
+    jobs stop at their next report. ``poll`` returns a status dict (``state`` is
+    "queued", "running", "done", "failed" or "cancelled"), ``result`` the job's
+    return value (re-raising its error), and ``forget`` drops a finished job.
+    Jobs run without a Streamlit script context: pass them plain values, never
+    ``st.session_state``, and copies of anything the session keeps changing.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fieldforce-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, name=None, **kwargs):
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id, "name": name or func.__name__, "state": "queued", "progress": 0.0, "message": None,
+            "error": None, "submitted": time.time(), "started": None, "finished": None,
+            "cancel": threading.Event(), "future": None,
+        }
+
+        def progress(fraction, message=None):
+            job["progress"] = min(max(float(fraction), 0.0), 1.0)
+            if message is not None:
+                job["message"] = message
+            if job["cancel"].is_set():
+                raise JobCancelled(job_id)
+
+        def run():
+            job["started"] = time.time()
+            try:
+                # Cancelled after the pool picked it up but before it started.
+                if job["cancel"].is_set():
+                    raise JobCancelled(job_id)
+                job["state"] = "running"
+                result = func(*args, progress=progress, **kwargs)
+            except JobCancelled:
+                job["state"] = "cancelled"
+                raise
+            except Exception as error:
+                job["state"], job["error"] = "failed", f"{type(error).__name__}: {error}"
+                raise
+            else:
+                job["state"], job["progress"] = "done", 1.0
+                return result
+            finally:
+                job["finished"] = time.time()
+
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+            job["future"] = self._pool.submit(run)
+        return job_id
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job["finished"] is not None and now - job["finished"] > FINISHED_JOB_TTL_SECONDS:
+                del self._jobs[job_id]
+
+    def _job(self, job_id):
+        with self._lock:
+            if job_id not in self._jobs:
+                raise KeyError(f"unknown job {job_id!r}")
+            return self._jobs[job_id]
+
+    def poll(self, job_id):
+        """Status of a job: id, name, state, progress (0-1), message, error and seconds so far."""
+        job = self._job(job_id)
+        if job["state"] == "queued" and job["future"].cancelled():
+            job["state"], job["finished"] = "cancelled", job["finished"] or time.time()
+        started = job["started"] or job["submitted"]
+        return {
+            "id": job["id"], "name": job["name"], "state": job["state"], "progress": job["progress"],
+            "message": job["message"], "error": job["error"],
+            "seconds": round((job["finished"] or time.time()) - started, 3),
+        }
+
+    def cancel(self, job_id):
+        """Asks a job to stop. Queued jobs never start; running ones stop at their next progress report."""
+        job = self._job(job_id)
+        job["cancel"].set()
+        job["future"].cancel()
+        return job["state"] in ("queued", "running")
+
+    def result(self, job_id, timeout=None):
+        """
+        Waits up to ``timeout`` seconds for the job and returns its result. A
+        failed job re-raises its error; a cancelled one raises ``JobCancelled``
+        (or ``CancelledError`` if it never started).
+        """
+        return self._job(job_id)["future"].result(timeout=timeout)
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            for job in self._jobs.values():
+                job["cancel"].set()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def simulate_day(plan, current_date, rng=None, model=None, history=None, backlog=None, locations=DOCTOR_LOCATIONS,
+                 progress=None, chunk_rows=DAY_CHUNK_ROWS):
+    """
+    The "Run Today's Simulation" pipeline as a job: simulates ``plan`` in chunks
+    of ``chunk_rows`` visits, then builds the insights and the next-day plan.
+    Tomorrow is routed over the doctor ``locations``. ``progress`` is called
+    after every step. Returns a dict with
+    "execution_data", "insights_text", "replan_text" and "next_day_plan".
+    """
+    report = progress or (lambda fraction, message=None: None)
+    chunks = []
+    for start in range(0, max(len(plan), 1), chunk_rows):
+        chunks.append(simulate_execution(plan.iloc[start:start + chunk_rows], rng=rng, model=model))
+        report(0.7 * min(start + chunk_rows, len(plan)) / max(len(plan), 1),
+               f"Simulated {min(start + chunk_rows, len(plan)):,} of {len(plan):,} visits")
+    execution = chunks[0] if len(chunks) == 1 else recategorize(pd.concat(chunks, ignore_index=True))
+
+    insights_text = cached_build_insights(execution, len(plan), current_date)
+    report(0.8, "Generated insights")
+    replan_text, next_day_plan = cached_build_replan(execution, history=history, backlog=backlog, locations=locations)
+    report(1.0, "Planned tomorrow")
+    return {
+        "execution_data": execution,
+        "insights_text": insights_text,
+        "replan_text": replan_text,
+        "next_day_plan": next_day_plan,
+    }
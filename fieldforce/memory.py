@@ -0,0 +1,49 @@
+"""Estimates of session-state memory, for sizing a dashboard deployment."""
+import sys
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+def object_bytes(value, shared_ids=frozenset(), _seen=None):
+    """
+    Approximate deep size of ``value`` in bytes.
+
+    Frames and Series use ``memory_usage(deep=True)``; containers and plain
+    objects (such as a ``PlanStore``) are walked through their items and
+    attributes. An object reached twice is counted once, and objects whose
+    ``id`` is in ``shared_ids`` (process-wide reference data) count as 0.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen or id(value) in shared_ids:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(object_bytes(k, shared_ids, seen) + object_bytes(v, shared_ids, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset, deque)):
+        size += sum(object_bytes(item, shared_ids, seen) for item in value)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        size += object_bytes(vars(value), shared_ids, seen)
+    return size
+
+
+def session_memory(state, shared=()):
+    """
+    Bytes held per key of a session state mapping, largest first, plus a
+    ``"total"``. Objects in ``shared`` (e.g. the reference data's frames) are not
+    charged to the session; a key holding only shared objects reports 0.
+    """
+    shared_ids = frozenset(id(value) for value in shared)
+    seen = set()
+    usage = {str(key): object_bytes(value, shared_ids, seen) for key, value in state.items()}
+    usage = dict(sorted(usage.items(), key=lambda item: -item[1]))
+    usage["total"] = sum(usage.values())
+    return usage
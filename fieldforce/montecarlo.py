@@ -0,0 +1,128 @@
+"""Multi-day, multi-rep Monte Carlo runs of the simulate → insights → replan loop."""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.insights import build_insights
+from fieldforce.replan import build_replan
+from fieldforce.scheduler import split_next_day_plan
+from fieldforce.schema import PLAN_COLUMNS, empty_execution, recategorize, typed_plan
+from fieldforce.simulation import default_plan, simulate_execution
+
+BATCH_KEY_COLUMNS = ["Rep", "Seed", "Day", "Date"]
+
+
+def simulate_rep_days(rep_index, rep, seed, days, start_date, plan=None, cancel_rate=0.1, include_insights=False,
+                      model=None):
+    """
+    Runs ``days`` consecutive days for one rep and one seed.
+
+    Each day's execution feeds the insights and replan steps, and the resulting
+    next-day plan becomes the following day's plan. The random stream depends only
+    on ``(seed, rep_index)``, so a run is reproducible however the work is sharded.
+    With an ``OutcomeModel``, outcomes are sampled from it instead of the
+    profiles and ``cancel_rate`` (see ``simulate_execution``). Returns the typed
+    executed visits with ``BATCH_KEY_COLUMNS`` prepended.
+    """
+    rng = np.random.default_rng([seed, rep_index])
+    plan = default_plan() if plan is None else typed_plan(plan)
+    backlog = None
+    day_frames = []
+
+    for day in range(days):
+        current_date = (start_date + timedelta(days=day)).strftime("%Y-%m-%d")
+        execution_df = simulate_execution(plan, rng=rng, cancel_rate=cancel_rate, model=model)
+        if include_insights:
+            execution_df["Insights"] = build_insights(execution_df, len(plan), current_date)
+        _, next_day_plan = build_replan(execution_df, random_state=rng, backlog=backlog)
+
+        execution_df.insert(0, "Date", current_date)
+        execution_df.insert(0, "Day", day + 1)
+        execution_df.insert(0, "Seed", seed)
+        execution_df.insert(0, "Rep", rep)
+        day_frames.append(execution_df)
+
+        # The approved next-day plan is tomorrow's plan; visits that did not fit
+        # tomorrow are carried into the following replan.
+        tomorrow, backlog = split_next_day_plan(next_day_plan)
+        plan = tomorrow[PLAN_COLUMNS]
+
+    if not day_frames:
+        return _empty_batch()
+    return recategorize(pd.concat(day_frames, ignore_index=True))
+
+
+def _empty_batch():
+    return pd.concat([pd.DataFrame(columns=BATCH_KEY_COLUMNS), empty_execution()], axis=1)
+
+
+def _run_tasks(tasks):
+    return [simulate_rep_days(**task) for task in tasks]
+
+
+def run_monte_carlo(days, reps, seeds, start_date=None, plan=None, cancel_rate=0.1, include_insights=False, processes=None,
+                    progress=None, model=None):
+    """
+    Simulates ``days`` days for every rep and seed and merges the visits into one
+    long-format frame ordered by rep, seed and day.
+
+    ``reps`` is a list of rep names or a count (named "Rep 1", "Rep 2", ...), and
+    ``seeds`` a list of seeds or a count (seeds ``0..K-1``). Every rep starts from
+    ``plan`` (the default plan if omitted), and every run samples its outcomes
+    from ``model`` if one is given. The (rep, seed) runs are sharded across
+    a process pool of ``processes`` workers (all CPU cores by default); pass
+    ``processes=1`` to run in-process.
+
+    ``progress(fraction, message)``, if given, is called as runs (on the pool,
+    batches of runs) finish. An exception it raises, such as ``JobCancelled``,
+    cancels the runs not yet started and propagates.
+    """
+    if isinstance(reps, int):
+        reps = [f"Rep {i + 1}" for i in range(reps)]
+    if isinstance(seeds, int):
+        seeds = list(range(seeds))
+    start_date = start_date or date.today()
+
+    tasks = [
+        {"rep_index": rep_index, "rep": rep, "seed": seed, "days": days, "start_date": start_date,
+         "plan": plan, "cancel_rate": cancel_rate, "include_insights": include_insights, "model": model}
+        for rep_index, rep in enumerate(reps)
+        for seed in seeds
+    ]
+    if not tasks:
+        return _empty_batch()
+
+    workers = min(processes or os.cpu_count() or 1, len(tasks))
+
+    def report(finished):
+        if progress is not None:
+            progress(finished / len(tasks), f"Finished {finished:,} of {len(tasks):,} runs")
+
+    if workers == 1:
+        results = []
+        for task in tasks:
+            results.append(simulate_rep_days(**task))
+            report(len(results))
+    else:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        batches = [tasks[start:start + chunksize] for start in range(0, len(tasks), chunksize)]
+        done = [None] * len(batches)
+        finished = 0
+        # "spawn" keeps workers clear of the Streamlit server's threads and locks.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_run_tasks, batch): index for index, batch in enumerate(batches)}
+            try:
+                for future in as_completed(futures):
+                    done[futures[future]] = future.result()
+                    finished += len(done[futures[future]])
+                    report(finished)
+            except BaseException:
+                pool.shutdown(cancel_futures=True)
+                raise
+        results = [frame for batch in done for frame in batch]
+
+    return recategorize(pd.concat(results, ignore_index=True))
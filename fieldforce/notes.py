@@ -0,0 +1,149 @@
+"""Near-duplicate clustering of visit notes into themes, with MinHash and LSH."""
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Notes are compared as sets of character n-grams of their normalized text.
+SHINGLE_CHARS = 4
+# MinHash signature length, split into LSH bands of NUM_HASHES // LSH_BANDS rows.
+# 16 bands of 4 rows make notes with a Jaccard similarity of about 0.5 or more
+# likely to share a bucket.
+NUM_HASHES = 64
+LSH_BANDS = 16
+# Bucket-mates join a theme only if their signatures agree on this share of
+# hashes; at 0.5, long chains of edits start to bridge unrelated notes.
+MIN_SIMILARITY = 0.6
+DEFAULT_THEMES = 5
+# N-grams hashed per block, which bounds the (NUM_HASHES x block) work array.
+_BLOCK_SHINGLES = 50_000
+
+_PRIME = (1 << 31) - 1
+_PERMUTATIONS = np.random.default_rng(0x5EED).integers(1, _PRIME, size=(2, NUM_HASHES), dtype=np.int64)
+
+
+def _separators(match):
+    """Punctuation and symbols become spaces; combining marks (accents, Devanagari vowel signs) stay."""
+    return "".join(char if unicodedata.category(char).startswith("M") else " " for char in match.group(0))
+
+
+def normalize_notes(notes):
+    """
+    Case-folded words of each note joined by single spaces, in any script, e.g.
+    "Follow-up!" -> "follow up" and "Café" -> "café".
+    """
+    folded = notes.str.normalize("NFKC").str.casefold()
+    # Word characters and whitespace are left alone, so only punctuation runs reach the callback.
+    return folded.str.replace(r"[^\w\s]+|_+", _separators, regex=True).str.split().str.join(" ")
+
+
+def _shingles(texts):
+    """
+    Every ``SHINGLE_CHARS``-byte n-gram of every text as an integer, plus the
+    number of n-grams per text. The texts are padded with spaces so that a short
+    (or empty) text still has n-grams.
+    """
+    padding = " " * (SHINGLE_CHARS - 1)
+    encoded = [(text or " ").encode() + padding.encode() for text in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64)
+    counts = lengths - (SHINGLE_CHARS - 1)
+    # Start of each n-gram: every byte that is not in the padding of its text.
+    offsets = np.repeat(np.cumsum(lengths) - lengths, counts)
+    starts = offsets + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    grams = np.zeros(len(starts), dtype=np.int64)
+    for i in range(SHINGLE_CHARS):
+        grams = (grams << 8) | buffer[starts + i]
+    return grams % _PRIME, counts
+
+
+def minhash_signatures(texts):
+    """
+    ``(len(texts), NUM_HASHES)`` MinHash signatures of the texts' n-gram sets.
+    Each hash is a universal hash ``(a * g + b) mod p`` of the n-grams, minimized
+    per text with ``np.minimum.reduceat`` over blocks of texts.
+    """
+    grams, counts = _shingles(texts)
+    ends = np.cumsum(counts)
+    signatures = np.empty((len(texts), NUM_HASHES), dtype=np.int64)
+    a, b = _PERMUTATIONS[0][:, None], _PERMUTATIONS[1][:, None]
+    start = 0
+    while start < len(texts):
+        first_gram = ends[start] - counts[start]
+        stop = max(int(np.searchsorted(ends, first_gram + _BLOCK_SHINGLES, side="right")), start + 1)
+        hashed = (a * grams[first_gram:ends[stop - 1]][None, :] + b) % _PRIME
+        signatures[start:stop] = np.minimum.reduceat(hashed, ends[start:stop] - counts[start:stop] - first_gram, axis=1).T
+        start = stop
+    return signatures
+
+
+def _band_buckets(signatures):
+    """Bucket id per (text, band): one 64-bit hash of the band's rows, factorized."""
+    rows = NUM_HASHES // LSH_BANDS
+    bands = signatures.reshape(len(signatures), LSH_BANDS, rows).astype(np.uint64)
+    keys = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for column in range(rows):
+        keys = keys * np.uint64(0x100000001B3) ^ bands[:, :, column]
+    return [pd.factorize(keys[:, band])[0] for band in range(LSH_BANDS)]
+
+
+def _find(parents, node):
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]
+        node = parents[node]
+    return node
+
+
+def cluster_texts(texts, threshold=MIN_SIMILARITY):
+    """
+    Cluster id per text: texts whose MinHash signatures share an LSH bucket and
+    agree on at least ``threshold`` of their hashes end up in the same cluster.
+    Every text is linked to the first text of each of its buckets only, so the
+    work stays linear in the number of texts.
+    """
+    if len(texts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    signatures = minhash_signatures(texts)
+    parents = list(range(len(texts)))
+    order = np.arange(len(texts))
+    for buckets in _band_buckets(signatures):
+        first = np.full(buckets.max() + 1, len(texts))
+        np.minimum.at(first, buckets, order)
+        heads = first[buckets]
+        candidates = np.flatnonzero(heads != order)
+        similar = (signatures[candidates] == signatures[heads[candidates]]).mean(axis=1) >= threshold
+        for text, head in zip(candidates[similar], heads[candidates[similar]]):
+            root_text, root_head = _find(parents, text), _find(parents, head)
+            if root_text != root_head:
+                parents[max(root_text, root_head)] = min(root_text, root_head)
+    return pd.factorize(np.array([_find(parents, text) for text in range(len(texts))]))[0]
+
+
+def note_themes(notes, top_k=DEFAULT_THEMES, threshold=MIN_SIMILARITY):
+    """
+    The ``top_k`` most frequent themes of a Series of notes (all themes if None).
+
+    Notes that are identical once normalized (case, punctuation) are counted
+    once with ``pd.factorize``, so only distinct texts are hashed and clustered.
+    Returns a frame with "Theme" (the most
+    frequent note of the cluster), "Count" (notes in the cluster) and "Variants"
+    (distinct notes in it), largest first.
+    """
+    notes = notes.dropna().astype(str)
+    notes = notes[notes.str.strip() != ""]
+    if notes.empty:
+        return pd.DataFrame(columns=["Theme", "Count", "Variants"])
+    codes, distinct = pd.factorize(notes)
+    counts = np.bincount(codes, minlength=len(distinct))
+    text_codes, texts = pd.factorize(normalize_notes(pd.Series(distinct, dtype=object)))
+    clusters = cluster_texts(list(texts), threshold=threshold)[text_codes]
+    # The representative is the most frequent note, ties going to the first seen.
+    order = np.lexsort((np.arange(len(distinct)), -counts))
+    representative = pd.Series(order, index=clusters[order]).groupby(level=0).first()
+    themes = pd.DataFrame({
+        "Theme": np.asarray(distinct, dtype=object)[representative.to_numpy()],
+        "Count": np.bincount(clusters, weights=counts).astype(np.int64)[representative.index],
+        "Variants": np.bincount(clusters)[representative.index],
+    })
+    themes = themes.sort_values("Count", ascending=False, kind="stable").reset_index(drop=True)
+    return themes if top_k is None else themes.head(top_k)
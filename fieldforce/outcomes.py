@@ -0,0 +1,215 @@
+"""Per-doctor and brand outcome model, updated online from executed visits."""
+import copy
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.schema import STATUSES
+from fieldforce.simulation import DOCTOR_OUTCOMES, outcome_profiles
+
+# Pseudo-visits of the demo profile each doctor starts from.
+PRIOR_VISITS = 5
+# Share of those pseudo-visits given to each status other than the profile's;
+# the profile's status gets the rest. Failed matches the simulation's default
+# cancel rate, so every status stays possible until visits say otherwise.
+PRIOR_STATUS_RATES = {"Success": 0.15, "Partial": 0.15, "Failed": 0.1}
+# A (doctor, brand) pair uses its own statistics once it has this many visits,
+# and the doctor's statistics across brands until then.
+MIN_PAIR_VISITS = 3
+# Spread of the prior visit length, as a fraction of its mean.
+PRIOR_DURATION_CV = 0.2
+
+# Layout of a statistics vector: status counts, then (n, mean, M2) of the delay
+# in minutes and of the length of completed visits.
+_COUNTS = slice(0, len(STATUSES))
+_DELAY = (3, 4, 5)
+_DURATION = (6, 7, 8)
+_STAT_SIZE = 9
+
+
+def _merge(stats, other):
+    """
+    Combines statistics vectors, or rows of two aligned matrices, with Chan et
+    al.'s parallel mean/variance update.
+    """
+    merged = stats + other
+    for n, mean, m2 in (_DELAY, _DURATION):
+        total = np.maximum(merged[..., n], 1e-12)
+        delta = other[..., mean] - stats[..., mean]
+        merged[..., mean] = stats[..., mean] + delta * other[..., n] / total
+        merged[..., m2] = stats[..., m2] + other[..., m2] + delta ** 2 * stats[..., n] * other[..., n] / total
+    return merged
+
+
+def _prior(profile, default_minutes):
+    stats = np.zeros(_STAT_SIZE)
+    rates = np.array([PRIOR_STATUS_RATES[status] for status in STATUSES])
+    if profile["status"] in STATUSES:
+        profile_index = STATUSES.index(profile["status"])
+        rates[profile_index] = 1 - np.delete(rates, profile_index).sum()
+    stats[_COUNTS] = PRIOR_VISITS * rates / rates.sum()
+    delay = float(profile["delay"])
+    minutes = float(profile["duration"]) if profile["duration"] > 0 else default_minutes
+    stats[list(_DELAY)] = PRIOR_VISITS, delay, PRIOR_VISITS * max(delay, 1.0)
+    stats[list(_DURATION)] = PRIOR_VISITS, minutes, PRIOR_VISITS * (PRIOR_DURATION_CV * minutes) ** 2
+    return stats
+
+
+def _parameters(stats):
+    """Status probabilities and delay/duration mean and variance of statistics vectors (or rows)."""
+    counts = stats[..., _COUNTS]
+    n, mean, m2 = (stats[..., i] for i in _DELAY)
+    un, umean, um2 = (stats[..., i] for i in _DURATION)
+    return counts / counts.sum(axis=-1, keepdims=True), mean, m2 / n, umean, um2 / un
+
+
+def _gamma(rng, mean, variance):
+    """Gamma draws with the given means and variances; a zero mean draws 0."""
+    positive = mean > 0
+    safe_mean = np.where(positive, mean, 1.0)
+    variance = np.maximum(variance, 1e-6)
+    draws = rng.gamma(safe_mean ** 2 / variance, variance / safe_mean)
+    return np.where(positive, draws, 0.0)
+
+
+class OutcomeModel:
+    """
+    Status probabilities, delay and visit length per (doctor, brand).
+
+    Every pair keeps sufficient statistics only (status counts and running
+    mean/variance of delay and duration), for the pair itself and for the doctor
+    across brands, so ``observe`` is O(1) per visit and ``update`` adds a whole
+    execution frame without revisiting earlier visits. Each doctor starts from
+    ``PRIOR_VISITS`` pseudo-visits of its ``outcomes`` profile (or "default"),
+    spread over every status by ``PRIOR_STATUS_RATES``.
+    ``sample`` draws statuses from the learned probabilities and delays and
+    durations from gamma distributions with the learned mean and variance.
+    """
+
+    def __init__(self, outcomes=DOCTOR_OUTCOMES):
+        profiles = outcome_profiles(outcomes)
+        default_minutes = float(profiles.loc["default", "duration"])
+        self._priors = {name: _prior(profile, default_minutes) for name, profile in profiles.iterrows()}
+        self._pairs = {}
+        self._doctors = {}
+        self.visits = 0
+
+    def __len__(self):
+        """Number of (doctor, brand) pairs observed."""
+        return len(self._pairs)
+
+    def copy(self):
+        """
+        A model with the same statistics that later updates of this one leave
+        alone, e.g. for a background job. Statistics vectors are replaced on
+        update, never changed in place, so only the tables are copied.
+        """
+        clone = copy.copy(self)
+        clone._pairs, clone._doctors = dict(self._pairs), dict(self._doctors)
+        return clone
+
+    @staticmethod
+    def _add(table, key, stats):
+        current = table.get(key)
+        table[key] = stats if current is None else _merge(current, stats)
+
+    def observe(self, doctor, brand, status, delay=None, duration=None):
+        """Adds one visit; ``duration`` counts only for completed (non-zero) visits."""
+        stats = np.zeros(_STAT_SIZE)
+        if status in STATUSES:
+            stats[STATUSES.index(status)] = 1
+        if delay is not None and not pd.isna(delay):
+            stats[list(_DELAY)] = 1, max(float(delay), 0.0), 0.0
+        if duration is not None and not pd.isna(duration) and duration > 0:
+            stats[list(_DURATION)] = 1, float(duration), 0.0
+        self._add(self._pairs, (doctor, brand), stats)
+        self._add(self._doctors, doctor, stats)
+        self.visits += 1
+
+    def update(self, execution):
+        """
+        Adds every visit of a typed execution frame. The frame is reduced to one
+        statistics vector per pair with a groupby, then merged in.
+        """
+        if execution.empty:
+            return self
+        codes = pd.Categorical(execution["Actual Status"], categories=STATUSES).codes
+        slot = execution["Time Slot"].to_numpy(dtype=float, na_value=np.nan)
+        actual = execution["Actual Time"].to_numpy(dtype=float, na_value=np.nan)
+        # Minutes late, across midnight if need be; early arrivals count as on time.
+        delay = np.clip((actual - slot + 720) % 1440 - 720, 0, None)
+        duration = execution["Duration"].to_numpy(dtype=float, na_value=np.nan)
+        values = pd.DataFrame({
+            "Doctor": execution["Doctor"].astype(object).to_numpy(),
+            "Brand": execution["Brand"].astype(object).to_numpy(),
+            **{status: (codes == index).astype(float) for index, status in enumerate(STATUSES)},
+            "delay": delay,
+            "duration": np.where(duration > 0, duration, np.nan),
+        })
+        values = values[values["Doctor"].notna()]
+        for table, keys in ((self._pairs, ["Doctor", "Brand"]), (self._doctors, "Doctor")):
+            grouped = values.groupby(keys, dropna=False, sort=False)
+            counts = grouped[["delay", "duration"]].count()
+            means = grouped[["delay", "duration"]].mean()
+            m2 = grouped[["delay", "duration"]].var(ddof=0) * counts
+            aggregated = pd.concat([
+                grouped[STATUSES].sum(),
+                counts["delay"], means["delay"], m2["delay"],
+                counts["duration"], means["duration"], m2["duration"],
+            ], axis=1).fillna(0.0)
+            for key, stats in zip(aggregated.index, aggregated.to_numpy()):
+                if isinstance(key, tuple):
+                    key = (key[0], None if pd.isna(key[1]) else key[1])
+                self._add(table, key, stats)
+        self.visits += len(values)
+        return self
+
+    def _statistics(self, doctor, brand):
+        """The prior merged with the pair's statistics, or the doctor's while the pair has few visits."""
+        observed = self._pairs.get((doctor, brand))
+        if observed is None or observed[_COUNTS].sum() < MIN_PAIR_VISITS:
+            observed = self._doctors.get(doctor)
+        prior = self._priors.get(doctor, self._priors["default"])
+        return prior, np.zeros(_STAT_SIZE) if observed is None else observed
+
+    def parameters(self, doctor, brand):
+        """``(status probabilities, delay mean, delay variance, duration mean, duration variance)``."""
+        probabilities, *moments = _parameters(_merge(*self._statistics(doctor, brand)))
+        return (probabilities, *map(float, moments))
+
+    def sample(self, doctors, brands, rng):
+        """
+        Draws ``(status codes into STATUSES, delays, durations)`` for the visits
+        given by two aligned Series, with one vectorized draw per quantity.
+        Failed visits have a duration of 0.
+        """
+        # Parameters are looked up once per distinct pair and gathered by pair code.
+        doctor_codes, doctor_names = pd.factorize(doctors)
+        brand_codes, brand_names = pd.factorize(brands)
+        doctor_names = np.append(np.asarray(doctor_names, dtype=object), None)
+        brand_names = np.append(np.asarray(brand_names, dtype=object), None)
+        codes, pairs = pd.factorize(doctor_codes.astype(np.int64) * len(brand_names) + brand_codes)
+        priors, observed = (np.array(stats) for stats in zip(*(
+            self._statistics(doctor_names[pair // len(brand_names)], brand_names[pair % len(brand_names)])
+            for pair in pairs
+        )))
+        probabilities, delay_mean, delay_variance, duration_mean, duration_variance = (
+            values[codes] for values in _parameters(_merge(priors, observed))
+        )
+        cumulative = np.cumsum(probabilities, axis=1)
+        statuses = (rng.random(len(codes))[:, None] > cumulative[:, :-1]).sum(axis=1)
+        delays = np.rint(_gamma(rng, delay_mean, delay_variance)).astype(np.int64)
+        durations = np.rint(_gamma(rng, duration_mean, duration_variance)).astype(np.int64)
+        durations[statuses == STATUSES.index("Failed")] = 0
+        return statuses, delays, durations
+
+    def to_frame(self):
+        """Learned parameters per observed (doctor, brand) pair, for display."""
+        rows = []
+        for (doctor, brand), stats in self._pairs.items():
+            probabilities, delay, _, duration, _ = self.parameters(doctor, brand)
+            rows.append({"Doctor": doctor, "Brand": brand,
+                         **{f"P({status})": p for status, p in zip(STATUSES, probabilities)},
+                         "Visits": int(stats[_COUNTS].sum()),
+                         "Mean Delay": delay, "Mean Duration": duration})
+        return pd.DataFrame(rows)
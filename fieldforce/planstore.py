@@ -0,0 +1,181 @@
+"""Plan buffer that logs appends and editor deltas and builds DataFrames lazily."""
+import copy
+import itertools
+
+import pandas as pd
+
+from fieldforce.schema import PLAN_COLUMNS, to_display, typed_plan
+
+# Shared across stores so a replaced store never reuses a widget key.
+_versions = itertools.count()
+
+
+def _concat_typed(frames):
+    """
+    Concatenates typed frames without re-typing their rows: each categorical
+    column is first given the union of the frames' categories, so the
+    concatenation stays categorical.
+    """
+    first = frames[0]
+    for column in first.columns:
+        if isinstance(first[column].dtype, pd.CategoricalDtype):
+            categories = first[column].cat.categories.append(
+                [frame[column].cat.categories for frame in frames[1:]]
+            ).unique()
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+class PlanStore:
+    """
+    A typed plan frame plus the changes made to it since it was last built.
+
+    ``append``/``extend`` only add rows (or whole frames) to a log, so adding a
+    visit is O(1); the next time ``frame`` is read, only the logged rows are
+    typed and appended to the base rows, and the log is cleared.
+    Edits from a keyed ``st.data_editor`` arrive as Streamlit's delta dict
+    (``edited_rows``, ``added_rows``, ``deleted_rows``) relative to
+    ``editor_frame()`` and are likewise applied only when the frame is needed.
+    ``version`` changes whenever the editor's input changes; use it in the
+    widget key so a stale delta is never applied to new rows.
+    """
+
+    def __init__(self, frame=None, to_typed=typed_plan, columns=PLAN_COLUMNS):
+        self.columns = list(columns)
+        self._to_typed = to_typed
+        self._reset(pd.DataFrame(columns=self.columns) if frame is None else frame)
+
+    def _reset(self, frame):
+        base = self._to_typed(frame)
+        # The base is never written to in place, so an already typed frame (such
+        # as the shared default plan) is kept as is; changes build a new frame.
+        if not base.index.equals(pd.RangeIndex(len(base))):
+            base = base.reset_index(drop=True)
+        self._base = base
+        self._log = []
+        self._logged_rows = 0
+        self._delta = {}
+        self._frame = self._base
+        self._display = None
+        self._editor_display = None
+        self.version = next(_versions)
+
+    def _changed(self):
+        self._frame = None
+        self._display = None
+
+    def __len__(self):
+        added = len(self._delta.get("added_rows", []))
+        deleted = len(self._delta.get("deleted_rows", []))
+        return len(self._base) + added - deleted + self._logged_rows
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def append(self, row):
+        """Logs one row (a mapping of column to display value)."""
+        self._log.append(row)
+        self._logged_rows += 1
+        # The cached display stays; it is extended with the new rows when they are typed.
+        self._frame = None
+
+    def extend(self, rows):
+        """Logs several rows; a DataFrame is logged as one block."""
+        if isinstance(rows, pd.DataFrame):
+            self._log.append(rows)
+            self._logged_rows += len(rows)
+        else:
+            rows = list(rows)
+            self._log.extend(rows)
+            self._logged_rows += len(rows)
+        self._frame = None
+
+    def replace(self, frame):
+        """Discards the log and editor delta and starts over from ``frame``."""
+        self._reset(frame)
+
+    def clear(self):
+        self._reset(pd.DataFrame(columns=self.columns))
+
+    def set_editor_delta(self, delta):
+        """Records the data editor's current delta; a no-op if it is unchanged."""
+        delta = {key: value for key, value in (delta or {}).items() if value}
+        if delta != self._delta:
+            self._delta = copy.deepcopy(delta)
+            self._changed()
+
+    def _apply_delta(self, frame):
+        edited = {int(position): changes for position, changes in self._delta.get("edited_rows", {}).items()}
+        deleted = [int(position) for position in self._delta.get("deleted_rows", [])]
+        added = self._delta.get("added_rows", [])
+        # Only the touched rows go back through the display -> typed conversion.
+        parts = [frame.drop(index=list(edited) + deleted)]
+        if edited:
+            rows = to_display(frame.loc[list(edited)])
+            for position, changes in edited.items():
+                for column, value in changes.items():
+                    rows.at[position, column] = value
+            parts.append(self._to_typed(rows))
+        frame = pd.concat(parts).sort_index()
+        if added:
+            frame = pd.concat([frame, self._to_typed(pd.DataFrame(added, columns=self.columns))])
+        return self._to_typed(frame).reset_index(drop=True)
+
+    def _compact(self):
+        """
+        Types the logged rows and appends them to the base rows. The editor
+        delta is kept: appended rows never move the positions it refers to, and
+        its added rows still come last.
+        """
+        if not self._log:
+            return
+        parts, rows = [], []
+        for entry in self._log + [None]:
+            if isinstance(entry, dict):
+                rows.append(entry)
+                continue
+            if rows:
+                parts.append(self._to_typed(pd.DataFrame(rows, columns=self.columns)))
+                rows = []
+            if entry is not None:
+                parts.append(self._to_typed(entry))
+        appended = parts[0] if len(parts) == 1 else _concat_typed(parts)
+        self._base = _concat_typed([self._base, appended])
+        self._log = []
+        self._logged_rows = 0
+        self._editor_display = None
+        if self._display is not None:
+            # Without an editor delta the appended rows come last, so only they need formatting.
+            self._display = None if self._delta else pd.concat([self._display, to_display(appended)], ignore_index=True)
+
+    @property
+    def base(self):
+        """The typed plan without the editor's delta: the rows as generated or loaded, plus appended ones."""
+        self._compact()
+        return self._base
+
+    @property
+    def frame(self):
+        """The typed plan with every logged change applied, built on first access."""
+        if self._frame is None:
+            self._compact()
+            self._frame = self._apply_delta(self._base) if self._delta else self._base
+        return self._frame
+
+    def display_frame(self):
+        """
+        ``to_display`` of ``frame``, cached until the next change. Rows appended
+        since it was built are formatted on their own and added to the cache.
+        """
+        frame = self.frame
+        if self._display is None:
+            self._display = to_display(frame)
+        return self._display
+
+    def editor_frame(self):
+        """Rows to hand to ``st.data_editor``; editor deltas are relative to these."""
+        self._compact()
+        if self._editor_display is None:
+            self._editor_display = to_display(self._base)
+        return self._editor_display
@@ -0,0 +1,169 @@
+"""Opt-in per-rerun timing of script sections, with optional cProfile capture."""
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from collections import deque
+
+# Reruns kept for the rolling percentiles.
+DEFAULT_WINDOW = 200
+PERCENTILES = (50, 90, 99)
+
+# Each Streamlit session runs its script on its own thread, so the active
+# profiler is per thread.
+_active = threading.local()
+
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, -(-q * len(sorted_values) // 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class RerunProfiler:
+    """
+    Collects wall time per named section for each script rerun.
+
+    ``start_rerun``/``finish_rerun`` bracket one rerun; ``section`` times a block
+    and ``profiled`` times a function. Nested sections are recorded under
+    "outer/inner". A fragment that reruns on its own is bracketed by ``rerun``
+    and recorded as a rerun of its own name. The last ``window`` reruns are kept
+    for ``percentiles``. With
+    ``use_cprofile`` each rerun is also run under cProfile and its top functions
+    are kept as text. A disabled profiler records nothing.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.enabled = False
+        self.use_cprofile = False
+        self.reruns = deque(maxlen=window)
+        self.last_cprofile = None
+        self._current = None
+        self._stack = []
+        self._profile = None
+
+    def start_rerun(self, name=None):
+        # A rerun cut short by st.rerun() or st.stop() never reached finish_rerun.
+        if self._current is not None:
+            self.finish_rerun(interrupted=True)
+        _active.profiler = self
+        if not self.enabled:
+            return
+        self._current = {"started": time.time(), "name": name, "sections": {}}
+        self._stack = []
+        self._started = time.perf_counter()
+        if self.use_cprofile:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                # Another profiler (e.g. another session's) holds the hook.
+                self._profile = None
+                self.last_cprofile = "cProfile is busy in another session."
+
+    def finish_rerun(self, interrupted=False, top=25):
+        if self._current is None:
+            return None
+        if self._profile is not None:
+            self._profile.disable()
+            output = io.StringIO()
+            pstats.Stats(self._profile, stream=output).sort_stats("cumulative").print_stats(top)
+            self.last_cprofile = output.getvalue()
+            self._profile = None
+        rerun, self._current = self._current, None
+        rerun["total_ms"] = round((time.perf_counter() - self._started) * 1000, 3)
+        rerun["interrupted"] = interrupted
+        self.reruns.append(rerun)
+        return rerun
+
+    @contextlib.contextmanager
+    def rerun(self, name):
+        """
+        Brackets a fragment run: on its own (e.g. ``st.fragment(run_every=...)``)
+        it is recorded as a rerun named ``name``; within a full-script rerun it
+        adds nothing to that rerun's sections. Usable as a decorator.
+        """
+        if self._current is not None:
+            yield
+            return
+        self.start_rerun(name)
+        interrupted = True
+        try:
+            yield
+            interrupted = False
+        finally:
+            self.finish_rerun(interrupted=interrupted)
+
+    @contextlib.contextmanager
+    def section(self, name):
+        if self._current is None:
+            yield
+            return
+        self._stack.append(name)
+        key = "/".join(self._stack)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            sections = self._current["sections"] if self._current is not None else {}
+            sections[key] = round(sections.get(key, 0.0) + elapsed, 3)
+            self._stack.pop()
+
+    @property
+    def recording(self):
+        return self._current is not None
+
+    def last_rerun(self):
+        return self.reruns[-1] if self.reruns else None
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """
+        Per-section ``{"count", "p50", ...}`` in milliseconds over the kept reruns.
+        Fragment reruns are keyed by their name, and their sections by "name/section".
+        """
+        samples = {"total": []}
+        for rerun in self.reruns:
+            name = rerun.get("name")
+            samples.setdefault(name or "total", []).append(rerun["total_ms"])
+            for key, ms in rerun["sections"].items():
+                samples.setdefault(f"{name}/{key}" if name else key, []).append(ms)
+        table = {}
+        for key, values in samples.items():
+            if not values:
+                continue
+            values = sorted(values)
+            table[key] = {"count": len(values), **{f"p{q}": _percentile(values, q) for q in percentiles}}
+        return table
+
+    def to_json(self):
+        return json.dumps({"reruns": list(self.reruns), "percentiles": self.percentiles()}, indent=2)
+
+    def clear(self):
+        self.reruns.clear()
+        self.last_cprofile = None
+
+
+def active_profiler():
+    """The profiler of the rerun running on this thread, or None."""
+    return getattr(_active, "profiler", None)
+
+
+def profiled(name=None):
+    """Decorator timing each call as a section of the active profiler, if any."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = active_profiler()
+            if profiler is None or not profiler.recording:
+                return func(*args, **kwargs)
+            with profiler.section(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
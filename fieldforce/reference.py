@@ -0,0 +1,31 @@
+"""Read-only reference data shared by every session: roster, outcome profiles and default plan."""
+from types import MappingProxyType
+
+from fieldforce.roster import DOCTOR_LOCATIONS
+from fieldforce.simulation import DOCTOR_OUTCOMES, default_plan, outcome_profiles
+
+
+def load_reference_data():
+    """
+    Builds the reference data once per process (the dashboard keeps it in
+    ``st.cache_resource``). Returns a read-only mapping with:
+
+    - ``doctor_outcomes`` / ``doctor_locations``: the module-level read-only rosters,
+    - ``roster``: the known doctor and pharmacy names,
+    - ``outcome_profiles``: the parsed, read-only outcome table, the very frame
+      ``simulate_execution`` reads for the default profiles,
+    - ``default_plan``: the typed default plan.
+
+    The frames are shared, not copied, so they must never be modified in place.
+    Sessions hold the default plan in a ``PlanStore``, which keeps it as its base
+    and builds a new frame on the first change, i.e. the plan is copied only
+    for sessions that edit it.
+    """
+    roster = tuple(sorted((set(DOCTOR_OUTCOMES) | set(DOCTOR_LOCATIONS)) - {"default"}))
+    return MappingProxyType({
+        "doctor_outcomes": DOCTOR_OUTCOMES,
+        "doctor_locations": DOCTOR_LOCATIONS,
+        "roster": roster,
+        "outcome_profiles": outcome_profiles(DOCTOR_OUTCOMES),
+        "default_plan": default_plan(),
+    })
@@ -0,0 +1,120 @@
+"""Next-day replan text and structured plan built from a day's execution data."""
+import pandas as pd
+
+from fieldforce.roster import DOCTOR_LOCATIONS
+from fieldforce.scheduler import historical_durations, schedule_visits
+from fieldforce.schema import NEXT_DAY_PLAN_COLUMNS, typed_next_day_plan
+
+REPLAN_SUMMARY = """
+### Replan Suggestions for Tomorrow:
+
+Based on today's performance and insights, here are some high-priority suggestions for your next day's plan:
+
+1.  **Reschedule Dr. Verma:** This is critical. Prioritize rescheduling for early morning or late afternoon to avoid peak OPD hours. Objective: Ensure successful product detailing.
+2.  **Follow-up with Dr. Mehta:** Address the price objection. Prepare specific data on ROI for Brand A or discuss alternative solutions. Objective: Convert partial success to full Rx.
+3.  **Reinforce Success with Dr. Joshi & Dr. Kumar:** Maintain strong relationships and potentially increase frequency of visits or introduce new product lines. Objective: Deepen engagement and increase Rx volume.
+4.  **Strategic Pharmacy Visit (Sai Pharma):** Build on the successful order for Brand B. Discuss potential for Brand A or new products.
+5.  **Target New Leads (if available):** Allocate 1-2 slots for cold calls or introductory visits to expand reach, especially in areas with lower current success rates.
+
+**Considerations for Time Slots:**
+* Avoid peak clinic hours for critical doctor visits identified as 'Failed' or 'Partial'.
+* Group geographically close visits to optimize travel time.
+
+This replan focuses on addressing today's challenges and capitalizing on successes to improve overall territory performance.
+"""
+
+
+def build_replan(execution_df, random_state=None, history=None, backlog=None, locations=DOCTOR_LOCATIONS):
+    """
+    Generates a simple AI-like replan summary and a structured DataFrame
+    for the next day's plan based on insights.
+
+    ``random_state`` seeds the choice of successful visits to reinforce, so batch
+    runs are reproducible. ``history`` (earlier typed executions) supplies visit
+    durations, and ``backlog`` holds visits spilled over from earlier plans. The
+    visits are packed and timed by ``schedule_visits``, with doctors placed by
+    ``locations``. Returns
+    ``(replan_text, next_day_plan)`` with the plan in the typed schema; its "Day"
+    column is 1 for tomorrow and higher for visits that spill over.
+    """
+    if execution_df.empty:
+        return "Cannot generate replan without simulation data.", typed_next_day_plan(pd.DataFrame(columns=NEXT_DAY_PLAN_COLUMNS))
+
+    next_day_visits = []
+
+    # Priority 1: Reschedule failed visits
+    failed_visits_today = execution_df[execution_df["Actual Status"] == "Failed"]
+    for _, row in failed_visits_today.iterrows():
+        next_day_visits.append({
+            "Time Slot": 570, # 09:30 AM: suggest an early slot
+            "Doctor": row["Doctor"],
+            "Objective": f"Reschedule: {row['Planned Objective']}",
+            "Brand": row["Brand"],
+            "Priority": "High (Failed Today)"
+        })
+
+    # Priority 2: Follow-up on partial success
+    partial_visits_today = execution_df[execution_df["Actual Status"] == "Partial"]
+    for _, row in partial_visits_today.iterrows():
+        next_day_visits.append({
+            "Time Slot": 660, # 11:00 AM: suggest a mid-morning slot
+            "Doctor": row["Doctor"],
+            "Objective": f"Follow-up: {row['Planned Objective']}",
+            "Brand": row["Brand"],
+            "Priority": "High (Partial Today)"
+        })
+
+    # Priority 3: Maintain success & explore further
+    success_visits_today = execution_df[execution_df["Actual Status"] == "Success"]
+    # Exclude those already marked for high priority follow-up
+    success_for_next_day = success_visits_today[
+        ~success_visits_today['Doctor'].isin(failed_visits_today['Doctor']) &
+        ~success_visits_today['Doctor'].isin(partial_visits_today['Doctor'])
+    ]
+    for _, row in success_for_next_day.sample(min(2, len(success_for_next_day)), random_state=random_state).iterrows(): # Take up to 2 successful ones
+        next_day_visits.append({
+            "Time Slot": 810, # 01:30 PM: suggest afternoon slot
+            "Doctor": row["Doctor"],
+            "Objective": f"Reinforce: {row['Planned Objective']}",
+            "Brand": row["Brand"],
+            "Priority": "Medium (Successful Today)"
+        })
+
+    # Add a generic new lead if few visits generated
+    if len(next_day_visits) < 5:
+        next_day_visits.append({
+            "Time Slot": 900, # 03:00 PM
+            "Doctor": "New Lead Clinic",
+            "Objective": "New Introduction",
+            "Brand": "Any",
+            "Priority": "Low (New Potential)"
+        })
+
+    next_day_plan = typed_next_day_plan(pd.DataFrame(next_day_visits))
+
+    # Sort by Priority (category order, highest first), then by time of day.
+    # Visits carried over from earlier days go ahead of new ones of the same priority.
+    if backlog is not None and not backlog.empty:
+        next_day_plan = pd.concat([typed_next_day_plan(backlog), next_day_plan], ignore_index=True)
+        next_day_plan = typed_next_day_plan(next_day_plan)
+    next_day_plan = next_day_plan.sort_values(by=["Priority", "Time Slot"], kind="stable")
+
+    # Pack the visits into working days by priority and route each day geographically;
+    # failed/partial doctors stay out of OPD peak hours. Visit lengths come from the
+    # doctor's completed visits today and in ``history``.
+    executions = execution_df if history is None or history.empty else pd.concat([history, execution_df], ignore_index=True)
+    next_day_plan, schedule = schedule_visits(
+        next_day_plan, durations=historical_durations(executions), locations=locations
+    )
+
+    replan_text = REPLAN_SUMMARY + (
+        f"\n**Route for Tomorrow:** {int((next_day_plan['Day'] == 1).sum())} visits with about "
+        f"{schedule['travel_minutes']:.0f} minutes of travel "
+        f"({schedule['travel_minutes_saved']:.0f} minutes saved versus visiting in priority order).\n"
+    )
+    if schedule["deferred_visits"]:
+        replan_text += (
+            f"\n**Capacity:** {schedule['deferred_visits']} lower-priority visits don't fit tomorrow's working day "
+            f"and are scheduled over the following {schedule['days'] - 1} day(s).\n"
+        )
+    return replan_text, next_day_plan
@@ -0,0 +1,63 @@
+"""Daily visit and Rx rollups per rep, doctor, brand and status, and their period totals."""
+import numpy as np
+import pandas as pd
+
+from fieldforce.schema import STATUSES
+
+# Key columns of one daily rollup row; missing keys are stored as "".
+ROLLUP_KEYS = ["Date", "Rep", "Doctor", "Brand", "Actual Status"]
+ROLLUP_VALUES = ["Visits", "Rx", "Units"]
+ROLLUP_COLUMNS = [*ROLLUP_KEYS, *ROLLUP_VALUES]
+
+# Trend window -> pandas period frequency.
+ROLLUP_PERIODS = {"Day": "D", "Week": "W", "Month": "M", "Quarter": "Q"}
+
+
+def daily_rollup(execution):
+    """
+    Reduces a typed execution frame carrying "Date" and "Rep" columns to one row
+    per (date, rep, doctor, brand, status) with the visit count and Rx and unit
+    totals. This is what the history store materializes as each day lands.
+    """
+    if execution.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    keys = {
+        column: execution[column].astype(object).where(execution[column].notna(), "").astype(str).to_numpy()
+        for column in ROLLUP_KEYS
+    }
+    values = pd.DataFrame({
+        **keys,
+        "Visits": np.ones(len(execution), dtype=np.int64),
+        "Rx": execution["Rx"].to_numpy(dtype=np.int64),
+        "Units": execution["Units"].to_numpy(dtype=np.int64),
+    })
+    return values.groupby(ROLLUP_KEYS, sort=False).sum().reset_index()
+
+
+def rollup_window(rollups, period="Week", by="Brand"):
+    """
+    Totals of daily ``rollups`` (as read from ``HistoryStore.read_rollups``) per
+    ``period`` ("Day", "Week", "Month" or "Quarter") and per ``by`` ("Brand",
+    "Doctor", or None for all visits). Each daily row is one pre-aggregated
+    bucket, so the cost depends on the number of buckets, not of visits.
+
+    Returns one row per (period start, key) with "Visits", a count per status,
+    "Success Rate", "Rx" and "Units".
+    """
+    keys = ["Period"] + ([by] if by else [])
+    columns = [*keys, "Visits", *STATUSES, "Success Rate", "Rx", "Units"]
+    if rollups.empty:
+        return pd.DataFrame(columns=columns)
+    periods = pd.to_datetime(rollups["Date"]).dt.to_period(ROLLUP_PERIODS[period]).dt.start_time
+    status = rollups["Actual Status"]
+    frame = pd.DataFrame({
+        "Period": periods,
+        **({by: rollups[by].replace("", "(none)")} if by else {}),
+        "Visits": rollups["Visits"],
+        **{name: rollups["Visits"].where(status == name, 0) for name in STATUSES},
+        "Rx": rollups["Rx"],
+        "Units": rollups["Units"],
+    })
+    totals = frame.groupby(keys, sort=True).sum().reset_index()
+    totals["Success Rate"] = totals["Success"] / totals["Visits"].where(totals["Visits"] > 0)
+    return totals[columns]
@@ -0,0 +1,47 @@
+"""Doctor and pharmacy locations for the demo territory."""
+import hashlib
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+# Rep's starting point for the day (North 2 territory office).
+TERRITORY_BASE = (28.7041, 77.1025)
+
+# Read-only: shared by every session of the server process.
+DOCTOR_LOCATIONS = MappingProxyType({
+    "Dr. Mehta": (28.7196, 77.0661),
+    "Dr. Verma": (28.6863, 77.1310),
+    "Dr. Joshi": (28.7328, 77.1196),
+    "Sai Pharma": (28.6990, 77.0905),
+    "Dr. Kumar": (28.7495, 77.0565),
+    "New Doctor": (28.6692, 77.0978),
+    "New Lead Clinic": (28.7257, 77.1544),
+})
+
+# Unknown names are placed deterministically within this many degrees of the base.
+_UNKNOWN_SPREAD = 0.06
+
+
+def _hashed_offset(name):
+    digest = hashlib.blake2b(str(name).encode(), digest_size=8).digest()
+    u, v = np.frombuffer(digest, dtype=np.uint32) / np.float64(2**32)
+    return (u * 2 - 1) * _UNKNOWN_SPREAD, (v * 2 - 1) * _UNKNOWN_SPREAD
+
+
+def locate_doctors(doctors, locations=DOCTOR_LOCATIONS):
+    """
+    Returns ``(lat, lon)`` float arrays for a Series of doctor names.
+
+    Names missing from ``locations`` get a stable pseudo-location near
+    ``TERRITORY_BASE`` derived from a hash of the name, so new leads can still be
+    routed. Each distinct name is resolved once.
+    """
+    codes, uniques = pd.factorize(doctors)
+    coords = np.array([
+        locations.get(name) or tuple(np.add(TERRITORY_BASE, _hashed_offset(name)))
+        for name in uniques
+    ] + [TERRITORY_BASE], dtype=float)
+    # Code -1 (missing name) picks the appended base location.
+    located = coords[codes]
+    return located[:, 0], located[:, 1]
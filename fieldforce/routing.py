@@ -0,0 +1,169 @@
+"""Travel-aware ordering of a day's visits with OPD-peak time windows."""
+import numpy as np
+import pandas as pd
+
+from fieldforce.roster import DOCTOR_LOCATIONS, TERRITORY_BASE, locate_doctors
+
+DAY_START = 540  # 09:00 AM
+AVERAGE_SPEED_KMH = 25
+DEFAULT_VISIT_MINUTES = 30
+
+# Doctors who failed or only partially converted today are not visited during
+# peak OPD hours (10:00 AM - 1:00 PM).
+PEAK_OPD_WINDOW = (600, 780)
+AVOID_PEAK_PRIORITIES = ["High (Failed Today)", "High (Partial Today)"]
+
+EARTH_RADIUS_KM = 6371.0
+
+ROUTE_SUMMARY_FIELDS = ["stops", "naive_travel_minutes", "travel_minutes", "travel_minutes_saved", "wait_minutes"]
+
+
+def travel_minutes_matrix(lat, lon, speed_kmh=AVERAGE_SPEED_KMH):
+    """Pairwise haversine travel times in minutes, computed as one (n, n) array."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return km / speed_kmh * 60
+
+
+def _schedule(path, travel, durations, avoid_peak, day_start):
+    """
+    Walks ``path`` (node 0 is the base) and returns ``(arrivals, travel, wait)``.
+    A visit that would overlap the OPD peak at an ``avoid_peak`` stop waits until
+    the peak ends.
+    """
+    peak_start, peak_end = PEAK_OPD_WINDOW
+    now, total_travel, total_wait = day_start, 0.0, 0.0
+    arrivals = np.empty(len(path) - 1)
+    for position in range(1, len(path)):
+        stop = path[position]
+        leg = travel[path[position - 1], stop]
+        now += leg
+        total_travel += leg
+        if avoid_peak[stop] and now < peak_end and now + durations[stop] > peak_start:
+            total_wait += peak_end - now
+            now = peak_end
+        arrivals[position - 1] = now
+        now += durations[stop]
+    return arrivals, total_travel, total_wait
+
+
+def _nearest_neighbour(travel):
+    n = len(travel)
+    path = [0]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[0] = False
+    for _ in range(n - 1):
+        distances = np.where(unvisited, travel[path[-1]], np.inf)
+        nxt = int(np.argmin(distances))
+        path.append(nxt)
+        unvisited[nxt] = False
+    return np.array(path)
+
+
+def _two_opt(path, travel, cost, max_rounds=200, candidates_per_round=16):
+    """
+    Improves an open path that starts at the base by 2-opt segment reversals.
+
+    Travel deltas for every (i, j) reversal are computed at once; the most
+    promising ones are then checked against the full ``cost`` (travel plus
+    time-window waiting), and the first real improvement is applied.
+    """
+    best_cost = cost(path)
+    n = len(path)
+    if n < 4:
+        return path, best_cost
+    i, j = np.triu_indices(n, k=1)
+    keep = i >= 1
+    i, j = i[keep], j[keep]
+    for _ in range(max_rounds):
+        a, b, c = path[i - 1], path[i], path[j]
+        has_next = j + 1 < n
+        e = path[np.minimum(j + 1, n - 1)]
+        delta = travel[a, c] - travel[a, b] + np.where(has_next, travel[b, e] - travel[c, e], 0.0)
+        order = np.argsort(delta)[:candidates_per_round]
+        improved = False
+        for k in order:
+            candidate = path.copy()
+            candidate[i[k]:j[k] + 1] = candidate[i[k]:j[k] + 1][::-1]
+            candidate_cost = cost(candidate)
+            if candidate_cost < best_cost - 1e-9:
+                path, best_cost, improved = candidate, candidate_cost, True
+                break
+        if not improved:
+            break
+    return path, best_cost
+
+
+def route_visits(plan, durations=None, avoid_peak=None, day_start=DAY_START, base=TERRITORY_BASE,
+                 locations=DOCTOR_LOCATIONS):
+    """
+    Orders a day's visits to minimise travel plus time-window waiting.
+
+    Starts from ``base`` with a nearest-neighbour tour and refines it with 2-opt;
+    doctors are placed by ``locate_doctors`` from ``locations``.
+    ``durations`` gives per-visit minutes (default ``DEFAULT_VISIT_MINUTES``) and
+    ``avoid_peak`` marks visits that must not overlap ``PEAK_OPD_WINDOW``; by
+    default these are the ``AVOID_PEAK_PRIORITIES`` rows. Returns the plan reordered
+    with "Time Slot" set to each planned arrival (rounded up to 5 minutes), and a
+    summary dict (``ROUTE_SUMMARY_FIELDS``) with the naive (incoming order) and
+    optimized travel minutes, the minutes saved and the time-window waiting.
+    """
+    n = len(plan)
+    if n == 0:
+        return plan, dict.fromkeys(ROUTE_SUMMARY_FIELDS, 0.0) | {"stops": 0}
+
+    lat, lon = locate_doctors(plan["Doctor"], locations)
+    travel = travel_minutes_matrix(np.append(base[0], lat), np.append(base[1], lon))
+
+    visit_minutes = np.full(n, DEFAULT_VISIT_MINUTES, dtype=float) if durations is None else (
+        pd.Series(durations, dtype=float).fillna(DEFAULT_VISIT_MINUTES).to_numpy()
+    )
+    if avoid_peak is None:
+        avoid_peak = plan["Priority"].isin(AVOID_PEAK_PRIORITIES).to_numpy() if "Priority" in plan else np.zeros(n, dtype=bool)
+    # Index 0 is the base; stops are 1..n.
+    visit_minutes = np.append(0.0, visit_minutes)
+    avoid_peak = np.append(False, np.asarray(avoid_peak, dtype=bool))
+
+    def cost(path):
+        _, total_travel, total_wait = _schedule(path, travel, visit_minutes, avoid_peak, day_start)
+        return total_travel + total_wait
+
+    naive_path = np.arange(n + 1)
+    _, naive_travel, _ = _schedule(naive_path, travel, visit_minutes, avoid_peak, day_start)
+
+    path, _ = _two_opt(_nearest_neighbour(travel), travel, cost)
+    # Never return a route with more travel-plus-waiting than the incoming order.
+    if cost(naive_path) <= cost(path):
+        path = naive_path
+    arrivals, total_travel, total_wait = _schedule(path, travel, visit_minutes, avoid_peak, day_start)
+
+    routed = plan.iloc[path[1:] - 1].copy()
+    routed["Time Slot"] = pd.array(np.ceil(arrivals / 5) * 5 % 1440, dtype="Int16")
+    summary = {
+        "stops": n,
+        "naive_travel_minutes": round(float(naive_travel), 1),
+        "travel_minutes": round(float(total_travel), 1),
+        "travel_minutes_saved": round(float(naive_travel - total_travel), 1),
+        "wait_minutes": round(float(total_wait), 1),
+    }
+    return routed, summary
+
+
+def route_plans(plans, by="Rep", duration_column=None, **kwargs):
+    """
+    Routes every group of a long-format plan frame (one group per rep by default),
+    taking visit lengths from ``duration_column`` if given. Returns the routed
+    plans and a per-group summary frame.
+    """
+    routed, summaries = [], []
+    for key, group in plans.groupby(by, sort=False, observed=True):
+        durations = group[duration_column] if duration_column else None
+        routed_group, summary = route_visits(group, durations=durations, **kwargs)
+        routed.append(routed_group)
+        summaries.append({by: key, **summary})
+    if not routed:
+        return plans.iloc[0:0], pd.DataFrame(columns=[by, *ROUTE_SUMMARY_FIELDS])
+    return pd.concat(routed), pd.DataFrame(summaries)
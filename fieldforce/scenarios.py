@@ -0,0 +1,164 @@
+"""What-if comparison of candidate next-day plans by Monte Carlo simulation."""
+import numpy as np
+import pandas as pd
+
+from fieldforce.roster import DOCTOR_LOCATIONS, TERRITORY_BASE, locate_doctors
+from fieldforce.routing import route_visits, travel_minutes_matrix
+from fieldforce.scheduler import DAY_END, split_next_day_plan
+from fieldforce.schema import PLAN_COLUMNS, STATUSES
+from fieldforce.simulation import DOCTOR_OUTCOMES, simulate_execution
+
+DEFAULT_RUNS = 500
+SHUFFLED_VARIANTS = 3
+# Two-sided 95% normal quantile for the confidence intervals of the means.
+CONFIDENCE_Z = 1.96
+
+SCENARIO_COLUMNS = [
+    "Scenario", "Visits",
+    "Expected Rx", "Rx Low", "Rx High",
+    "Success Rate", "Success Low", "Success High",
+    "Travel Minutes", "Travel Low", "Travel High",
+    "Missed Visits",
+]
+
+
+def _tomorrow(plan):
+    """Tomorrow's visits of a next-day plan (or all rows of a plain plan), in time-slot order."""
+    if "Day" in plan:
+        plan = split_next_day_plan(plan)[0]
+    return plan.sort_values("Time Slot", kind="stable", na_position="last").reset_index(drop=True)
+
+
+def _reordered(plan, order):
+    """``plan`` visited in ``order``, reusing its time slots in the same sorted sequence."""
+    reordered = plan.iloc[order].reset_index(drop=True)
+    reordered["Time Slot"] = plan["Time Slot"].array
+    return reordered
+
+
+def candidate_plans(ai_plan, edited_plan=None, shuffles=SHUFFLED_VARIANTS, seed=0, locations=DOCTOR_LOCATIONS):
+    """
+    Candidate versions of tomorrow's plan, by name: the "AI plan", the rep's
+    "Edited plan" (if it differs), the AI plan's "Optimized route" (least
+    travel plus peak-hour waiting, from ``route_visits`` over the doctor
+    ``locations``; not necessarily the least travel), and the AI plan
+    "Reversed" and in ``shuffles`` random orders. Reordered variants keep the
+    plan's time slots and give them to the visits in the new order.
+    """
+    ai_plan = _tomorrow(ai_plan)
+    candidates = {"AI plan": ai_plan}
+    if edited_plan is not None:
+        edited_plan = _tomorrow(edited_plan)
+        if not edited_plan.equals(ai_plan):
+            candidates["Edited plan"] = edited_plan
+    if len(ai_plan) > 1:
+        candidates["Optimized route"] = route_visits(ai_plan, locations=locations)[0].reset_index(drop=True)
+        candidates["Reversed"] = _reordered(ai_plan, np.arange(len(ai_plan))[::-1])
+        rng = np.random.default_rng(seed)
+        for number in range(1, shuffles + 1):
+            candidates[f"Shuffle {number}"] = _reordered(ai_plan, rng.permutation(len(ai_plan)))
+    return candidates
+
+
+def _legs(plan, base=TERRITORY_BASE, locations=DOCTOR_LOCATIONS):
+    """Travel minutes from the base to the first visit and between consecutive visits."""
+    lat, lon = locate_doctors(plan["Doctor"], locations)
+    travel = travel_minutes_matrix(np.append(base[0], lat), np.append(base[1], lon))
+    return travel[np.arange(len(plan)), np.arange(1, len(plan) + 1)]
+
+
+def simulate_scenario(plan, runs, rng, outcomes=DOCTOR_OUTCOMES, cancel_rate=0.1, model=None, day_end=DAY_END,
+                      locations=DOCTOR_LOCATIONS):
+    """
+    Runs tomorrow's ``plan`` ``runs`` times and returns per-run arrays of Rx,
+    success rate, travel minutes and missed visits.
+
+    All runs are simulated in one vectorized ``simulate_execution`` call, with
+    delays and cancellations drawn around the ``outcomes`` profiles, or every
+    outcome drawn from ``model`` if given. Each run then walks the visits in order
+    between the doctor ``locations``: a visit starts when the rep has arrived and
+    the doctor is ready (slot plus the drawn delay), and from the first visit
+    that would start after ``day_end`` the rest of the day is missed.
+    """
+    n = len(plan)
+    if n == 0:
+        zeros = np.zeros(runs)
+        return {"rx": zeros, "success": zeros, "travel": zeros, "missed": zeros}
+    runs_plan = plan[PLAN_COLUMNS].iloc[np.tile(np.arange(n), runs)].reset_index(drop=True)
+    execution = simulate_execution(runs_plan, outcomes=outcomes, rng=rng, cancel_rate=cancel_rate, model=model)
+
+    def matrix(values):
+        return np.asarray(values, dtype=float).reshape(runs, n)
+
+    slots = matrix(execution["Time Slot"].to_numpy(dtype=float, na_value=np.nan))
+    actual = matrix(execution["Actual Time"].to_numpy(dtype=float, na_value=np.nan))
+    ready = slots + np.clip((actual - slots + 720) % 1440 - 720, 0, None)
+    durations = matrix(execution["Duration"].to_numpy(dtype=float, na_value=0))
+    rx = matrix(execution["Rx"])
+    success = matrix(execution["Actual Status"].cat.codes == STATUSES.index("Success"))
+    legs = _legs(plan, locations=locations)
+
+    clock = np.nan_to_num(ready[:, 0], nan=day_end) - legs[0]
+    reached = np.ones(runs, dtype=bool)
+    made = np.zeros((runs, n), dtype=bool)
+    travel = np.zeros(runs)
+    for stop in range(n):
+        start = np.fmax(clock + legs[stop], ready[:, stop])
+        reached &= start < day_end
+        made[:, stop] = reached
+        travel += np.where(reached, legs[stop], 0.0)
+        clock = np.where(reached, start + durations[:, stop], clock)
+    return {
+        "rx": (rx * made).sum(axis=1),
+        "success": (success * made).sum(axis=1) / n,
+        "travel": travel,
+        "missed": n - made.sum(axis=1),
+    }
+
+
+def _interval(values):
+    mean = float(values.mean())
+    half = CONFIDENCE_Z * float(values.std(ddof=1)) / np.sqrt(len(values)) if len(values) > 1 else 0.0
+    return mean, mean - half, mean + half
+
+
+def compare_scenarios(scenarios, runs=DEFAULT_RUNS, outcomes=DOCTOR_OUTCOMES, cancel_rate=0.1, model=None, seed=0,
+                      locations=DOCTOR_LOCATIONS, progress=None):
+    """
+    Simulates every candidate plan in ``scenarios`` (name -> plan) ``runs``
+    times (see ``simulate_scenario``) and returns one row per scenario
+    (``SCENARIO_COLUMNS``) with the expected Rx, success rate and travel
+    minutes and their 95% confidence intervals, plus the mean number of missed
+    visits.
+
+    Every scenario is simulated from the same ``seed``, so a comparison is
+    repeatable. ``progress(fraction, message)`` is called after each scenario,
+    which lets the comparison run as a job.
+    """
+    rows = []
+    for index, (name, plan) in enumerate(scenarios.items()):
+        metrics = simulate_scenario(plan, runs, np.random.default_rng(seed), outcomes=outcomes,
+                                    cancel_rate=cancel_rate, model=model, locations=locations)
+        rx, success, travel = (_interval(metrics[key]) for key in ("rx", "success", "travel"))
+        rows.append([name, len(plan), *rx, *success, *travel, float(metrics["missed"].mean())])
+        if progress is not None:
+            progress((index + 1) / len(scenarios), f"Simulated {index + 1} of {len(scenarios)} scenarios")
+    return pd.DataFrame(rows, columns=SCENARIO_COLUMNS)
+
+
+def scenario_table(results):
+    """Scenario comparison rows with each 95% interval as one "low – high" column, for display."""
+    def interval(low, high, fmt):
+        return [f"{fmt.format(a)} – {fmt.format(b)}" for a, b in zip(results[low], results[high])]
+
+    return pd.DataFrame({
+        "Scenario": results["Scenario"],
+        "Visits": results["Visits"],
+        "Expected Rx": results["Expected Rx"],
+        "Rx 95% CI": interval("Rx Low", "Rx High", "{:.1f}"),
+        "Success Rate": results["Success Rate"],
+        "Success 95% CI": interval("Success Low", "Success High", "{:.1%}"),
+        "Travel (mins)": results["Travel Minutes"],
+        "Travel 95% CI": interval("Travel Low", "Travel High", "{:.0f}"),
+        "Missed Visits": results["Missed Visits"],
+    })
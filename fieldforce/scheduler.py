@@ -0,0 +1,121 @@
+"""Capacity-aware packing of prioritized visits into working days."""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.roster import DOCTOR_LOCATIONS
+from fieldforce.routing import DAY_START, DEFAULT_VISIT_MINUTES, route_visits
+from fieldforce.schema import PRIORITIES
+
+DAY_END = 1080  # 06:00 PM
+
+# Travel reserved per visit while packing; the routed day is then checked exactly.
+TRAVEL_ALLOWANCE_MINUTES = 15
+
+# Lower rank is scheduled first; rows without a known priority go last.
+PRIORITY_RANKS = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+
+
+def historical_durations(executions):
+    """Mean length in minutes of completed (non-zero) visits per doctor."""
+    completed = executions[executions["Duration"] > 0]
+    return completed.groupby("Doctor", observed=True)["Duration"].mean().astype(float)
+
+
+def split_next_day_plan(next_day_plan):
+    """
+    Splits a scheduled next-day plan into tomorrow's visits and the backlog for
+    later days, with the backlog's "Day" moved one day closer.
+    """
+    is_tomorrow = next_day_plan["Day"] <= 1
+    backlog = next_day_plan[~is_tomorrow].copy()
+    backlog["Day"] = backlog["Day"] - 1
+    return next_day_plan[is_tomorrow], backlog
+
+
+def schedule_visits(plan, durations=None, day_start=DAY_START, day_end=DAY_END,
+                    travel_allowance=TRAVEL_ALLOWANCE_MINUTES, locations=DOCTOR_LOCATIONS):
+    """
+    Packs ``plan`` into non-overlapping visits over as many working days as needed.
+
+    Visits come off a priority queue ordered by ``PRIORITY_RANKS`` (then plan
+    order) and fill each day up to ``day_end``, reserving ``travel_allowance``
+    per visit. A visit that does not fit is skipped, so shorter lower-priority
+    visits still fill the rest of the day, and spills to the following day.
+    The queue is kept as one heap per visit length, so filling a day looks at
+    each length's best visit rather than the whole backlog. Each day is then
+    routed with ``route_visits`` over ``locations``; if the exact routed day runs past ``day_end`` its
+    lowest-priority visit is pushed to the next day. ``durations`` maps doctor
+    names to visit minutes (``DEFAULT_VISIT_MINUTES`` otherwise).
+
+    Returns the plan with "Day" (1 = tomorrow) and routed "Time Slot" values,
+    sorted by day and time, and a summary dict with the number of days used,
+    tomorrow's travel minutes and saving, and the visits deferred past tomorrow.
+    """
+    summary = {"days": 0, "travel_minutes": 0.0, "travel_minutes_saved": 0.0, "deferred_visits": 0}
+    if plan.empty:
+        return plan.assign(Day=pd.Series(dtype=np.int16)), summary
+
+    plan = plan.reset_index(drop=True)
+    if durations is None:
+        minutes = np.full(len(plan), DEFAULT_VISIT_MINUTES, dtype=float)
+    else:
+        minutes = plan["Doctor"].astype(object).map(durations).astype(float).fillna(DEFAULT_VISIT_MINUTES).to_numpy()
+    if "Priority" in plan:
+        ranks = plan["Priority"].astype(object).map(PRIORITY_RANKS).fillna(len(PRIORITIES)).to_numpy()
+    else:
+        ranks = np.full(len(plan), len(PRIORITIES))
+
+    capacity = day_end - day_start
+    needs = minutes + travel_allowance
+    # Visit length with travel -> heap of (rank, position).
+    pending = {}
+    for position in range(len(plan)):
+        pending.setdefault(needs[position], []).append((ranks[position], position))
+    for queue in pending.values():
+        heapq.heapify(queue)
+    days = np.zeros(len(plan), dtype=np.int16)
+    slots = np.zeros(len(plan), dtype=float)
+
+    day = 0
+    while pending:
+        day += 1
+        remaining = capacity
+        today, deferred = [], []
+        # Take the highest-priority visit that still fits until none does. A
+        # visit longer than a whole day still gets a day of its own.
+        while pending:
+            fitting = [need for need in pending if need <= remaining or not today]
+            if not fitting:
+                break
+            need = min(fitting, key=lambda length: pending[length][0])
+            today.append(heapq.heappop(pending[need]))
+            if not pending[need]:
+                del pending[need]
+            remaining -= need
+
+        while True:
+            positions = [position for _, position in today]
+            routed, route = route_visits(plan.iloc[positions], durations=minutes[positions], day_start=day_start,
+                                        locations=locations)
+            finish = routed["Time Slot"].astype(float).to_numpy() + minutes[routed.index.to_numpy()]
+            if len(today) == 1 or finish.max() <= day_end:
+                break
+            # Over capacity once real travel is known: drop the lowest-priority visit.
+            deferred.append(max(today))
+            today.remove(max(today))
+
+        days[routed.index] = day
+        slots[routed.index] = routed["Time Slot"].astype(float).to_numpy()
+        if day == 1:
+            summary["travel_minutes"] = route["travel_minutes"]
+            summary["travel_minutes_saved"] = route["travel_minutes_saved"]
+        for entry in deferred:
+            heapq.heappush(pending.setdefault(needs[entry[1]], []), entry)
+
+    scheduled = plan.assign(Day=days)
+    scheduled["Time Slot"] = pd.array(slots, dtype="Int16")
+    summary["days"] = day
+    summary["deferred_visits"] = int((days > 1).sum())
+    return scheduled.sort_values(["Day", "Time Slot"], kind="stable"), summary
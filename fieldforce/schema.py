@@ -0,0 +1,214 @@
+"""
+Typed schema for plan, execution and next-day plan frames.
+
+Inside the engine and session state, time slots and actual times are nullable
+int16 minute-of-day, durations are int16 minutes, Doctor/Brand/Status/Priority are
+categoricals, and execution frames carry "Rx" and unit-order "Units" counts parsed
+once from "Outcome".
+``to_display`` turns any of these back into the "9:00 AM" / "28 mins" strings the
+UI and the history store use; the ``typed_*`` converters accept either form.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+PLAN_COLUMNS = ["Time Slot", "Doctor", "Objective", "Brand"]
+
+EXECUTION_COLUMNS = [
+    "Time Slot", "Doctor", "Planned Objective", "Actual Time", "Outcome",
+    "Notes", "Duration", "Actual Status", "Brand"
+]
+
+# "Day" is 1 for tomorrow; visits the scheduler spills over land on 2, 3, ...
+NEXT_DAY_PLAN_COLUMNS = ["Time Slot", "Doctor", "Objective", "Brand", "Priority", "Day"]
+
+STATUSES = ["Success", "Partial", "Failed"]
+
+# Highest priority first; sorting the categorical follows this order.
+PRIORITIES = ["High (Failed Today)", "High (Partial Today)", "Medium (Successful Today)", "Low (New Potential)"]
+
+MINUTE_COLUMNS = ["Time Slot", "Actual Time"]
+
+# Same slots strptime("%I:%M %p") accepts, e.g. "9:00 AM" or "09:00 am".
+_TIME_SLOT_PATTERN = r"^(1[0-2]|0[1-9]|[1-9]):([0-5]\d|\d)\s+([AaPp][Mm])$"
+_TIME_SLOT_REGEX = re.compile(_TIME_SLOT_PATTERN)
+_DURATION_PATTERN = r"^\s*(\d+)\s*min"
+_RX_PATTERN = re.compile(r"(\d+)\s*Rx", re.IGNORECASE)
+# Pharmacy orders, e.g. "Order placed (Brand B x200 units)".
+_UNITS_PATTERN = re.compile(r"x\s*(\d+)\s*units?\b", re.IGNORECASE)
+
+# "%I:%M %p" label for every minute of the day, so formatting is a single take().
+_MINUTE_LABELS = np.array([f"{(m // 60 + 11) % 12 + 1:02d}:{m % 60:02d} {'AM' if m < 720 else 'PM'}" for m in range(1440)], dtype=object)
+
+
+def get_rx_count(objective_text):
+    """Safely extract Rx count from objective text using regex for better parsing."""
+    if pd.isna(objective_text):
+        return 0
+    try:
+        match = _RX_PATTERN.search(str(objective_text))
+        if match:
+            return int(match.group(1))
+        return 0
+    except ValueError:
+        return 0
+
+
+def _map_unique(series, parse):
+    """Applies a vectorized ``parse`` to the distinct values of ``series`` only."""
+    # Plans and outcome logs repeat a handful of strings, so this parses each once.
+    codes, uniques = pd.factorize(series)
+    parsed = np.asarray(parse(pd.Series(uniques, dtype="string")), dtype=float)
+    return pd.Series(np.append(parsed, np.nan)[codes], index=series.index)
+
+
+def _parse_slot_strings(slots):
+    parts = slots.str.extract(_TIME_SLOT_PATTERN)
+    is_pm = (parts[2].str.upper() == "PM").fillna(False).to_numpy(dtype=bool)
+    return (parts[0].astype(float) % 12 * 60 + parts[1].astype(float)).to_numpy() + np.where(is_pm, 720, 0)
+
+
+def parse_time_slot(time_slot):
+    """Minute-of-day of a single "9:00 AM"-style slot, or None if it doesn't parse."""
+    match = _TIME_SLOT_REGEX.match(str(time_slot))
+    if match is None:
+        return None
+    hour, minute, meridiem = match.groups()
+    return int(hour) % 12 * 60 + int(minute) + (720 if meridiem.upper() == "PM" else 0)
+
+
+def parse_time_slots(time_slots):
+    """Convert "9:00 AM"-style slots to minute-of-day; unparseable slots become NaN."""
+    return _map_unique(time_slots, _parse_slot_strings)
+
+
+def format_time_slots(minutes):
+    """Format minute-of-day values as "%I:%M %p" strings; missing values become "N/A"."""
+    valid = minutes.notna().to_numpy()
+    labels = np.full(len(minutes), "N/A", dtype=object)
+    labels[valid] = _MINUTE_LABELS[minutes.to_numpy()[valid].astype(np.int64) % 1440]
+    return pd.Series(labels, index=minutes.index)
+
+
+def parse_durations(durations):
+    """Convert "28 mins"-style durations to integer minutes; unparseable values become NaN."""
+    return _map_unique(durations, lambda values: values.str.extract(_DURATION_PATTERN)[0].astype(float))
+
+
+def extract_rx_units(outcomes):
+    """
+    Bulk version of ``get_rx_count`` that also reads pharmacy unit orders.
+
+    Returns an int32 frame indexed like ``outcomes`` with an "Rx" column ("3 Rx
+    (Brand A)" -> 3) and a "Units" column ("Order placed (Brand B x200 units)" ->
+    200); outcomes mentioning neither are 0 in both.
+    """
+    codes, uniques = pd.factorize(outcomes)
+    values = pd.Series(uniques, dtype="string")
+    counts = pd.DataFrame({
+        "Rx": values.str.extract(_RX_PATTERN, expand=False),
+        "Units": values.str.extract(_UNITS_PATTERN, expand=False),
+    }).astype(float).fillna(0).to_numpy()
+    # Code -1 (missing outcome) picks the appended zero row.
+    counts = np.vstack([counts.reshape(-1, 2), np.zeros((1, 2))])[codes].astype(np.int32)
+    return pd.DataFrame(counts, columns=["Rx", "Units"], index=outcomes.index)
+
+
+def _as_minutes(series, parse):
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("Int16")
+    return parse(series).round().astype("Int16")
+
+
+def _as_category(series, categories=None):
+    if categories is not None:
+        return pd.Categorical(series, categories=categories)
+    return series.astype("category")
+
+
+def _as_text(series):
+    return series.astype(object).where(series.notna(), None)
+
+
+def _is_typed_plan(plan):
+    return (
+        list(plan.columns[:len(PLAN_COLUMNS)]) == PLAN_COLUMNS
+        and plan["Time Slot"].dtype == "Int16"
+        and isinstance(plan["Doctor"].dtype, pd.CategoricalDtype)
+        and isinstance(plan["Brand"].dtype, pd.CategoricalDtype)
+    )
+
+
+def typed_plan(plan):
+    """Returns ``plan`` with ``PLAN_COLUMNS`` in the typed schema (``plan`` itself if it already is)."""
+    if _is_typed_plan(plan):
+        return plan if len(plan.columns) == len(PLAN_COLUMNS) else plan[PLAN_COLUMNS]
+    plan = plan.reindex(columns=PLAN_COLUMNS)
+    return pd.DataFrame({
+        "Time Slot": _as_minutes(plan["Time Slot"], parse_time_slots),
+        "Doctor": _as_category(plan["Doctor"]),
+        "Objective": _as_text(plan["Objective"]),
+        "Brand": _as_category(plan["Brand"]),
+    }, index=plan.index)
+
+
+def typed_execution(execution):
+    """Returns ``execution`` in the typed schema, parsing "Rx" and "Units" if they are absent."""
+    execution = execution.reindex(columns=EXECUTION_COLUMNS + [c for c in ["Rx", "Units"] if c in execution])
+    typed = pd.DataFrame({
+        "Time Slot": _as_minutes(execution["Time Slot"], parse_time_slots),
+        "Doctor": _as_category(execution["Doctor"]),
+        "Planned Objective": _as_text(execution["Planned Objective"]),
+        "Actual Time": _as_minutes(execution["Actual Time"], parse_time_slots),
+        "Outcome": _as_text(execution["Outcome"]),
+        "Notes": _as_text(execution["Notes"]),
+        "Duration": _as_minutes(execution["Duration"], parse_durations),
+        "Actual Status": _as_category(execution["Actual Status"], STATUSES),
+        "Brand": _as_category(execution["Brand"]),
+    }, index=execution.index)
+    if "Rx" in execution and "Units" in execution:
+        counts = execution[["Rx", "Units"]]
+    else:
+        counts = extract_rx_units(typed["Outcome"])
+    typed["Rx"] = counts["Rx"].astype(np.int32)
+    typed["Units"] = counts["Units"].astype(np.int32)
+    return typed
+
+
+def typed_next_day_plan(next_day_plan):
+    """Returns ``next_day_plan`` with ``NEXT_DAY_PLAN_COLUMNS`` in the typed schema."""
+    next_day_plan = next_day_plan.reindex(columns=NEXT_DAY_PLAN_COLUMNS)
+    typed = typed_plan(next_day_plan).copy()
+    typed["Priority"] = _as_category(next_day_plan["Priority"], PRIORITIES)
+    typed["Day"] = pd.to_numeric(next_day_plan["Day"], errors="coerce").fillna(1).clip(lower=1).astype(np.int16)
+    return typed
+
+
+def empty_execution():
+    """An execution frame with no rows and the typed dtypes."""
+    return typed_execution(pd.DataFrame(columns=EXECUTION_COLUMNS))
+
+
+def recategorize(frame):
+    """Re-applies categoricals after concatenating typed frames with differing categories."""
+    frame = frame.copy()
+    for column in ["Rep", "Doctor", "Brand"]:
+        if column in frame and not isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype("category")
+    return frame
+
+
+def to_display(frame):
+    """Formats a typed frame for the UI: clock-time slots, "N mins" durations, plain strings."""
+    display = frame.copy()
+    for column in MINUTE_COLUMNS:
+        if column in display and pd.api.types.is_numeric_dtype(display[column]):
+            display[column] = format_time_slots(display[column])
+    if "Duration" in display and pd.api.types.is_numeric_dtype(display["Duration"]):
+        duration = display["Duration"]
+        display["Duration"] = (duration.astype("string") + " mins").astype(object).where(duration.notna(), None)
+    for column in display.columns:
+        if isinstance(display[column].dtype, pd.CategoricalDtype):
+            display[column] = _as_text(display[column])
+    return display
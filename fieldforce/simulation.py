@@ -0,0 +1,201 @@
+"""Vectorized simulation of a day's field execution from a visit plan."""
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from fieldforce.schema import (
+    STATUSES,
+    empty_execution,
+    extract_rx_units,
+    parse_durations,
+    typed_plan,
+)
+
+# Pre-defined outcome profile per doctor/pharmacy used for the demo simulation.
+# Read-only, profiles included: it is shared by every session of the server process.
+DOCTOR_OUTCOMES = MappingProxyType({
+    "Dr. Mehta": MappingProxyType({"status": "Partial", "outcome": "2 Rx (Brand A)", "notes": "Price objection raised. Follow-up needed with value proposition.", "duration": "28 mins", "delay": 20}),
+    "Dr. Verma": MappingProxyType({"status": "Failed", "outcome": "Canceled - Emergency OPD", "notes": "Doctor unavailable. Needs reschedule due to high patient load.", "duration": "0 mins", "delay": 0}),
+    "Dr. Joshi": MappingProxyType({"status": "Success", "outcome": "4 Rx (Brand A)", "notes": "High potential. Will prescribe more next week. Excellent engagement.", "duration": "45 mins", "delay": 15}),
+    "Sai Pharma": MappingProxyType({"status": "Success", "outcome": "Order placed (Brand B x200 units)", "notes": "Satisfied with stock levels. Discussed promotional offers.", "duration": "35 mins", "delay": 30}),
+    "Dr. Kumar": MappingProxyType({"status": "Success", "outcome": "3 Rx (Brand A)", "notes": "Good discussion on patient benefits. Receptive to new data.", "duration": "30 mins", "delay": 10}),
+    "New Doctor": MappingProxyType({"status": "Success", "outcome": "Introductory Visit", "notes": "Positive first interaction. Follow-up next week.", "duration": "25 mins", "delay": 5}), # Added for custom plan
+    "default": MappingProxyType({"status": "Success", "outcome": "Visit completed", "notes": "Routine check completed satisfactorily.", "duration": "20 mins", "delay": 10})
+})
+
+# Profile applied when a randomized run cancels a visit.
+_CANCELED = "__canceled__"
+CANCELED_OUTCOME = MappingProxyType({"status": "Failed", "outcome": "Canceled - Doctor unavailable", "notes": "Doctor unavailable. Needs reschedule due to high patient load.", "duration": "0 mins", "delay": 0})
+
+# Outcome and notes for a status sampled from an ``OutcomeModel`` that differs from
+# the doctor's profile; a failed visit reads as a cancellation.
+_SAMPLED = {
+    "Success": "__sampled_success__",
+    "Partial": "__sampled_partial__",
+    "Failed": _CANCELED,
+}
+# Share of a doctor's full (successful) Rx and units that a visit with each
+# status yields. A sampled status scales the doctor's profile by these: e.g. a
+# Success drawn for a doctor whose profile is a 2 Rx Partial yields 4 Rx.
+SAMPLED_RX_SHARE = MappingProxyType({"Success": 1.0, "Partial": 0.5, "Failed": 0.0})
+SAMPLED_OUTCOMES = MappingProxyType({
+    "__sampled_success__": MappingProxyType({"status": "Success", "outcome": "Visit completed", "notes": "Routine check completed satisfactorily.", "duration": "20 mins", "delay": 10}),
+    "__sampled_partial__": MappingProxyType({"status": "Partial", "outcome": "Follow-up needed", "notes": "Interested but no commitment yet. Follow-up needed.", "duration": "20 mins", "delay": 10}),
+})
+
+
+
+def default_plan():
+    """Returns the starting plan used for any new day, in the typed schema."""
+    return typed_plan(pd.DataFrame({
+        "Time Slot": ["9:00 AM", "10:30 AM", "12:00 PM", "2:00 PM", "4:00 PM"],
+        "Doctor": ["Dr. Mehta", "Dr. Verma", "Dr. Joshi", "Sai Pharma", "Dr. Kumar"],
+        "Objective": ["Target 5 Rx", "New Product Sampling", "Achieve 3 Rx", "Stock Replenishment", "Secure 4 Rx"],
+        "Brand": ["A", "B", "A", "B", "A"]
+    }))
+
+
+_default_profiles = None
+
+
+def _read_only(frame):
+    """``frame`` rebuilt on non-writeable arrays, so writing to its values raises ``ValueError``."""
+    columns = {}
+    for column in frame.columns:
+        values = frame[column].array
+        if isinstance(values, pd.arrays.IntegerArray):
+            values = values.copy()
+            values._data.setflags(write=False)
+            values._mask.setflags(write=False)
+        else:
+            values = np.array(values, copy=True)
+            values.setflags(write=False)
+        columns[column] = values
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+def outcome_profiles(outcomes=DOCTOR_OUTCOMES):
+    """
+    Outcome profiles as a frame with durations, Rx and unit counts already
+    parsed. The table of the default profiles is parsed once per process and
+    every caller, ``simulate_execution`` and the reference data included, gets
+    that same read-only frame; ``.copy()`` it to modify it.
+    """
+    global _default_profiles
+    if outcomes is DOCTOR_OUTCOMES and _default_profiles is not None:
+        return _default_profiles
+    profiles = pd.DataFrame.from_dict({**outcomes, _CANCELED: CANCELED_OUTCOME, **SAMPLED_OUTCOMES}, orient="index")
+    profiles["duration"] = parse_durations(profiles["duration"]).astype("Int16")
+    profiles[["rx", "units"]] = extract_rx_units(profiles["outcome"]).to_numpy()
+    if outcomes is DOCTOR_OUTCOMES:
+        _default_profiles = profiles = _read_only(profiles)
+    return profiles
+
+
+def _brand_label(brand):
+    brand = str(brand)
+    return brand if brand.lower().startswith("brand") else f"Brand {brand}"
+
+
+def _sampled_outcomes(rx, units, brands, fallback):
+    """
+    Outcome texts for sampled visits, in the profiles' wording ("4 Rx (Brand A)",
+    "Order placed (Brand B x100 units)"), or ``fallback`` where a visit has
+    neither. ``brands`` is a Categorical; each distinct (Rx, units, brand) is
+    formatted once.
+    """
+    rx_codes, rx_values = pd.factorize(rx)
+    unit_codes, unit_values = pd.factorize(units)
+    brand_names = [None, *brands.categories]
+    keys = (rx_codes * len(unit_values) + unit_codes) * len(brand_names) + brands.codes + 1
+    codes, uniques = pd.factorize(keys)
+    texts = []
+    for key in uniques:
+        combination, brand = divmod(int(key), len(brand_names))
+        count = rx_values[combination // len(unit_values)]
+        ordered = unit_values[combination % len(unit_values)]
+        label = "Brand" if brand_names[brand] is None else _brand_label(brand_names[brand])
+        if count > 0:
+            texts.append(f"{count} Rx ({label})")
+        elif ordered > 0:
+            texts.append(f"Order placed ({label} x{ordered} units)")
+        else:
+            texts.append(None)
+    texts = np.array(texts, dtype=object)[codes]
+    return np.where(pd.isna(texts), fallback, texts)
+
+
+def simulate_execution(plan, outcomes=DOCTOR_OUTCOMES, rng=None, cancel_rate=0.1, model=None):
+    """
+    Simulates the execution of every visit in ``plan`` in one vectorized pass.
+
+    Outcome profiles are resolved once per distinct doctor (falling back to
+    ``"default"``) and gathered by category code, and actual times are computed on
+    integer minutes. Returns a new typed execution frame (see ``fieldforce.schema``);
+    an empty plan yields an empty frame.
+
+    Without ``rng`` the outcomes are the fixed demo profiles. With a
+    ``numpy.random.Generator`` each delay is drawn from a Poisson around the profile
+    delay and each visit is canceled with probability ``cancel_rate``. With an
+    ``OutcomeModel`` as well, status, delay and duration are drawn from the model
+    per (doctor, brand) instead, and ``cancel_rate`` is not used; a visit keeps
+    its profile's outcome text when the drawn status matches the profile.
+    Otherwise its Rx and units are the doctor's full (successful) Rx and units,
+    worked out from the profile, times ``SAMPLED_RX_SHARE`` of the drawn status.
+    """
+    plan = typed_plan(plan)
+    if plan.empty:
+        return empty_execution()
+
+    profiles = outcome_profiles(outcomes)
+    doctors = plan["Doctor"]
+    profile_rows = profiles.index.get_indexer(doctors.cat.categories)
+    profile_rows[profile_rows < 0] = profiles.index.get_loc("default")
+    # Code -1 (missing doctor) picks the appended "default" row.
+    rows = np.append(profile_rows, profiles.index.get_loc("default"))[doctors.cat.codes.to_numpy()]
+    delays = profiles["delay"].to_numpy()[rows]
+
+    durations = changed = None
+    if rng is not None and model is not None:
+        statuses, delays, durations = model.sample(doctors, plan["Brand"], rng)
+        sampled_rows = profiles.index.get_indexer([_SAMPLED[status] for status in STATUSES])
+        profile_statuses = pd.Categorical(profiles["status"].to_numpy()[rows], categories=STATUSES).codes
+        changed = profile_statuses != statuses
+        shares = np.array([SAMPLED_RX_SHARE[status] for status in STATUSES])
+        # The profile's counts scaled up to a full visit; a failed profile has none.
+        scale = np.divide(shares[statuses], shares[profile_statuses],
+                          out=np.zeros(len(rows)), where=shares[profile_statuses] > 0)
+        sampled_rx, sampled_units = (
+            np.rint(profiles[column].to_numpy()[rows] * scale).astype(np.int32) for column in ("rx", "units")
+        )
+        rows = np.where(changed, sampled_rows[statuses], rows)
+    elif rng is not None:
+        delays = rng.poisson(delays)
+        canceled = rng.random(len(rows)) < cancel_rate
+        rows[canceled] = profiles.index.get_loc(_CANCELED)
+        delays[canceled] = CANCELED_OUTCOME["delay"]
+
+    matched = profiles.iloc[rows]
+    outcome, rx, units = (matched[column].to_numpy() for column in ("outcome", "rx", "units"))
+    if changed is not None and changed.any():
+        outcome, rx, units = outcome.copy(), rx.copy(), units.copy()
+        rx[changed], units[changed] = sampled_rx[changed], sampled_units[changed]
+        outcome[changed] = _sampled_outcomes(
+            rx[changed], units[changed], plan["Brand"].array[changed], outcome[changed]
+        )
+    time_slots = plan["Time Slot"].to_numpy(dtype=float, na_value=np.nan)
+
+    return pd.DataFrame({
+        "Time Slot": plan["Time Slot"].array,
+        "Doctor": doctors.array,
+        "Planned Objective": plan["Objective"].to_numpy(),
+        "Actual Time": pd.array((time_slots + delays) % 1440, dtype="Int16"),
+        "Outcome": outcome,
+        "Notes": matched["notes"].to_numpy(),
+        "Duration": matched["duration"].array if durations is None else pd.array(durations, dtype="Int16"),
+        "Actual Status": pd.Categorical(matched["status"], categories=STATUSES),
+        "Brand": plan["Brand"].array,
+        "Rx": rx,
+        "Units": units,
+    })
@@ -0,0 +1,58 @@
+"""Filtered, paged slices of execution logs for the dashboard's execution table."""
+import numpy as np
+import pandas as pd
+
+from fieldforce.schema import to_display
+
+DEFAULT_PAGE_ROWS = 50
+PAGE_ROW_OPTIONS = [25, 50, 100, 250]
+
+# CSS for the "Actual Status" cell; other statuses (e.g. "Not Visited") stay unstyled.
+STATUS_STYLES = {
+    "Success": "color: #28a745; font-weight: bold;",
+    "Partial": "color: #ffc107; font-weight: bold;",
+    "Failed": "color: #dc3545; font-weight: bold;",
+}
+
+# Filter argument -> execution column.
+FILTER_COLUMNS = {"statuses": "Actual Status", "brands": "Brand", "doctors": "Doctor"}
+
+
+def filter_options(execution):
+    """Choices for each filter: the categories of the typed columns, not a scan of the rows."""
+    options = {}
+    for name, column in FILTER_COLUMNS.items():
+        values = execution[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            options[name] = list(values.cat.categories)
+        else:
+            options[name] = sorted(values.dropna().unique())
+    return options
+
+
+def filter_executions(execution, statuses=None, brands=None, doctors=None):
+    """
+    Rows of ``execution`` whose status, brand and doctor are among the given
+    values. ``None`` or an empty list leaves that column unfiltered.
+    """
+    selected = {"statuses": statuses, "brands": brands, "doctors": doctors}
+    mask = np.ones(len(execution), dtype=bool)
+    for name, column in FILTER_COLUMNS.items():
+        if selected[name]:
+            mask &= execution[column].isin(selected[name]).to_numpy()
+    return execution if mask.all() else execution[mask]
+
+
+def page_count(rows, page_rows=DEFAULT_PAGE_ROWS):
+    return max(1, -(-rows // page_rows))
+
+
+def execution_page(execution, page, page_rows=DEFAULT_PAGE_ROWS):
+    """Display frame of the 1-based ``page``; only those rows are formatted."""
+    start = (page - 1) * page_rows
+    return to_display(execution.iloc[start:start + page_rows])
+
+
+def status_styles(statuses):
+    """CSS per cell of a displayed "Actual Status" column, for ``Styler.apply``."""
+    return statuses.map(STATUS_STYLES).fillna("")
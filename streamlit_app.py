@@ -1,13 +1,63 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+import os
 import random
+import time
+import uuid
+import zlib
+
+import numpy as np
+
+from fieldforce import (
+    NEXT_DAY_PLAN_COLUMNS,
+    PLAN_COLUMNS,
+    PRIORITIES,
+    STATUSES,
+    cache_stats,
+    cached_build_insights,
+    cached_build_replan,
+    run_monte_carlo,
+    split_next_day_plan,
+    to_display,
+    typed_next_day_plan,
+)
+from fieldforce.planstore import PlanStore
+from fieldforce.schema import empty_execution, parse_time_slot
+from fieldforce.history import DEFAULT_HISTORY_PATH, HistoryStore
+from fieldforce.importer import import_frame, import_to_history
+from fieldforce.profiling import RerunProfiler, profiled
+from fieldforce.jobs import JobRunner, simulate_day
+from fieldforce.insights import format_note_themes
+from fieldforce.memory import session_memory
+from fieldforce.notes import note_themes
+from fieldforce.outcomes import OutcomeModel
+from fieldforce.reference import load_reference_data
+from fieldforce.rollups import ROLLUP_PERIODS, rollup_window
+from fieldforce.scenarios import DEFAULT_RUNS, SHUFFLED_VARIANTS, candidate_plans, compare_scenarios, scenario_table
+from fieldforce.views import (
+    DEFAULT_PAGE_ROWS, PAGE_ROW_OPTIONS, execution_page, filter_executions, filter_options, page_count, status_styles,
+)
 
 # --- APP CONFIGURATION ---
 st.set_page_config(layout="wide", page_title="Pharma Field Force AI Assistant", page_icon="💊")
 
+# --- PERFORMANCE INSTRUMENTATION (opt-in from the sidebar, or FIELDFORCE_PROFILE=1) ---
+if "profiler" not in st.session_state:
+    st.session_state.profiler = RerunProfiler()
+    st.session_state.perf_enabled = os.environ.get("FIELDFORCE_PROFILE") == "1"
+    st.session_state.perf_cprofile = False
+    # Session memory reporting is a separate toggle; the variable turns it on too.
+    st.session_state.memory_enabled = st.session_state.perf_enabled
+    st.session_state.session_id = uuid.uuid4().hex
+profiler = st.session_state.profiler
+profiler.enabled = st.session_state.get("perf_enabled", False)
+profiler.use_cprofile = profiler.enabled and st.session_state.get("perf_cprofile", False)
+profiler.start_rerun()
+
 # --- CUSTOM CSS ---
-st.markdown("""
+with profiler.section("CSS"):
+    st.markdown("""
 <style>
     /* Main container padding */
     .stApp > header { visibility: hidden; } /* Hide Streamlit header */
@@ -111,271 +161,287 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- HISTORY STORE ---
+MEDICAL_REP = "MR Ravi"
+TERRITORY = "North 2"
+# Days shown by the Analytics tab's trends until another range is picked.
+TREND_DEFAULT_DAYS = 90
+
+@st.cache_resource
+def get_history_store():
+    """One SQLite history store shared by every session of this server process."""
+    return HistoryStore(os.environ.get("FIELDFORCE_HISTORY_DB", DEFAULT_HISTORY_PATH))
+
+@st.cache_resource
+def get_reference_data():
+    """Roster, outcome profiles and default plan, built once and shared read-only by every session."""
+    return load_reference_data()
+
+def doctor_locations():
+    """The reference doctor locations, updated with the roster synced from the CRM into history."""
+    return get_history_store().roster_locations(get_reference_data()["doctor_locations"])
+
+# Sessions that have not reported their memory for this long are dropped from the table.
+SESSION_MEMORY_TTL_SECONDS = 3600
+
+@st.cache_resource
+def get_session_memory_registry():
+    """Latest session-state size reported by each session of this server process, by session id."""
+    return {}
+
+@profiled()
+def persist_current_day(next_day_approved=False):
+    """Appends the current day's frames and texts to the history store."""
+    get_history_store().save_day(
+        st.session_state.current_date, MEDICAL_REP,
+        plan=st.session_state.plan.frame,
+        execution_data=st.session_state.execution_data,
+        next_day_plan=st.session_state.next_day_plan.frame,
+        insights_text=st.session_state.insights_text,
+        replan_text=st.session_state.replan_text,
+        day_completed=st.session_state.day_completed,
+        next_day_approved=next_day_approved,
+        simulated=st.session_state.execution_simulated,
+    )
+
 # --- SESSION STATE INITIALIZATION ---
+@profiled()
 def initialize_session_state_for_date(target_date):
     """
-    Initializes or resets session state variables for a given target date.
-    This ensures that data is specific to the selected day.
+    Initializes session state variables for a given target date.
+    A day already in the history store is loaded as saved; otherwise the day
+    starts from the previous day's approved next-day plan, or the default plan.
     """
     st.session_state.current_date = target_date.strftime("%Y-%m-%d")
+    # Keep the sidebar's remembered date in step so the next rerun doesn't switch back
+    st.session_state.date_selector_value = datetime.strptime(st.session_state.current_date, "%Y-%m-%d").date()
+
+    history = get_history_store()
+    # Yesterday's approved plan: its Day 1 visits are today's plan, the rest are
+    # carried into today's replan.
+    previous_date = (target_date - timedelta(days=1)).strftime("%Y-%m-%d")
+    approved_plan = history.approved_next_day_plan(previous_date, MEDICAL_REP)
+    if approved_plan is not None and not approved_plan.empty:
+        approved_plan, st.session_state.backlog = split_next_day_plan(approved_plan)
+    else:
+        st.session_state.backlog = typed_next_day_plan(pd.DataFrame(columns=NEXT_DAY_PLAN_COLUMNS))
+
+    stored_day = history.load_day(st.session_state.current_date, MEDICAL_REP)
+    if stored_day is not None:
+        for key, value in stored_day.items():
+            st.session_state[key] = value
+        # Days written by a bulk import have no generated texts yet
+        if st.session_state.insights_text is None:
+            st.session_state.insights_text = "No insights available yet. Run today's simulation to generate."
+        if st.session_state.replan_text is None:
+            st.session_state.replan_text = "No replan generated yet."
+        st.session_state.plan = PlanStore(stored_day["plan"])
+        st.session_state.next_day_plan = PlanStore(stored_day["next_day_plan"], typed_next_day_plan, NEXT_DAY_PLAN_COLUMNS)
+        return
 
-    # Define a default plan. This will be the starting point for any new day.
-    default_plan = pd.DataFrame({
-        "Time Slot": ["9:00 AM", "10:30 AM", "12:00 PM", "2:00 PM", "4:00 PM"],
-        "Doctor": ["Dr. Mehta", "Dr. Verma", "Dr. Joshi", "Sai Pharma", "Dr. Kumar"],
-        "Objective": ["Target 5 Rx", "New Product Sampling", "Achieve 3 Rx", "Stock Replenishment", "Secure 4 Rx"],
-        "Brand": ["A", "B", "A", "B", "A"]
-    })
-
-    # Initialize plan (either default or from saved data if multi-day persistence was desired)
-    # For this demo, we reset to default plan if the date changes.
-    st.session_state.plan = default_plan.copy()
+    # Start from yesterday's approved plan if there is one, else the default plan.
+    if approved_plan is not None and not approved_plan.empty:
+        st.session_state.plan = PlanStore(approved_plan[PLAN_COLUMNS])
+    else:
+        # The shared default plan is the starting point for any new day; the plan
+        # store copies it only once this session changes it.
+        st.session_state.plan = PlanStore(get_reference_data()["default_plan"])
     
     # Initialize execution data (always empty at start of a new day)
-    st.session_state.execution_data = pd.DataFrame(columns=[
-        "Time Slot", "Doctor", "Planned Objective", "Actual Time", "Outcome", 
-        "Notes", "Duration", "Actual Status", "Brand"
-    ])
+    st.session_state.execution_data = empty_execution()
     
     # Reset insights and replan
     st.session_state.insights_text = "No insights available yet. Run today's simulation to generate."
     st.session_state.replan_text = "No replan generated yet."
     
     # --- NEW: Initialize next_day_plan data frame ---
-    st.session_state.next_day_plan = pd.DataFrame(columns=["Time Slot", "Doctor", "Objective", "Brand", "Priority"])
+    st.session_state.next_day_plan = PlanStore(to_typed=typed_next_day_plan, columns=NEXT_DAY_PLAN_COLUMNS)
     
     # --- CRITICAL: Reset day_completed for the new day ---
     st.session_state.day_completed = False
+    st.session_state.execution_simulated = False
 
 # --- Initial setup on first run or full refresh ---
-if 'current_date' not in st.session_state:
-    initialize_session_state_for_date(datetime.today())
+with profiler.section("Session state"):
+    if 'current_date' not in st.session_state:
+        initialize_session_state_for_date(datetime.today())
+    # Background jobs of this session: kind ("simulation", "batch") -> job id and day.
+    if 'jobs' not in st.session_state:
+        st.session_state.jobs = {}
 
-# This part handles date changes from the date_input in sidebar
-# It ensures a full reset for the *new* selected date.
-selected_date_from_input = datetime.today().date() # Default value
-# Use a unique key for the date input to ensure its value is correctly maintained
-if 'date_selector_value' in st.session_state:
-    selected_date_from_input = st.session_state.date_selector_value
+    # This part handles date changes from the date_input in sidebar
+    # It loads the *new* selected date from history, or starts it fresh.
+    selected_date_from_input = datetime.today().date() # Default value
+    # Use a unique key for the date input to ensure its value is correctly maintained
+    if 'date_selector_value' in st.session_state:
+        selected_date_from_input = st.session_state.date_selector_value
 
-if st.session_state.current_date != selected_date_from_input.strftime("%Y-%m-%d"):
-    initialize_session_state_for_date(selected_date_from_input)
+    if st.session_state.current_date != selected_date_from_input.strftime("%Y-%m-%d"):
+        initialize_session_state_for_date(selected_date_from_input)
 
 
 # --- HELPER FUNCTIONS ---
-def get_rx_count(objective_text):
-    """Safely extract Rx count from objective text using regex for better parsing."""
-    if pd.isna(objective_text):
-        return 0
-    try:
-        import re
-        match = re.search(r'(\d+)\s*Rx', str(objective_text), re.IGNORECASE)
-        if match:
-            return int(match.group(1))
-        return 0
-    except ValueError:
-        return 0
-
-def simulate_day_completion():
-    """Simulates a day's execution with pre-defined outcomes for demo purposes."""
-    simulated_execution = []
-    
-    doctor_outcomes = {
-        "Dr. Mehta": {"status": "Partial", "outcome": "2 Rx (Brand A)", "notes": "Price objection raised. Follow-up needed with value proposition.", "duration": "28 mins", "delay": 20},
-        "Dr. Verma": {"status": "Failed", "outcome": "Canceled - Emergency OPD", "notes": "Doctor unavailable. Needs reschedule due to high patient load.", "duration": "0 mins", "delay": 0},
-        "Dr. Joshi": {"status": "Success", "outcome": "4 Rx (Brand A)", "notes": "High potential. Will prescribe more next week. Excellent engagement.", "duration": "45 mins", "delay": 15},
-        "Sai Pharma": {"status": "Success", "outcome": "Order placed (Brand B x200 units)", "notes": "Satisfied with stock levels. Discussed promotional offers.", "duration": "35 mins", "delay": 30},
-        "Dr. Kumar": {"status": "Success", "outcome": "3 Rx (Brand A)", "notes": "Good discussion on patient benefits. Receptive to new data.", "duration": "30 mins", "delay": 10},
-        "New Doctor": {"status": "Success", "outcome": "Introductory Visit", "notes": "Positive first interaction. Follow-up next week.", "duration": "25 mins", "delay": 5}, # Added for custom plan
-        "default": {"status": "Success", "outcome": "Visit completed", "notes": "Routine check completed satisfactorily.", "duration": "20 mins", "delay": 10}
-    }
-
+def get_outcome_model():
+    """
+    This session's outcome model, learned from the rep's recent recorded (not
+    simulated) history up to the open day. It is relearned whenever the rep's
+    history gets a new write (a saved day, a history import, a CRM sync) or
+    another day is opened. Simulated days are left out, so the model does not
+    learn from its own draws.
+    """
+    history = get_history_store()
+    key = (st.session_state.current_date, history.last_write_id(MEDICAL_REP))
+    if st.session_state.get("outcome_model_key") != key:
+        executions = history.recent_executions(st.session_state.current_date, MEDICAL_REP, recorded_only=True,
+                                               include_date=True)
+        st.session_state.outcome_model = OutcomeModel().update(executions)
+        st.session_state.outcome_model_key = key
+    return st.session_state.outcome_model
+
+# --- BACKGROUND JOBS ---
+# Seconds between progress updates while a job of this session runs.
+JOB_POLL_SECONDS = 0.5
+
+@st.cache_resource
+def get_job_runner():
+    """Thread pool for simulation and batch jobs, shared by every session of this server process."""
+    return JobRunner()
+
+def day_seed():
+    """Seed for the open day and rep, so re-running a day with the same inputs repeats its draws."""
+    return [datetime.strptime(st.session_state.current_date, "%Y-%m-%d").toordinal(), zlib.crc32(MEDICAL_REP.encode())]
+
+@profiled()
+def submit_simulation_job():
+    """
+    Starts today's simulation (execution, insights, replan) as a background job.
+    Returns False if there is nothing to simulate.
+    """
     # Ensure st.session_state.plan is not empty before simulating
     if st.session_state.plan.empty:
         st.warning("No plan available for simulation. Please add some visits to the plan first.")
-        return
+        return False
+
+    # The job gets plain values only; it runs without this session's state.
+    job_id = get_job_runner().submit(
+        simulate_day,
+        st.session_state.plan.frame,
+        st.session_state.current_date,
+        rng=np.random.default_rng(day_seed()),
+        # A copy, so the job never shares the session's model with later reruns.
+        model=get_outcome_model().copy(),
+        # Visit lengths are learned from the last four weeks of saved executions.
+        history=get_history_store().recent_executions(st.session_state.current_date, MEDICAL_REP),
+        backlog=st.session_state.backlog,
+        locations=doctor_locations(),
+        name="Simulation",
+    )
+    st.session_state.jobs["simulation"] = {"id": job_id, "date": st.session_state.current_date}
+    return True
+
+@profiled()
+def finish_simulation_job(result):
+    """Stores a finished simulation's frames and texts as today's results."""
+    st.session_state.execution_data = result["execution_data"]
+    st.session_state.insights_text = result["insights_text"]
+    st.session_state.replan_text = result["replan_text"]
+    st.session_state.next_day_plan = PlanStore(result["next_day_plan"], typed_next_day_plan, NEXT_DAY_PLAN_COLUMNS)
+    st.session_state.execution_simulated = True
 
-    for _, row in st.session_state.plan.iterrows():
-        time_slot = row["Time Slot"]
-        doctor = row["Doctor"]
-        objective = row["Objective"]
-        brand = row["Brand"]
-        
-        outcome_details = doctor_outcomes.get(doctor, doctor_outcomes["default"])
-        
-        try:
-            planned_time_dt = datetime.strptime(time_slot, "%I:%M %p")
-            actual_time = (planned_time_dt + timedelta(minutes=outcome_details["delay"])).strftime("%I:%M %p")
-        except ValueError:
-            # Fallback if time_slot is not in expected format
-            actual_time = "N/A" 
-
-        simulated_execution.append({
-            "Time Slot": time_slot,
-            "Doctor": doctor,
-            "Planned Objective": objective,
-            "Actual Time": actual_time,
-            "Outcome": outcome_details["outcome"],
-            "Notes": outcome_details["notes"],
-            "Duration": outcome_details["duration"],
-            "Actual Status": outcome_details["status"],
-            "Brand": brand
-        })
-    st.session_state.execution_data = pd.DataFrame(simulated_execution)
-
-    # --- CRITICAL: Generate insights and replan *after* execution data is populated ---
-    generate_intelligent_insights()
-    generate_intelligent_replan()
-    
     # --- CRITICAL: Set day_completed to True once simulation is complete ---
     st.session_state.day_completed = True
+    persist_current_day()
+    st.toast("Simulation complete! Check Execution & Analytics tabs.", icon="✅")
+
+def finish_batch_job(result):
+    st.session_state.batch_results = result
+    st.toast("Batch simulation complete! Check the Analytics tab.", icon="🎲")
+
+@profiled()
+def submit_scenario_job(runs, shuffles):
+    """Compares the AI plan, the edited plan and reordered variants of tomorrow as a background job."""
+    store = st.session_state.next_day_plan
+    locations = doctor_locations()
+    scenarios = candidate_plans(store.base, store.frame, shuffles=shuffles, seed=day_seed()[0], locations=locations)
+    job_id = get_job_runner().submit(
+        compare_scenarios, scenarios, runs=runs, outcomes=get_reference_data()["doctor_outcomes"],
+        model=get_outcome_model().copy(), seed=day_seed(), locations=locations, name="Scenario comparison",
+    )
+    st.session_state.jobs["scenarios"] = {"id": job_id, "date": st.session_state.current_date}
 
-def generate_intelligent_insights():
-    """Generates AI-like insights based on simulated execution data."""
-    execution_df = st.session_state.execution_data
-    if execution_df.empty:
-        st.session_state.insights_text = "No execution data to generate insights. Run the simulation first."
-        return
-
-    total_visits = execution_df.shape[0]
-    if total_visits == 0: # Handle case if execution_data somehow becomes empty despite checks
-        st.session_state.insights_text = "No visits executed to generate insights."
-        return
+def finish_scenario_job(result):
+    st.session_state.scenario_results = {"date": st.session_state.current_date, "results": result}
+    st.toast("Scenario comparison complete! Check the Next Day's Plan tab.", icon="🔀")
 
-    success_visits = execution_df[execution_df["Actual Status"] == "Success"].shape[0]
-    partial_visits = execution_df[execution_df["Actual Status"] == "Partial"].shape[0]
-    failed_visits = execution_df[execution_df["Actual Status"] == "Failed"].shape[0]
+JOB_FINISHERS = {"simulation": finish_simulation_job, "batch": finish_batch_job, "scenarios": finish_scenario_job}
 
-    rx_obtained = sum(get_rx_count(outcome) for outcome in execution_df["Outcome"])
-    
-    brand_performance = execution_df.groupby("Brand")["Actual Status"].apply(
-        lambda x: (x == "Success").sum() / len(x) if len(x) > 0 else 0
-    ).reset_index()
-    brand_performance.columns = ["Brand", "Success Rate"]
-    brand_performance_str = "\n".join([f"- **{row['Brand']}**: {row['Success Rate']:.1%} success rate" for index, row in brand_performance.iterrows()])
-
-    # Aggregate notes to avoid duplicates and ensure readability
-    all_notes = execution_df["Notes"].dropna().unique()
-    notes_summary = "\n".join([f"- {note}" for note in all_notes])
-
-    insights_text = f"""
-### Daily Performance Summary for {st.session_state.current_date}:
-
-* **Total Visits Planned:** {st.session_state.plan.shape[0]}
-* **Total Visits Executed:** {total_visits}
-* **Success Rate:** {success_visits / total_visits:.1%} ({success_visits} successful visits)
-* **Partial Success:** {partial_visits} visits
-* **Failed Visits:** {failed_visits} visits
-* **Total Rx Obtained (Estimated):** {rx_obtained} units across all brands
-
-#### Brand Performance Overview:
-{brand_performance_str if brand_performance_str else "- No specific brand performance data."}
-
-#### Key Takeaways from Doctor Interactions:
-{notes_summary if notes_summary else "- No specific notes recorded."}
-
-#### Recommendations:
-* **Focus on Dr. Verma:** High priority to reschedule due to emergency OPD. Understand their availability better for future planning.
-* **Address Price Objections:** For accounts like Dr. Mehta, prepare stronger value propositions or discuss flexible pricing models for Brand A.
-* **Leverage Successes:** Identify common factors in successful visits (e.g., Dr. Joshi, Dr. Kumar) and replicate strategies.
-* **Proactive Stock Management:** Continue strong engagement with pharmacies like Sai Pharma for Brand B.
-"""
-    st.session_state.insights_text = insights_text
+def finish_job(kind, status):
+    """Applies (or reports) a job that has stopped, and drops it from this session."""
+    job = st.session_state.jobs.pop(kind)
+    runner = get_job_runner()
+    try:
+        if status["state"] == "done" and job["date"] != st.session_state.current_date:
+            st.toast(f"{status['name']} for {job['date']} discarded: another day is open.", icon="⚠️")
+        elif status["state"] == "done":
+            JOB_FINISHERS[kind](runner.result(job["id"]))
+        elif status["state"] == "failed":
+            st.toast(f"{status['name']} failed: {status['error']}", icon="❌")
+        else:
+            st.toast(f"{status['name']} cancelled.", icon="✖️")
+    finally:
+        runner.forget(job["id"])
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+@profiler.rerun("fragment:Job progress")
+def render_job_progress():
+    """Live progress of this session's jobs; a finished job is applied and the whole app reruns."""
+    runner = get_job_runner()
+    finished = False
+    for kind, job in list(st.session_state.jobs.items()):
+        status = runner.poll(job["id"])
+        if status["state"] in ("queued", "running"):
+            st.progress(status["progress"], text=f"{status['name']}: {status['message'] or status['state'].capitalize()}")
+            st.button("✖️ Cancel", key=f"cancel_{kind}_job", on_click=runner.cancel, args=(job["id"],),
+                      use_container_width=True)
+        else:
+            finish_job(kind, status)
+            finished = True
+    if finished:
+        st.rerun()
+
+@profiled()
+def generate_intelligent_insights():
+    """Generates AI-like insights based on simulated execution data."""
+    st.session_state.insights_text = cached_build_insights(
+        st.session_state.execution_data, len(st.session_state.plan), st.session_state.current_date
+    )
 
+@profiled()
 def generate_intelligent_replan():
     """
     Generates a simple AI-like replan summary and a structured DataFrame
     for the next day's plan based on insights.
     """
-    if st.session_state.execution_data.empty:
-        st.session_state.replan_text = "Cannot generate replan without simulation data."
-        st.session_state.next_day_plan = pd.DataFrame(columns=["Time Slot", "Doctor", "Objective", "Brand", "Priority"])
-        return
-
-    # --- Replan Text Summary (as before) ---
-    replan_summary = """
-### Replan Suggestions for Tomorrow:
-
-Based on today's performance and insights, here are some high-priority suggestions for your next day's plan:
-
-1.  **Reschedule Dr. Verma:** This is critical. Prioritize rescheduling for early morning or late afternoon to avoid peak OPD hours. Objective: Ensure successful product detailing.
-2.  **Follow-up with Dr. Mehta:** Address the price objection. Prepare specific data on ROI for Brand A or discuss alternative solutions. Objective: Convert partial success to full Rx.
-3.  **Reinforce Success with Dr. Joshi & Dr. Kumar:** Maintain strong relationships and potentially increase frequency of visits or introduce new product lines. Objective: Deepen engagement and increase Rx volume.
-4.  **Strategic Pharmacy Visit (Sai Pharma):** Build on the successful order for Brand B. Discuss potential for Brand A or new products.
-5.  **Target New Leads (if available):** Allocate 1-2 slots for cold calls or introductory visits to expand reach, especially in areas with lower current success rates.
-
-**Considerations for Time Slots:**
-* Avoid peak clinic hours for critical doctor visits identified as 'Failed' or 'Partial'.
-* Group geographically close visits to optimize travel time.
-
-This replan focuses on addressing today's challenges and capitalizing on successes to improve overall territory performance.
-"""
-    st.session_state.replan_text = replan_summary
-
-    # --- NEW: Generate structured data for next day's plan ---
-    next_day_visits = []
-    
-    # Priority 1: Reschedule failed visits
-    failed_visits_today = st.session_state.execution_data[st.session_state.execution_data["Actual Status"] == "Failed"]
-    for _, row in failed_visits_today.iterrows():
-        next_day_visits.append({
-            "Time Slot": "09:30 AM", # Suggest an early slot
-            "Doctor": row["Doctor"],
-            "Objective": f"Reschedule: {row['Planned Objective']}",
-            "Brand": row["Brand"],
-            "Priority": "High (Failed Today)"
-        })
-    
-    # Priority 2: Follow-up on partial success
-    partial_visits_today = st.session_state.execution_data[st.session_state.execution_data["Actual Status"] == "Partial"]
-    for _, row in partial_visits_today.iterrows():
-        next_day_visits.append({
-            "Time Slot": "11:00 AM", # Suggest a mid-morning slot
-            "Doctor": row["Doctor"],
-            "Objective": f"Follow-up: {row['Planned Objective']}",
-            "Brand": row["Brand"],
-            "Priority": "High (Partial Today)"
-        })
-
-    # Priority 3: Maintain success & explore further
-    success_visits_today = st.session_state.execution_data[st.session_state.execution_data["Actual Status"] == "Success"]
-    # Exclude those already marked for high priority follow-up
-    success_for_next_day = success_visits_today[
-        ~success_visits_today['Doctor'].isin(failed_visits_today['Doctor']) &
-        ~success_visits_today['Doctor'].isin(partial_visits_today['Doctor'])
-    ]
-    for _, row in success_for_next_day.sample(min(2, len(success_for_next_day))).iterrows(): # Take up to 2 successful ones
-        next_day_visits.append({
-            "Time Slot": "01:30 PM", # Suggest afternoon slot
-            "Doctor": row["Doctor"],
-            "Objective": f"Reinforce: {row['Planned Objective']}",
-            "Brand": row["Brand"],
-            "Priority": "Medium (Successful Today)"
-        })
-
-    # Add a generic new lead if few visits generated
-    if len(next_day_visits) < 5:
-        next_day_visits.append({
-            "Time Slot": "03:00 PM",
-            "Doctor": "New Lead Clinic",
-            "Objective": "New Introduction",
-            "Brand": "Any",
-            "Priority": "Low (New Potential)"
-        })
-
-    # Convert to DataFrame
-    st.session_state.next_day_plan = pd.DataFrame(next_day_visits)
-    
-    # Optional: Sort the plan by Time Slot or Priority
-    st.session_state.next_day_plan["Time Sort"] = st.session_state.next_day_plan["Time Slot"].apply(
-        lambda x: datetime.strptime(x, "%I:%M %p").time()
+    # Visit lengths are learned from the last four weeks of saved executions.
+    history = get_history_store().recent_executions(st.session_state.current_date, MEDICAL_REP)
+    st.session_state.replan_text, next_day_plan = cached_build_replan(
+        st.session_state.execution_data, history=history, backlog=st.session_state.backlog,
+        locations=doctor_locations(),
     )
-    st.session_state.next_day_plan = st.session_state.next_day_plan.sort_values(
-        by=["Priority", "Time Sort"], 
-        ascending=[True, True] # High priority first, then by time
-    ).drop(columns=["Time Sort"])
+    st.session_state.next_day_plan = PlanStore(next_day_plan, typed_next_day_plan, NEXT_DAY_PLAN_COLUMNS)
     
 
+def start_new_day():
+    """
+    Button callback: increments the date and re-initializes for the new day.
+    Runs before the rerun, so the sidebar date picker can be moved along with it.
+    """
+    next_day = datetime.strptime(st.session_state.current_date, "%Y-%m-%d") + timedelta(days=1)
+    st.session_state.date_selector = next_day.date()
+    initialize_session_state_for_date(next_day)
+    st.toast(f"Ready for {st.session_state.current_date}!", icon="🗓️")
+
+
 # --- MAIN DASHBOARD ---
 st.title("💊 Pharma Field Force AI Assistant")
 
@@ -384,21 +450,23 @@ Welcome to your AI-powered field force assistant!
 **Plan** your daily visits, **simulate** execution, and get **intelligent insights** and **replans** to optimize your performance.
 """)
 
-st.markdown(f"--- **Medical Rep: MR Ravi** • **Territory: North 2** • **Date: {st.session_state.current_date}** ---")
+st.markdown(f"--- **Medical Rep: {MEDICAL_REP}** • **Territory: {TERRITORY}** • **Date: {st.session_state.current_date}** ---")
 
 
 # --- SIDEBAR ---
-with st.sidebar:
+with st.sidebar, profiler.section("Sidebar"):
     st.header("⚙️ Simulation Controls")
     
-    # Date Input
+    # Date Input (its value lives in session state so "Start New Day" can move it)
+    if "date_selector" not in st.session_state:
+        st.session_state.date_selector = datetime.strptime(st.session_state.current_date, "%Y-%m-%d").date()
     selected_date_input = st.date_input(
         "📅 Select Simulation Date", 
-        value=datetime.strptime(st.session_state.current_date, "%Y-%m-%d").date(),
         key="date_selector" # Add a key to prevent potential issues with state
     )
     # Store the value explicitly
     st.session_state.date_selector_value = selected_date_input
+    st.caption(f"💾 {len(get_history_store().stored_dates(MEDICAL_REP))} day(s) saved in history")
 
 
     # --- CRITICAL: Update current_date and re-initialize if the date changes ---
@@ -410,34 +478,107 @@ with st.sidebar:
 
     # --- SIMULATION BUTTON LOGIC ---
     if not st.session_state.day_completed:
-        # Show "Run Simulation" if day is not completed
-        if st.button("🚀 Run Today's Simulation", use_container_width=True, type="primary", 
-                     help="Automatically fills execution outcomes and generates AI insights/replan."):
-            with st.spinner("Simulating today's field operations..."):
-                simulate_day_completion()
-            st.toast("Simulation complete! Check Execution & Analytics tabs.", icon="✅")
-            st.rerun() # --- CRITICAL: Rerun AFTER state is updated ---
+        # Show "Run Simulation" if day is not completed and no simulation is running
+        if "simulation" not in st.session_state.jobs and st.button(
+            "🚀 Run Today's Simulation", use_container_width=True, type="primary",
+            help="Automatically fills execution outcomes and generates AI insights/replan in the background.",
+        ):
+            if submit_simulation_job():
+                st.rerun() # Show the job's progress in place of the button
     else:
         # Show "Day Completed" message and "Start New Day" button if day is completed
         st.success("🎉 Today's execution simulated!")
-        if st.button("🔄 Start New Day", use_container_width=True):
-            # Increment date for the new day and re-initialize
-            next_day = datetime.strptime(st.session_state.current_date, "%Y-%m-%d") + timedelta(days=1)
-            initialize_session_state_for_date(next_day)
-            st.toast(f"Ready for {st.session_state.current_date}!", icon="🗓️")
-            st.rerun() # Trigger rerun to show the new day's empty plan
+        st.button("🔄 Start New Day", use_container_width=True, on_click=start_new_day)
+
+    # Progress of running simulation and batch jobs; the rest of the app stays usable meanwhile.
+    if st.session_state.jobs:
+        render_job_progress()
 
     st.divider()
 
+    # --- BATCH MODE: N days x M reps x K seeds on a process pool ---
+    with st.expander("🎲 Batch Simulation (Monte Carlo)"):
+        batch_days = st.number_input("Days", min_value=1, max_value=365, value=5)
+        batch_reps = st.number_input("Reps", min_value=1, max_value=10000, value=10)
+        batch_seeds = st.number_input("Seeds per Rep", min_value=1, max_value=1000, value=3)
+        if st.button("▶️ Run Batch", use_container_width=True, disabled="batch" in st.session_state.jobs,
+                     help="Chains each day's next-day plan into the following day, for every rep and seed."):
+            st.session_state.jobs["batch"] = {
+                "id": get_job_runner().submit(
+                    run_monte_carlo,
+                    days=int(batch_days), reps=int(batch_reps), seeds=int(batch_seeds),
+                    start_date=datetime.strptime(st.session_state.current_date, "%Y-%m-%d").date(),
+                    model=get_outcome_model().copy(),
+                    name="Batch simulation",
+                ),
+                "date": st.session_state.current_date,
+            }
+            st.rerun() # Show the job's progress
+
+    # --- BULK IMPORT: CSV/JSONL plans and execution logs, read in chunks ---
+    with st.expander("📥 Bulk Import (CSV / JSONL)"):
+        import_file = st.file_uploader("CRM export", type=["csv", "jsonl", "ndjson"])
+        import_kind = st.radio("File contains", ["Plan", "Execution log"], horizontal=True)
+        import_target = st.radio(
+            "Load into", ["Current day", "History store"], horizontal=True,
+            help="The history store needs a Date column; rows without a Rep column are stored for this rep.",
+        )
+        if import_file is not None and st.button("📥 Import", use_container_width=True):
+            kind = "plan" if import_kind == "Plan" else "execution_data"
+            with st.spinner("Importing..."):
+                if import_target == "History store":
+                    report = import_to_history(import_file, kind, get_history_store(), rep=MEDICAL_REP)
+                    # Reload today in case the import replaced it
+                    initialize_session_state_for_date(datetime.strptime(st.session_state.current_date, "%Y-%m-%d"))
+                else:
+                    imported, report = import_frame(import_file, kind)
+                    if kind == "plan":
+                        st.session_state.plan.extend(imported)
+                    else:
+                        st.session_state.execution_data = imported
+                        st.session_state.execution_simulated = False
+                        generate_intelligent_insights()
+                        generate_intelligent_replan()
+                        st.session_state.day_completed = True
+                        persist_current_day()
+            st.session_state.import_report = report
+        if "import_report" in st.session_state:
+            report = st.session_state.import_report
+            st.caption(
+                f"Imported {report['rows']:,} rows ({report['rejected']:,} rejected) "
+                f"in {report['seconds']:.1f}s • {report['rows_per_second']:,} rows/s"
+                + (f" • {report['days']:,} day(s) written" if "days" in report else "")
+            )
+
+    # Filled in at the end of the script, once this rerun's timings are known
+    perf_panel = st.expander("⏱️ Performance")
+
     st.info("💡 **Tip:** Add visits to your plan on the 'Daily Plan' tab before running the simulation!")
-    st.info("📊 **Demo Data:** This app uses pre-defined demo data for simulation. In a real scenario, this would integrate with actual CRM data.")
+    st.info("📊 **Demo Data:** Simulated outcomes start from demo doctor profiles and follow a model that learns from imported and CRM-recorded visits. Days pulled from a CRM with `python -m fieldforce crm-sync` appear in the history.")
 
 
 # --- MAIN TABS ---
 # --- MODIFIED: Added tab5 ---
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["🗓️ Daily Plan", "📊 Execution Data", "📈 Analytics & Insights", "🧠 AI Replan", "🗓️ Next Day's Plan"])
-
-with tab1:
+# Each tab body is a fragment: its widgets rerun only that tab, and only the open
+# tab is rendered. Sidebar actions still rerun the whole script.
+# A fragment rerun on its own is profiled as a rerun of its own name.
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ["🗓️ Daily Plan", "📊 Execution Data", "📈 Analytics & Insights", "🧠 AI Replan", "🗓️ Next Day's Plan"],
+    key="active_tab",
+    on_change="rerun",
+)
+
+# Clear buttons empty the store in their callback, before the fragment reruns, so
+# the rerun already shows the empty plan; the toast follows from the button's state.
+def clear_plan():
+    st.session_state.plan.clear()
+
+def clear_next_day_plan():
+    st.session_state.next_day_plan.clear()
+
+@st.fragment
+@profiler.rerun("fragment:Daily Plan")
+def render_daily_plan_tab():
     st.header(f"Daily Visit Plan for {st.session_state.current_date}")
     st.write("Plan your visits for the day. Add doctors, objectives, and brands.")
 
@@ -457,54 +598,86 @@ with tab1:
 
         if add_button:
             if time_slot and doctor and objective and brand:
-                new_row = pd.DataFrame([{
-                    "Time Slot": time_slot,
-                    "Doctor": doctor,
-                    "Objective": objective,
-                    "Brand": brand
-                }])
-                st.session_state.plan = pd.concat([st.session_state.plan, new_row], ignore_index=True)
-                st.toast("Visit added to plan!", icon="✅")
-                st.rerun() # Rerun to update the displayed table
+                if parse_time_slot(time_slot) is None:
+                    st.warning("Please enter the time slot like 10:00 AM.")
+                else:
+                    # Logged on the plan store; the frame is rebuilt once, when it is next shown.
+                    st.session_state.plan.append({
+                        "Time Slot": time_slot,
+                        "Doctor": doctor,
+                        "Objective": objective,
+                        "Brand": brand
+                    })
+                    st.toast("Visit added to plan!", icon="✅")
             else:
                 st.warning("Please fill all fields to add to the plan.")
 
+    if st.session_state.get("clear_plan_button"):
+        st.toast("Plan cleared!", icon="🧹")
+
     # Display and clear plan
     if not st.session_state.plan.empty:
         st.subheader("Current Daily Plan:")
-        st.dataframe(st.session_state.plan, use_container_width=True, hide_index=True)
+        st.dataframe(st.session_state.plan.display_frame(), use_container_width=True, hide_index=True)
         
-        if st.button("🗑️ Clear Plan", type="secondary"):
-            st.session_state.plan = pd.DataFrame(columns=["Time Slot", "Doctor", "Objective", "Brand"])
-            st.toast("Plan cleared!", icon="🧹")
-            st.rerun()
+        st.button("🗑️ Clear Plan", type="secondary", key="clear_plan_button", on_click=clear_plan)
     else:
         st.info("Your daily plan is empty. Use the form above to add visits, or a default plan will be used for simulation.")
 
-with tab2:
+with tab1, profiler.section("Tab: Daily Plan"):
+    if tab1.open:
+        render_daily_plan_tab()
+
+@st.fragment
+@profiler.rerun("fragment:Execution Data")
+def render_execution_tab():
     st.header(f"Execution Data for {st.session_state.current_date}")
     st.write("This section shows the simulated outcomes of your daily visits.")
 
     if not st.session_state.execution_data.empty:
         st.subheader("Simulated Daily Execution:")
-        # Apply styling for status column
-        def color_status_text(val):
-            if val == "Success": return "color: #28a745; font-weight: bold;"
-            elif val == "Partial": return "color: #ffc107; font-weight: bold;"
-            elif val == "Failed": return "color: #dc3545; font-weight: bold;"
-            else: return "" # Default for "Not Visited" or other statuses
+        execution = st.session_state.execution_data
+        options = filter_options(execution)
+        col_status, col_brand, col_doctor = st.columns(3)
+        with col_status:
+            statuses = st.multiselect("Status", options["statuses"], placeholder="All statuses")
+        with col_brand:
+            brands = st.multiselect("Brand", options["brands"], placeholder="All brands")
+        with col_doctor:
+            doctors = st.multiselect("Doctor/Pharmacy", options["doctors"], placeholder="All doctors")
+        # Filtering runs on the typed frame; only the visible page is formatted and styled.
+        filtered = filter_executions(execution, statuses=statuses, brands=brands, doctors=doctors)
+
+        col_rows, col_page = st.columns([0.3, 0.7])
+        with col_rows:
+            page_rows = st.selectbox("Rows per page", PAGE_ROW_OPTIONS, index=PAGE_ROW_OPTIONS.index(DEFAULT_PAGE_ROWS))
+        pages = page_count(len(filtered), page_rows)
+        # A narrower filter can leave the remembered page past the end.
+        if st.session_state.get("execution_page", 1) > pages:
+            st.session_state.execution_page = pages
+        with col_page:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key="execution_page")
 
         st.dataframe(
-            st.session_state.execution_data.style.applymap(color_status_text, subset=['Actual Status']),
-            use_container_width=True, 
+            execution_page(filtered, page, page_rows).style.apply(status_styles, subset=['Actual Status']),
+            use_container_width=True,
             hide_index=True
         )
+        first_row = (page - 1) * page_rows
+        st.caption(f"Rows {min(first_row + 1, len(filtered))}–{min(first_row + page_rows, len(filtered))} "
+                   f"of {len(filtered)} ({len(execution)} in total).")
     elif st.session_state.day_completed:
         st.info("Simulation completed, but no execution data was generated. This can happen if your plan was empty before running the simulation.")
     else:
         st.info("Run today's simulation from the sidebar to see the execution data.")
 
-with tab3:
+with tab2, profiler.section("Tab: Execution Data"):
+    if tab2.open:
+        render_execution_tab()
+
+@st.fragment
+@profiler.rerun("fragment:Analytics & Insights")
+def render_analytics_tab():
     st.header(f"Analytics & Insights for {st.session_state.current_date}")
     st.write("Get a data-driven overview of your daily performance and key takeaways.")
     if st.session_state.day_completed:
@@ -512,7 +685,100 @@ with tab3:
     else:
         st.info("Run today's simulation from the sidebar to generate analytics and insights.")
 
-with tab4:
+    insights_stats = cache_stats()["insights"]
+    st.caption(f"🧠 Insights cache: {insights_stats['hits']} hits / {insights_stats['misses']} misses ({insights_stats['size']} entries)")
+
+    model = get_outcome_model()
+    if len(model):
+        with st.expander(f"🧪 Learned outcome model ({model.visits:,} visits)"):
+            st.dataframe(
+                model.to_frame(),
+                column_config={
+                    **{f"P({status})": st.column_config.ProgressColumn(f"P({status})", min_value=0.0, max_value=1.0, format="percent")
+                       for status in STATUSES},
+                    "Mean Delay": st.column_config.NumberColumn("Mean Delay (mins)", format="%.1f"),
+                    "Mean Duration": st.column_config.NumberColumn("Mean Duration (mins)", format="%.1f"),
+                },
+                hide_index=True, use_container_width=True,
+            )
+
+    render_trends()
+
+    batch_results = st.session_state.get("batch_results")
+    if batch_results is not None and not batch_results.empty:
+        st.subheader("🎲 Batch Simulation Results")
+        batch_summary = batch_results.assign(
+            Success=batch_results["Actual Status"] == "Success"
+        ).groupby("Day").agg(
+            Visits=("Doctor", "size"),
+            Success_Rate=("Success", "mean"),
+        ).rename(columns={"Success_Rate": "Success Rate"})
+        st.caption(f"{batch_results['Rep'].nunique()} reps × {batch_results['Seed'].nunique()} seeds, {len(batch_results)} simulated visits.")
+        st.dataframe(batch_summary.style.format({"Success Rate": "{:.1%}"}), use_container_width=True)
+        st.download_button(
+            "⬇️ Download Batch Results (CSV)",
+            to_display(batch_results).to_csv(index=False),
+            file_name=f"batch_simulation_{st.session_state.current_date}.csv",
+            mime="text/csv",
+        )
+
+@profiled()
+def render_trends():
+    """Visit, success and Rx trends from the history store's daily rollups."""
+    st.subheader("📈 Trends")
+    today = datetime.strptime(st.session_state.current_date, '%Y-%m-%d').date()
+    col_window, col_by, col_range = st.columns([1, 1, 2])
+    with col_window:
+        period = st.selectbox("Window", [p for p in ROLLUP_PERIODS if p != "Day"], key="trend_period")
+    with col_by:
+        by = st.selectbox("Group by", ["Brand", "Doctor", "All visits"], key="trend_by")
+    with col_range:
+        date_range = st.date_input(
+            "Dates", (today - timedelta(days=TREND_DEFAULT_DAYS - 1), today), max_value=today, key="trend_dates",
+        )
+    if len(date_range) != 2:
+        st.info("Pick the last day of the range.")
+        return
+
+    start, end = (day.strftime('%Y-%m-%d') for day in date_range)
+    rollups = get_history_store().read_rollups(start, end, rep=MEDICAL_REP)
+    if rollups.empty:
+        st.info("No saved executions in this range yet. Completed days are added as they are saved.")
+        return
+    key = None if by == "All visits" else by
+    trends = rollup_window(rollups, period=period, by=key)
+    st.caption(f"{rollups['Date'].nunique()} day(s), {int(rollups['Visits'].sum()):,} visits, "
+               f"{len(rollups):,} daily rollup rows.")
+
+    col_rate, col_rx = st.columns(2)
+    with col_rate:
+        st.markdown("**Success Rate**")
+        st.line_chart(trends.pivot(index="Period", columns=key, values="Success Rate") if key
+                      else trends.set_index("Period")[["Success Rate"]])
+    with col_rx:
+        st.markdown("**Rx Obtained**")
+        st.bar_chart(trends.pivot(index="Period", columns=key, values="Rx") if key
+                     else trends.set_index("Period")[["Rx"]])
+    st.dataframe(
+        trends,
+        column_config={
+            "Period": st.column_config.DateColumn(f"{period} of"),
+            "Success Rate": st.column_config.ProgressColumn("Success Rate", min_value=0.0, max_value=1.0, format="percent"),
+        },
+        hide_index=True, use_container_width=True,
+    )
+    # Reads every visit in the range, so it only runs when asked for.
+    if st.toggle("🗒️ Summarize visit notes in this range", key="trend_note_themes"):
+        notes = get_history_store().read_range("execution_data", start, end, rep=MEDICAL_REP)["Notes"]
+        st.markdown(format_note_themes(note_themes(notes, top_k=None)) or "- No notes recorded.")
+
+with tab3, profiler.section("Tab: Analytics & Insights"):
+    if tab3.open:
+        render_analytics_tab()
+
+@st.fragment
+@profiler.rerun("fragment:AI Replan")
+def render_replan_tab():
     st.header(f"AI Replan for Tomorrow ({datetime.strptime(st.session_state.current_date, '%Y-%m-%d').date() + timedelta(days=1)})")
     st.write("Receive intelligent suggestions for optimizing your next day's plan based on today's performance.")
     if st.session_state.day_completed:
@@ -520,16 +786,28 @@ with tab4:
     else:
         st.info("Run today's simulation from the sidebar to get AI-driven replan suggestions.")
 
+with tab4, profiler.section("Tab: AI Replan"):
+    if tab4.open:
+        render_replan_tab()
+
 # --- NEW TAB: Next Day's Plan ---
-with tab5:
+@st.fragment
+@profiler.rerun("fragment:Next Day's Plan")
+def render_next_day_tab():
     next_day_date = datetime.strptime(st.session_state.current_date, '%Y-%m-%d').date() + timedelta(days=1)
     st.header(f"AI-Generated Plan for {next_day_date.strftime('%Y-%m-%d')}")
     st.write("Review, edit, and approve the AI-generated plan for tomorrow.")
 
+    if st.session_state.get("clear_next_day_button"):
+        st.toast("Next day's plan cleared!", icon="🧹")
+
     if st.session_state.day_completed and not st.session_state.next_day_plan.empty:
         st.info("You can edit the cells in the table below directly.")
-        edited_df = st.data_editor(
-            st.session_state.next_day_plan,
+        # The editor's delta, not the whole edited table, goes back into the plan store.
+        editor_key = f"next_day_editor_{st.session_state.next_day_plan.version}"
+        st.data_editor(
+            st.session_state.next_day_plan.editor_frame(),
+            key=editor_key,
             num_rows="dynamic", # Allows adding/deleting rows
             column_config={
                 "Time Slot": st.column_config.TextColumn("Time Slot (e.g., 10:00 AM)"),
@@ -538,30 +816,113 @@ with tab5:
                 "Brand": st.column_config.TextColumn("Brand"),
                 "Priority": st.column_config.SelectboxColumn(
                     "Priority",
-                    options=["High (Failed Today)", "High (Partial Today)", "Medium (Successful Today)", "Low (New Potential)"],
+                    options=PRIORITIES,
                     required=True,
                 ),
+                "Day": st.column_config.NumberColumn("Day (1 = tomorrow)", min_value=1, step=1),
             },
             use_container_width=True,
             hide_index=True
         )
-        st.session_state.next_day_plan = edited_df # Update session state with edited DataFrame
+        st.session_state.next_day_plan.set_editor_delta(st.session_state[editor_key])
 
         col_approve, col_clear = st.columns([0.2, 0.8])
         with col_approve:
             if st.button("✅ Approve Plan", type="primary"):
-                # Here you would typically save this plan to a database or a persistent file
+                # Persist to the history store; the next day starts from the approved plan
+                # unless that day already has its own saved data.
+                persist_current_day(next_day_approved=True)
                 st.success("Plan approved! This plan can now be used for the next day's simulation.")
-                # You might want to automatically set this as the 'plan' for the next day
-                # when 'Start New Day' is clicked. This requires modifying initialize_session_state_for_date
-                # to check for an approved next_day_plan.
         with col_clear:
-            if st.button("🗑️ Clear Next Day's Plan", type="secondary"):
-                st.session_state.next_day_plan = pd.DataFrame(columns=["Time Slot", "Doctor", "Objective", "Brand", "Priority"])
-                st.toast("Next day's plan cleared!", icon="🧹")
-                st.rerun() # Refresh to show empty table
+            st.button("🗑️ Clear Next Day's Plan", type="secondary", key="clear_next_day_button", on_click=clear_next_day_plan)
+
+        render_scenario_comparison()
 
     elif st.session_state.day_completed:
         st.info("No AI-generated plan available for tomorrow. This might happen if today's simulation had no visits.")
     else:
-        st.info("Run today's simulation from the sidebar to generate a plan for tomorrow.")
\ No newline at end of file
+        st.info("Run today's simulation from the sidebar to generate a plan for tomorrow.")
+
+def render_scenario_comparison():
+    """What-if runs of tomorrow's candidate plans, side by side."""
+    st.subheader("🔀 What-if Scenarios")
+    st.write("Compare the AI plan, your edits and reordered versions before approving. Each scenario is "
+             "simulated many times with outcomes drawn from the learned outcome model.")
+    col_runs, col_shuffles, col_compare = st.columns([2, 2, 1], vertical_alignment="bottom")
+    with col_runs:
+        runs = st.number_input("Runs per scenario", min_value=100, max_value=5000, value=DEFAULT_RUNS, step=100,
+                               key="scenario_runs")
+    with col_shuffles:
+        shuffles = st.number_input("Shuffled orders", min_value=0, max_value=50, value=SHUFFLED_VARIANTS,
+                                   key="scenario_shuffles")
+    with col_compare:
+        if st.button("▶️ Compare", use_container_width=True, disabled="scenarios" in st.session_state.jobs):
+            submit_scenario_job(int(runs), int(shuffles))
+            st.rerun()
+
+    comparison = st.session_state.get("scenario_results")
+    if comparison is not None and comparison["date"] == st.session_state.current_date:
+        results = comparison["results"]
+        st.caption(f"{len(results)} scenarios. Intervals are 95% confidence intervals of the mean.")
+        st.dataframe(
+            scenario_table(results),
+            column_config={
+                "Expected Rx": st.column_config.NumberColumn("Expected Rx", format="%.1f"),
+                "Success Rate": st.column_config.ProgressColumn("Success Rate", min_value=0.0, max_value=1.0, format="percent"),
+                "Travel (mins)": st.column_config.NumberColumn("Travel (mins)", format="%.0f"),
+                "Missed Visits": st.column_config.NumberColumn("Missed Visits", format="%.2f"),
+            },
+            hide_index=True, use_container_width=True,
+        )
+
+with tab5, profiler.section("Tab: Next Day's Plan"):
+    if tab5.open:
+        render_next_day_tab()
+
+
+# --- PERFORMANCE PANEL ---
+last_rerun = profiler.finish_rerun()
+with perf_panel:
+    st.toggle("Profile reruns", key="perf_enabled", help="Times each section of every rerun.")
+    st.checkbox("Capture cProfile", key="perf_cprofile", disabled=not profiler.enabled,
+                help="Runs each rerun under cProfile; slows the app noticeably.")
+    if last_rerun is not None:
+        st.caption(f"Last rerun: {last_rerun['total_ms']:.1f} ms")
+        st.dataframe(
+            pd.DataFrame(sorted(last_rerun["sections"].items(), key=lambda item: -item[1]), columns=["Section", "ms"]),
+            hide_index=True, use_container_width=True,
+        )
+        st.caption(f"Rolling percentiles over {len(profiler.reruns)} rerun(s), ms")
+        st.dataframe(pd.DataFrame.from_dict(profiler.percentiles(), orient="index"), use_container_width=True)
+        st.download_button("⬇️ Export timings (JSON)", profiler.to_json(), file_name="rerun_timings.json",
+                           mime="application/json", use_container_width=True)
+        if profiler.last_cprofile:
+            with st.popover("cProfile (last rerun)"):
+                st.code(profiler.last_cprofile, language=None)
+    elif profiler.enabled:
+        st.caption("Timings appear from the next rerun.")
+
+    st.toggle("Report session memory", key="memory_enabled",
+              help="Measures this session's state on every rerun and lists every reporting session.")
+    if st.session_state.get("memory_enabled"):
+        # Reference data lives once per process, so it is not charged to the session.
+        reference = get_reference_data()
+        usage = session_memory(st.session_state.to_dict(),
+                               shared=[reference["default_plan"], reference["outcome_profiles"]])
+        registry = get_session_memory_registry()
+        now = time.time()
+        registry[st.session_state.session_id] = {"Rep": MEDICAL_REP, "MiB": usage["total"] / 2**20, "updated": now}
+        for session_id, entry in list(registry.items()):
+            if now - entry["updated"] > SESSION_MEMORY_TTL_SECONDS:
+                registry.pop(session_id, None)
+
+        st.caption(f"Session state: {usage['total'] / 2**20:.2f} MiB")
+        st.dataframe(
+            pd.DataFrame([(key, size / 2**10) for key, size in usage.items() if key != "total"][:10],
+                         columns=["Key", "KiB"]),
+            hide_index=True, use_container_width=True,
+        )
+        sessions = pd.DataFrame.from_dict(dict(registry), orient="index")
+        st.caption(f"{len(sessions)} reporting session(s) on this server: {sessions['MiB'].sum():.2f} MiB in total, "
+                   f"{sessions['MiB'].max():.2f} MiB at most")
+        st.dataframe(sessions[["Rep", "MiB"]].rename_axis("Session").round(3), use_container_width=True)
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from fieldforce.history import HistoryStore
+from fieldforce.roster import DOCTOR_LOCATIONS
+from fieldforce.schema import typed_next_day_plan
+from fieldforce.simulation import default_plan, simulate_execution
+
+
+def test_synced_roster_overrides_reference_locations(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    store.save_roster(pd.DataFrame({
+        "Doctor": ["Dr. Mehta", "Dr. Synced", "Dr. Unplaced"],
+        "Latitude": [28.5, 28.6, None],
+        "Longitude": [77.2, 77.3, None],
+    }), "2026-01-05")
+
+    locations = store.roster_locations()
+    store.close()
+
+    assert locations["Dr. Mehta"] == (28.5, 77.2)
+    assert locations["Dr. Synced"] == (28.6, 77.3)
+    assert "Dr. Unplaced" not in locations
+    assert locations["Dr. Verma"] == DOCTOR_LOCATIONS["Dr. Verma"]
+
+
+def test_last_write_id_moves_with_every_write(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    assert store.last_write_id("MR Ravi") == 0
+
+    execution = simulate_execution(default_plan())
+    store.save_day("2026-01-05", "MR Ravi", default_plan(), execution, typed_next_day_plan(pd.DataFrame()))
+    first = store.last_write_id("MR Ravi")
+    store.save_day("2026-01-06", "MR Ravi", default_plan(), execution, typed_next_day_plan(pd.DataFrame()))
+
+    assert store.last_write_id("MR Ravi") > first > 0
+    assert store.last_write_id("Someone else") == 0
+    assert len(store.recent_executions("2026-01-06", "MR Ravi", include_date=True)) == 2 * len(execution)
+    assert len(store.recent_executions("2026-01-06", "MR Ravi")) == len(execution)
+    store.close()
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from fieldforce.notes import normalize_notes, note_themes
+
+
+def test_normalize_keeps_non_ascii_words():
+    notes = pd.Series(["डॉक्टर उपलब्ध नहीं", "CAFÉ visit, Müller!", "  Follow-up_needed!! "])
+
+    assert normalize_notes(notes).tolist() == ["डॉक्टर उपलब्ध नहीं", "café visit müller", "follow up needed"]
+
+
+def test_unrelated_non_ascii_notes_stay_separate_themes():
+    notes = pd.Series(["डॉक्टर उपलब्ध नहीं", "कीमत पर आपत्ति", "मरीजों का भारी बोझ"] * 2)
+
+    themes = note_themes(notes, top_k=None)
+
+    assert len(themes) == 3
+    assert themes["Count"].tolist() == [2, 2, 2]
+
+
+def test_near_duplicates_differing_in_case_and_punctuation_merge():
+    notes = pd.Series(["Café visit — Müller", "CAFÉ visit, müller!", "Price objection raised."])
+
+    themes = note_themes(notes, top_k=None)
+
+    assert themes["Theme"].tolist() == ["Café visit — Müller", "Price objection raised."]
+    assert themes["Count"].tolist() == [2, 1]
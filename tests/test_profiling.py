@@ -0,0 +1,52 @@
+import pytest
+
+from fieldforce.profiling import RerunProfiler, profiled
+
+
+@profiled("work")
+def _work():
+    return 1
+
+
+def _enabled_profiler():
+    profiler = RerunProfiler()
+    profiler.enabled = True
+    return profiler
+
+
+def test_fragment_run_on_its_own_is_recorded_as_a_named_rerun():
+    profiler = _enabled_profiler()
+
+    with profiler.rerun("fragment:Jobs"):
+        _work()
+
+    rerun = profiler.last_rerun()
+    assert rerun["name"] == "fragment:Jobs"
+    assert "work" in rerun["sections"]
+    assert {"fragment:Jobs", "fragment:Jobs/work"} <= set(profiler.percentiles())
+
+
+def test_fragment_within_a_full_rerun_adds_no_rerun():
+    profiler = _enabled_profiler()
+    profiler.start_rerun()
+    with profiler.rerun("fragment:Jobs"):
+        _work()
+    profiler.finish_rerun()
+
+    assert len(profiler.reruns) == 1
+    assert profiler.last_rerun()["name"] is None
+    assert "work" in profiler.last_rerun()["sections"]
+
+
+def test_fragment_cut_short_is_recorded_as_interrupted():
+    profiler = _enabled_profiler()
+
+    @profiler.rerun("fragment:Jobs")
+    def fragment():
+        raise RuntimeError("rerun")
+
+    with pytest.raises(RuntimeError):
+        fragment()
+
+    assert profiler.last_rerun()["interrupted"]
+    assert not profiler.recording
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from fieldforce.scheduler import schedule_visits
+from fieldforce.schema import typed_next_day_plan
+
+
+def _plan(rows):
+    return typed_next_day_plan(pd.DataFrame(rows, columns=["Time Slot", "Doctor", "Objective", "Brand", "Priority"]))
+
+
+def test_shorter_lower_priority_visit_backfills_the_day():
+    plan = _plan([
+        ["9:00 AM", "Dr. Long", "x", "A", "High (Failed Today)"],
+        ["9:00 AM", "Dr. Half", "x", "A", "High (Partial Today)"],
+        ["9:00 AM", "Dr. Short", "x", "A", "Low (New Potential)"],
+    ])
+    durations = {"Dr. Long": 300, "Dr. Half": 250, "Dr. Short": 60}
+
+    scheduled, summary = schedule_visits(plan, durations)
+
+    days = dict(zip(scheduled["Doctor"].astype(str), scheduled["Day"]))
+    # Dr. Half no longer fits after Dr. Long; the shorter Dr. Short still does.
+    assert days == {"Dr. Long": 1, "Dr. Short": 1, "Dr. Half": 2}
+    assert summary["days"] == 2
+
+
+def test_visit_longer_than_a_day_gets_a_day_of_its_own():
+    plan = _plan([
+        ["9:00 AM", "Dr. Marathon", "x", "A", "High (Failed Today)"],
+        ["9:00 AM", "Dr. Short", "x", "A", "Medium (Successful Today)"],
+    ])
+
+    scheduled, _ = schedule_visits(plan, {"Dr. Marathon": 900, "Dr. Short": 30})
+
+    assert dict(zip(scheduled["Doctor"].astype(str), scheduled["Day"])) == {"Dr. Marathon": 1, "Dr. Short": 2}
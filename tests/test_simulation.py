@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from fieldforce.outcomes import OutcomeModel
+from fieldforce.reference import load_reference_data
+from fieldforce.schema import extract_rx_units
+from fieldforce.simulation import default_plan, outcome_profiles, simulate_execution
+
+
+def _model_execution(visits_per_doctor=2000):
+    plan = default_plan()
+    plan = plan.iloc[np.tile(np.arange(len(plan)), visits_per_doctor)].reset_index(drop=True)
+    return simulate_execution(plan, rng=np.random.default_rng(0), model=OutcomeModel())
+
+
+def test_model_sampled_success_yields_at_least_the_rx_of_partial():
+    execution = _model_execution()
+
+    by_status = execution.groupby("Actual Status", observed=True)["Rx"].mean()
+    assert by_status["Success"] >= by_status["Partial"] >= by_status["Failed"]
+    # Also per doctor: a drawn Success never yields less than a drawn Partial.
+    per_doctor = execution.groupby(["Doctor", "Actual Status"], observed=True)["Rx"].mean().unstack()
+    assert (per_doctor["Success"] >= per_doctor["Partial"]).all()
+
+
+def test_model_sampled_outcome_text_matches_its_counts():
+    execution = _model_execution(200)
+
+    parsed = extract_rx_units(execution["Outcome"])
+    assert (parsed["Rx"].to_numpy() == execution["Rx"].to_numpy()).all()
+    assert (parsed["Units"].to_numpy() == execution["Units"].to_numpy()).all()
+
+
+def test_default_profiles_are_shared_read_only():
+    profiles = outcome_profiles()
+
+    assert outcome_profiles() is profiles
+    assert load_reference_data()["outcome_profiles"] is profiles
+    with pytest.raises(ValueError):
+        profiles.loc["default", "delay"] = 0
+    with pytest.raises(ValueError):
+        profiles.loc["default", "duration"] = 0